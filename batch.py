@@ -0,0 +1,146 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from cache import CacheEntry, ResultCache, analyze_source
+from lexer import ENGINES
+import syntax_validation
+
+
+class CompileResult:
+    """Outcome of lexing and validating one script."""
+    def __init__(self, path: str, token_count: int = 0, symbols: Optional[Dict[str, Dict]] = None,
+                 error: Optional[str] = None, line: Optional[int] = None, position: Optional[int] = None):
+        self.path = path
+        self.token_count = token_count
+        self.symbols = symbols if symbols is not None else {}
+        self.error = error
+        self.line = line
+        self.position = position
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict:
+        return {
+            'path': self.path,
+            'tokens': self.token_count,
+            'symbols': self.symbols,
+            'error': None if self.ok else {'message': self.error, 'line': self.line, 'position': self.position},
+        }
+
+    @classmethod
+    def from_entry(cls, path: str, entry: CacheEntry) -> 'CompileResult':
+        result = cls(path, len(entry.tokens), entry.symbols)
+        if entry.error is not None:
+            kind, message, line, position = entry.error
+            result.error = message if kind == 'lexical' else str(syntax_validation.SyntaxError(message, line, position))
+            result.line = line
+            result.position = position
+        return result
+
+    def __str__(self):
+        if self.ok:
+            return f"{self.path}: OK ({self.token_count} tokens, {len(self.symbols)} symbols)"
+        return f"{self.path}: {self.error}"
+
+
+def compile_source(source: str, path: str = "<string>", engine: str = 'regex',
+                   cache: Optional[ResultCache] = None) -> CompileResult:
+    """Lex and validate source, capturing the first error instead of raising it."""
+    entry = cache.analyze(source, engine) if cache is not None else analyze_source(source, engine)
+    return CompileResult.from_entry(path, entry)
+
+
+def compile_file(path: str, engine: str = 'regex', cache: Optional[ResultCache] = None) -> CompileResult:
+    with open(path, encoding='utf-8') as file:
+        source = file.read()
+    return compile_source(source, path, engine, cache)
+
+
+# one ResultCache per worker process, opened on its first task
+_worker_cache: Optional[ResultCache] = None
+
+
+def _compile_file_task(task):
+    global _worker_cache
+    path, engine, cache_directory, cache_max_bytes, cache_fingerprint = task
+    if cache_directory is not None and _worker_cache is None:
+        # open the parent's fingerprint; a worker computing its own would sweep the parent's directory as stale
+        _worker_cache = ResultCache(cache_directory, cache_max_bytes, cache_fingerprint)
+    return compile_file(path, engine, _worker_cache)
+
+
+def collect_files(paths: Iterable[str], extension: Optional[str] = None) -> List[str]:
+    """Expand directories into the files under them, sorted for a stable order."""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                found.extend(
+                    os.path.join(root, name) for name in names
+                    if extension is None or name.endswith(extension)
+                )
+            files.extend(sorted(found))
+        else:
+            files.append(path)
+    return files
+
+
+def compile_files(paths: Iterable[str], jobs: Optional[int] = None, engine: str = 'regex',
+                  chunksize: Optional[int] = None, cache: Optional[ResultCache] = None) -> List[CompileResult]:
+    """
+    Lex and validate many scripts over a process pool.
+    Results come back in the order of `paths`. Files are handed to the workers
+    in chunks to amortize the inter-process round trip; jobs=1 runs in-process.
+    With a cache, unchanged scripts are answered from disk; workers open the
+    same cache directory and the size bound is enforced once all are done.
+    """
+    paths = list(paths)
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) <= 1:
+        return [compile_file(path, engine, cache) for path in paths]
+
+    if chunksize is None:
+        chunksize = max(1, len(paths) // (jobs * 4))
+    cache_directory = cache.directory if cache is not None else None
+    cache_max_bytes = cache.max_bytes if cache is not None else None
+    cache_fingerprint = cache.fingerprint if cache is not None else None
+    tasks = [(path, engine, cache_directory, cache_max_bytes, cache_fingerprint) for path in paths]
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        results = list(executor.map(_compile_file_task, tasks, chunksize=chunksize))
+    if cache is not None:
+        cache.evict()
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lex and validate scripts in parallel")
+    parser.add_argument("paths", nargs="+", help="script files or directories to scan")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--ext", default=None, help="only pick files with this extension from directories")
+    parser.add_argument("--engine", choices=ENGINES, default='regex')
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    parser.add_argument("--cache", metavar="DIR", default=None, help="reuse results stored in this cache directory")
+    parser.add_argument("--cache-size", type=int, default=256, help="cache size limit in MiB")
+    args = parser.parse_args(argv)
+
+    cache = ResultCache(args.cache, args.cache_size * 1024 * 1024) if args.cache else None
+    results = compile_files(collect_files(args.paths, args.ext), args.jobs, args.engine, args.chunksize, cache)
+    for result in results:
+        print(json.dumps(result.to_dict()) if args.json else result)
+
+    failed = sum(not result.ok for result in results)
+    if not args.json:
+        print(f"{len(results)} files, {failed} with errors", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
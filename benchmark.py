@@ -0,0 +1,421 @@
+import argparse
+import datetime
+import json
+import os
+import pickle
+import platform
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from corpus import ProgramGenerator
+from lexer import LexicalAnalyzer, LexicalError, ENGINES
+from syntax_validation import SyntaxValidator
+from old_syntax_validation import SyntaxValidator as OldSyntaxValidator
+from bytecode import CodeObject, ExecutionError, VirtualMachine, compile_tree
+from optimizer import Optimizer
+from serialization import dumps, loads
+from syntax_tree import parse
+from tree_interpreter import Function, TreeInterpreter
+from tokens import Token, TOKEN_TYPES_BY_ORDINAL
+from tests import test_cases
+import syntax_validation
+
+# test_cases opens with this many well-formed example programs; the rest
+# exercise error reporting and would stop the lexer and validator early
+VALID_CASES = 14
+
+
+# loop-heavy scripts for bench_execution, built around the factorial and
+# loop test cases
+EXECUTION_SCRIPTS = {
+    'factorial': test_cases[8] + """
+LET total = 0
+FOR i = 1 TO {scale} DO
+    total += CALL factorial(20)
+ENDFOR
+""",
+    'nested loops': """
+LET total = 0
+FOR i = 0 TO {scale} DO
+    FOR j IN Range(0, 100, 1) DO
+        LET squared = j * j
+        total += squared / 2
+    ENDFOR
+ENDFOR
+LET counter = 0
+WHILE counter < {scale} DO
+    counter++
+ENDWHILE
+""",
+}
+
+# scripts on which the tree interpreter, the VM and the optimized VM once
+# disagreed; bench_execution() checks them before timing anything
+BACKEND_CASES = [
+    # a called function assigns the variable of a loop the optimizer could unroll
+    """
+FUNC g() BEGIN
+    i += 10
+    RETURN 0
+END
+LET s = 0
+FOR i = 1 TO 3 DO
+    CALL g
+    s += i
+ENDFOR
+""",
+    # compound assignment reads its variable before running the right-hand side
+    """
+LET x = 1
+FUNC f() BEGIN
+    x += 100
+    RETURN 1
+END
+x += CALL f
+""",
+    # so an undefined variable on both sides is reported for the left one
+    """
+a *= b
+""",
+    # integers too large for true division stop the run like any arithmetic error
+    """
+LET x = 10
+FOR i = 1 TO 12 DO
+    x *= x
+ENDFOR
+LET y = x / 3
+""",
+]
+
+
+def _variables(global_values: Dict[str, object]) -> Dict[str, object]:
+    """Globals of a run with functions reduced to their names, which is all backends agree on."""
+    return {
+        name: '<function>' if isinstance(value, (Function, CodeObject)) else value
+        for name, value in global_values.items()
+    }
+
+
+def _outcome(run) -> object:
+    """Globals of a run, or the message of the ExecutionError that stopped it."""
+    try:
+        return _variables(run())
+    except ExecutionError as error:
+        return error.message
+
+
+def check_backends(script: str):
+    """
+    Raise AssertionError unless the tree interpreter, the VM and the optimized
+    VM end with the same globals, or stop with the same error.
+    """
+    tree = parse(LexicalAnalyzer(engine='regex').tokenize(script)[0])
+    expected = _outcome(TreeInterpreter(tree).run)
+    for name, program in (('vm', compile_tree(tree)), ('optimized vm', compile_tree(Optimizer(tree).optimize()))):
+        actual = _outcome(VirtualMachine(program).run)
+        assert actual == expected, f"{name} ended with {actual!r}, the tree interpreter with {expected!r}"
+
+
+def _errors(validate) -> List[tuple]:
+    """(message, line, position) of the errors a validate() or validate_all() call reports."""
+    try:
+        result = validate()
+    except syntax_validation.SyntaxError as error:
+        return [(error.message, error.line, error.position)]
+    if result is True:
+        return []
+    return [(error.message, error.line, error.position) for error in result]
+
+
+def check_validator_engines(source: str):
+    """
+    Raise AssertionError unless the iterative validator engine reports the
+    same errors as the recursive one, from validate() and from validate_all().
+    Sources the lexer rejects have nothing to validate.
+    """
+    try:
+        tokens = LexicalAnalyzer(engine='regex').tokenize(source)[0]
+    except LexicalError:
+        return
+    for method in ('validate', 'validate_all'):
+        expected = _errors(getattr(SyntaxValidator(tokens), method))
+        actual = _errors(getattr(SyntaxValidator(tokens, engine='iterative'), method))
+        assert actual == expected, f"iterative {method}() reported {actual!r}, the recursive engine {expected!r}"
+
+
+def build_corpus(scale: int) -> str:
+    """Concatenate the valid test cases `scale` times into one large script."""
+    return "\n".join(test_cases[:VALID_CASES]) * scale
+
+
+def time_call(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_lexer(source: str, repeat: int):
+    print(f"Lexing {len(source)} bytes (best of {repeat})")
+    for engine in ENGINES:
+        tokens = []
+
+        def run():
+            tokens[:] = LexicalAnalyzer(engine=engine).tokenize(source)[0]
+
+        elapsed = time_call(run, repeat)
+        print(f"  {engine:<8} {elapsed:8.4f}s  {len(tokens) / elapsed:12.0f} tokens/s")
+
+    token_count = len(LexicalAnalyzer().tokenize(source, lazy_positions=True)[0])
+    elapsed = time_call(lambda: LexicalAnalyzer().tokenize(source, lazy_positions=True), repeat)
+    print(f"  {'offsets':<8} {elapsed:8.4f}s  {token_count / elapsed:12.0f} tokens/s  (lazy positions)")
+
+    elapsed = time_call(lambda: LexicalAnalyzer().tokenize(source, compact=True), repeat)
+    print(f"  {'compact':<8} {elapsed:8.4f}s  {token_count / elapsed:12.0f} tokens/s")
+    jobs = os.cpu_count() or 1
+    if jobs > 1:
+        # one chunk per worker
+        chunk_size = len(source) // jobs + 1
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            elapsed = time_call(lambda: LexicalAnalyzer().tokenize_parallel(
+                source, compact=True, chunk_size=chunk_size, executor=executor
+            ), repeat)
+        print(f"  {'parallel':<8} {elapsed:8.4f}s  {token_count / elapsed:12.0f} tokens/s  (compact, {jobs} processes)")
+
+
+def bench_validator(source: str, repeat: int):
+    # the engines must agree on every test case, the invalid ones included
+    for case in test_cases:
+        check_validator_engines(case)
+
+    tokens = LexicalAnalyzer(engine='regex').tokenize(source)[0]
+    print(f"Validating {len(tokens)} tokens (best of {repeat})")
+    results = {}
+    validators = (
+        ('old', lambda: OldSyntaxValidator(tokens)),
+        ('current', lambda: SyntaxValidator(tokens)),
+        ('iterative', lambda: SyntaxValidator(tokens, engine='iterative')),
+    )
+    for name, make_validator in validators:
+        elapsed = time_call(lambda: make_validator().validate(), repeat)
+        results[name] = elapsed
+        print(f"  {name:<9} {elapsed:8.4f}s  {len(tokens) / elapsed:12.0f} tokens/s")
+    for name in ('current', 'iterative'):
+        print(f"  speedup of {name} over old  {results['old'] / results[name]:.2f}x")
+
+
+def bench_serialization(source: str, repeat: int):
+    tokens, symbol_table = LexicalAnalyzer(engine='regex').tokenize(source)
+    print(f"Serializing {len(tokens)} tokens (best of {repeat})")
+
+    def json_dumps():
+        return json.dumps({
+            'tokens': [[token.type.value, token.lexeme, token.line, token.position] for token in tokens],
+            'symbols': symbol_table.symbols,
+        }).encode()
+
+    def json_loads(data):
+        decoded = json.loads(data)
+        return [Token(TOKEN_TYPES_BY_ORDINAL[value], lexeme, line, position)
+                for value, lexeme, line, position in decoded['tokens']]
+
+    formats = (
+        ('binary', lambda: dumps(tokens, symbol_table), loads),
+        ('pickle', lambda: pickle.dumps((tokens, symbol_table), pickle.HIGHEST_PROTOCOL), pickle.loads),
+        ('json', json_dumps, json_loads),
+    )
+    for name, dump, load in formats:
+        data = dump()
+        dump_time = time_call(dump, repeat)
+        load_time = time_call(lambda: load(data), repeat)
+        print(f"  {name:<8} {len(data):10d} bytes  {len(data) / len(tokens):6.2f} bytes/token"
+              f"  dump {dump_time:8.4f}s  load {load_time:8.4f}s")
+
+
+def bench_execution(scale: int, repeat: int):
+    # the comparison is only meaningful if both backends compute the same thing
+    for script in BACKEND_CASES:
+        check_backends(script)
+    for script in EXECUTION_SCRIPTS.values():
+        check_backends(script.replace("{scale}", "10"))
+    print(f"Executing (best of {repeat})")
+    for name, script in EXECUTION_SCRIPTS.items():
+        tokens = LexicalAnalyzer(engine='regex').tokenize(script.replace("{scale}", str(scale * 10)))[0]
+        tree = parse(tokens)
+        program = compile_tree(tree)
+        tree_time = time_call(lambda: TreeInterpreter(tree).run(), repeat)
+        vm_time = time_call(lambda: VirtualMachine(program).run(), repeat)
+        optimizer = Optimizer(tree)
+        compile_time = time_call(lambda: compile_tree(Optimizer(tree).optimize()), repeat)
+        optimized = compile_tree(optimizer.optimize())
+        optimized_time = time_call(lambda: VirtualMachine(optimized).run(), repeat)
+        print(f"  {name:<13} tree {tree_time:8.4f}s  vm {vm_time:8.4f}s  speedup {tree_time / vm_time:.2f}x  "
+              f"optimized vm {optimized_time:8.4f}s (optimize + compile {compile_time:.4f}s)")
+        for pass_name, counters in optimizer.stats:
+            changes = ", ".join(f"{key} {value}" for key, value in counters.items() if key != 'seconds')
+            print(f"    {pass_name:<9} {changes}")
+
+
+# ----------------------------------------
+# Regression suite
+# ----------------------------------------
+
+SIZE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+
+def parse_size(text: str) -> int:
+    """'512', '64K' or '100M' as a number of bytes."""
+    text = text.strip().upper()
+    if text and text[-1] in SIZE_UNITS:
+        return int(float(text[:-1]) * SIZE_UNITS[text[-1]])
+    return int(text)
+
+
+def peak_memory(func) -> int:
+    """Peak bytes allocated while func runs."""
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_suite(sizes: List[int], engines=ENGINES, repeat: int = 3, seed: int = 0, max_depth: int = 3,
+              comment_density: float = 0.1, identifier_length: int = 8) -> Dict:
+    """
+    Lex and validate a generated script of each size. Times are the best of
+    `repeat` runs; peak memory is measured in a separate run because
+    tracemalloc slows everything it traces.
+    """
+    results = []
+    for size in sizes:
+        generator = ProgramGenerator(seed, max_depth, comment_density, identifier_length)
+        source = generator.generate(size)
+        byte_count = len(source.encode('utf-8'))
+        entry = {'size': size, 'bytes': byte_count, 'statements': generator.statements, 'lexer': {}}
+
+        tokens = []
+        for engine in engines:
+            def lex():
+                tokens[:] = LexicalAnalyzer(engine=engine).tokenize(source)[0]
+
+            elapsed = time_call(lex, repeat)
+            entry['lexer'][engine] = {
+                'seconds': elapsed,
+                'tokens_per_second': len(tokens) / elapsed,
+                'bytes_per_second': byte_count / elapsed,
+                'peak_bytes': peak_memory(lex),
+            }
+        entry['tokens'] = len(tokens)
+
+        def validate():
+            SyntaxValidator(tokens).validate()
+
+        elapsed = time_call(validate, repeat)
+        entry['validator'] = {
+            'seconds': elapsed,
+            'statements_per_second': generator.statements / elapsed,
+            'tokens_per_second': len(tokens) / elapsed,
+            'peak_bytes': peak_memory(validate),
+        }
+        results.append(entry)
+
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {
+            'seed': seed, 'max_depth': max_depth, 'comment_density': comment_density,
+            'identifier_length': identifier_length, 'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def print_suite(report: Dict):
+    for entry in report['results']:
+        print(f"{entry['bytes']} bytes, {entry['tokens']} tokens, {entry['statements']} statements")
+        for engine, lexer in entry['lexer'].items():
+            print(f"  lex {engine:<8} {lexer['tokens_per_second']:12.0f} tokens/s  "
+                  f"{lexer['bytes_per_second'] / (1 << 20):8.2f} MiB/s  peak {lexer['peak_bytes'] / (1 << 20):8.2f} MiB")
+        validator = entry['validator']
+        print(f"  validate       {validator['statements_per_second']:12.0f} statements/s  "
+              f"peak {validator['peak_bytes'] / (1 << 20):8.2f} MiB")
+
+
+def compare_suites(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Throughput figures that dropped by more than `tolerance` against baseline, as messages."""
+    regressions = []
+    previous = {entry['size']: entry for entry in baseline['results']}
+    for entry in report['results']:
+        old = previous.get(entry['size'])
+        if old is None:
+            continue
+        metrics = [(f"lex {engine}", lexer['tokens_per_second'], old['lexer'][engine]['tokens_per_second'])
+                   for engine, lexer in entry['lexer'].items() if engine in old['lexer']]
+        metrics.append(("validate", entry['validator']['statements_per_second'],
+                        old['validator']['statements_per_second']))
+        for name, current, reference in metrics:
+            if current < reference * (1 - tolerance):
+                regressions.append(f"{entry['size']} bytes {name}: {current:.0f}/s, was {reference:.0f}/s "
+                                   f"({current / reference - 1:+.1%})")
+    return regressions
+
+
+def main() -> Optional[int]:
+    parser = argparse.ArgumentParser(description="Benchmark the mini compiler")
+    parser.add_argument("--scale", type=int, default=100, help="how many times to repeat the test corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", choices=("lexer", "validator", "serialization", "execution"))
+    suite = parser.add_argument_group("regression suite, on generated scripts")
+    suite.add_argument("--suite", action="store_true", help="run the suite instead of the benchmarks above")
+    suite.add_argument("--sizes", default="1K,64K,1M", help="comma separated script sizes, e.g. 1K,1M,100M")
+    suite.add_argument("--engines", default=",".join(ENGINES), help="comma separated lexer engines")
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--depth", type=int, default=3, help="maximum block nesting")
+    suite.add_argument("--comment-density", type=float, default=0.1, help="share of statements with a comment")
+    suite.add_argument("--identifier-length", type=int, default=8)
+    suite.add_argument("--json", metavar="PATH", help="write the results as JSON to PATH, - for stdout")
+    suite.add_argument("--compare", metavar="PATH", help="JSON results of an earlier run to check for regressions")
+    suite.add_argument("--tolerance", type=float, default=0.1, help="allowed throughput drop against --compare")
+    args = parser.parse_args()
+
+    if args.suite:
+        report = run_suite(
+            [parse_size(size) for size in args.sizes.split(",")], args.engines.split(","), args.repeat,
+            args.seed, args.depth, args.comment_density, args.identifier_length
+        )
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            print_suite(report)
+            if args.json:
+                with open(args.json, "w") as file:
+                    json.dump(report, file, indent=2)
+        if args.compare:
+            with open(args.compare) as file:
+                regressions = compare_suites(report, json.load(file), args.tolerance)
+            for message in regressions:
+                print(f"regression: {message}", file=sys.stderr)
+            return 1 if regressions else 0
+        return None
+
+    source = build_corpus(args.scale)
+    if args.only in (None, "lexer"):
+        bench_lexer(source, args.repeat)
+    if args.only in (None, "validator"):
+        bench_validator(source, args.repeat)
+    if args.only in (None, "serialization"):
+        bench_serialization(source, args.repeat)
+    if args.only in (None, "execution"):
+        bench_execution(args.scale, args.repeat)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,579 @@
+import operator
+from typing import Dict, List, Optional
+from syntax_tree import NodeOrdinal, SyntaxTree, parse
+from tokens import TokenOrdinal
+from lexer import LexicalAnalyzer
+
+
+class ExecutionError(Exception):
+    def __init__(self, message: str, line: int):
+        super().__init__(f"Runtime Error at line {line}: {message}")
+        self.message = message
+        self.line = line
+
+
+# ----------------------------------------
+# Instruction Set
+# ----------------------------------------
+
+# Every instruction is an opcode followed by one int argument (0 when unused)
+(LOAD_LOCAL, LOAD_GLOBAL, LOAD_CONST, STORE_LOCAL, STORE_GLOBAL, BINARY, COMPARE,
+ JUMP_IF_FALSE, JUMP_IF_TRUE, JUMP, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP,
+ INDEX, STORE_INDEX, BUILD_LIST, CALL, RETURN, POP, FOR_TEST, RANGE_TEST) = range(20)
+
+OPCODE_NAMES = [
+    'LOAD_LOCAL', 'LOAD_GLOBAL', 'LOAD_CONST', 'STORE_LOCAL', 'STORE_GLOBAL', 'BINARY', 'COMPARE',
+    'JUMP_IF_FALSE', 'JUMP_IF_TRUE', 'JUMP', 'JUMP_IF_FALSE_OR_POP', 'JUMP_IF_TRUE_OR_POP',
+    'INDEX', 'STORE_INDEX', 'BUILD_LIST', 'CALL', 'RETURN', 'POP', 'FOR_TEST', 'RANGE_TEST',
+]
+
+
+def divide(left, right):
+    """'/' keeps integers exact when they divide evenly."""
+    if type(left) is int and type(right) is int and right and left % right == 0:
+        return left // right
+    return left / right
+
+
+def and_not(left, right):
+    # NOT only appears between two operands in this grammar: "a NOT b"
+    return bool(left) and not right
+
+
+# argument of BINARY and COMPARE instructions, in evaluation order
+BINARY_FUNCTIONS = [operator.add, operator.sub, operator.mul, divide, and_not]
+COMPARE_FUNCTIONS = [operator.eq, operator.ne, operator.gt, operator.lt, operator.ge, operator.le]
+
+BINARY_ARGUMENTS = {
+    TokenOrdinal.PLUS: 0, TokenOrdinal.MINUS: 1, TokenOrdinal.MULTIPLY: 2, TokenOrdinal.DIVIDE: 3,
+    TokenOrdinal.NOT: 4,
+    TokenOrdinal.PLUS_EQUAL: 0, TokenOrdinal.MINUS_EQUAL: 1, TokenOrdinal.MULTIPLY_EQUAL: 2,
+    TokenOrdinal.DIVIDE_EQUAL: 3,
+}
+COMPARE_ARGUMENTS = {
+    TokenOrdinal.EQUAL: 0, TokenOrdinal.NOT_EQUAL: 1, TokenOrdinal.GREATER: 2, TokenOrdinal.LESS: 3,
+    TokenOrdinal.GREATER_EQUAL: 4, TokenOrdinal.SMALLER_EQUAL: 5,
+}
+
+
+class _Undefined:
+    __slots__ = ()
+
+    def __repr__(self):
+        return '<undefined>'
+
+
+# value of variable slots that were never assigned
+UNDEFINED = _Undefined()
+
+
+class CodeObject:
+    """Bytecode of the main program or of one function, with its constant pool."""
+    __slots__ = ('name', 'code', 'lines', 'constants', 'parameter_count', 'local_names')
+
+    def __init__(self, name: str, parameter_count: int = 0):
+        self.name = name
+        self.code: List[int] = []
+        self.lines: List[int] = []   # source line per instruction
+        self.constants: List = []
+        self.parameter_count = parameter_count
+        self.local_names: List[str] = []
+
+    def __repr__(self):
+        return f"<function {self.name}>"
+
+    def disassemble(self) -> str:
+        lines = [f"{self.name}:"]
+        code = self.code
+        for pc in range(0, len(code), 2):
+            name = OPCODE_NAMES[code[pc]]
+            argument = code[pc + 1]
+            if code[pc] == LOAD_CONST:
+                detail = f"  ({self.constants[argument]!r})"
+            elif code[pc] in (LOAD_LOCAL, STORE_LOCAL):
+                detail = f"  ({self.local_names[argument]})"
+            else:
+                detail = ""
+            lines.append(f"  {pc:5d} {name:<20} {argument}{detail}")
+        return "\n".join(lines)
+
+
+class Program:
+    def __init__(self, main: CodeObject, global_names: List[str]):
+        self.main = main
+        self.global_names = global_names
+
+    def functions(self) -> List[CodeObject]:
+        found, pending = [], [self.main]
+        while pending:
+            code_object = pending.pop()
+            found.append(code_object)
+            pending.extend(constant for constant in code_object.constants if isinstance(constant, CodeObject))
+        return found
+
+    def disassemble(self) -> str:
+        return "\n\n".join(code_object.disassemble() for code_object in self.functions())
+
+
+# ----------------------------------------
+# Compiler
+# ----------------------------------------
+
+class Compiler:
+    """
+    Compiles a SyntaxTree into a Program.
+    Variables resolve to slots at compile time: everything at the top level
+    is a global slot; inside a function, parameters and the targets of plain
+    LET and FOR are local slots and any other name is a global slot.
+    Functions are bound to global names.
+    """
+    def __init__(self, tree: SyntaxTree):
+        self.tree = tree
+        self.global_slots: Dict[str, int] = {}
+        self.local_slots: Optional[Dict[str, int]] = None
+        self.code_object: Optional[CodeObject] = None
+        self.constant_indices: Dict = {}
+        self.line = 1
+
+    def compile(self) -> Program:
+        main = CodeObject('<main>')
+        self._compile_body(main, self.tree.root)
+        return Program(main, list(self.global_slots))
+
+    def _compile_body(self, code_object: CodeObject, block: int):
+        outer = self.code_object, self.constant_indices
+        self.code_object, self.constant_indices = code_object, {}
+        for statement in self.tree.children(block):
+            self._statement(statement)
+        self._emit(LOAD_CONST, self._constant(None))
+        self._emit(RETURN)
+        self.code_object, self.constant_indices = outer
+
+    # ----------------------------------------
+    # Emission Helpers
+    # ----------------------------------------
+
+    def _emit(self, opcode: int, argument: int = 0) -> int:
+        """Append an instruction and return its address."""
+        code = self.code_object.code
+        code.append(opcode)
+        code.append(argument)
+        self.code_object.lines.append(self.line)
+        return len(code) - 2
+
+    def _here(self) -> int:
+        return len(self.code_object.code)
+
+    def _patch(self, address: int, target: int = None):
+        self.code_object.code[address + 1] = self._here() if target is None else target
+
+    def _constant(self, value) -> int:
+        # keyed by type too, so 1, 1.0 and True get separate entries
+        key = (type(value), value)
+        index = self.constant_indices.get(key)
+        if index is None:
+            constants = self.code_object.constants
+            index = self.constant_indices[key] = len(constants)
+            constants.append(value)
+        return index
+
+    def _hidden_slot(self) -> str:
+        """A fresh variable for loop bounds, named so no script can refer to it."""
+        name = f"<hidden {len(self.global_slots) + len(self.local_slots or ())}>"
+        if self.local_slots is not None:
+            self.local_slots[name] = len(self.local_slots)
+            self.code_object.local_names.append(name)
+        else:
+            self.global_slots[name] = len(self.global_slots)
+        return name
+
+    def _load(self, name: str):
+        if self.local_slots is not None and name in self.local_slots:
+            self._emit(LOAD_LOCAL, self.local_slots[name])
+        else:
+            self._emit(LOAD_GLOBAL, self.global_slots.setdefault(name, len(self.global_slots)))
+
+    def _store(self, name: str):
+        if self.local_slots is not None and name in self.local_slots:
+            self._emit(STORE_LOCAL, self.local_slots[name])
+        else:
+            self._emit(STORE_GLOBAL, self.global_slots.setdefault(name, len(self.global_slots)))
+
+    def _constant_value(self, node: int):
+        """Value of a literal or folded constant expression, None for anything else."""
+        kind = self.tree.kinds[node]
+        if kind == NodeOrdinal.NUMBER:
+            return int(self._name(node))
+        if kind == NodeOrdinal.CONSTANT:
+            return self.tree.values[node]
+        return None
+
+    def _name(self, node: int) -> str:
+        return self.tree.token(node).lexeme
+
+    # ----------------------------------------
+    # Statements
+    # ----------------------------------------
+
+    def _statement(self, node: int):
+        tree = self.tree
+        kind = tree.kinds[node]
+        children = tree.children(node)
+        self.line = tree.token(node).line
+
+        if kind == NodeOrdinal.LET:
+            name = self._name(node)
+            if len(children) == 1:
+                self._expression(children[0])
+                self._store(name)
+                return
+            self._load(name)
+            for index in children[:-2]:
+                self._expression(index)
+                self._emit(INDEX)
+            self._expression(children[-2])
+            self._expression(children[-1])
+            self._emit(STORE_INDEX)
+
+        elif kind == NodeOrdinal.IF:
+            self._expression(children[0])
+            jump_to_else = self._emit(JUMP_IF_FALSE)
+            self._block(children[1])
+            if len(children) == 3:
+                jump_to_end = self._emit(JUMP)
+                self._patch(jump_to_else)
+                self._block(children[2])
+                self._patch(jump_to_end)
+            else:
+                self._patch(jump_to_else)
+
+        elif kind == NodeOrdinal.WHILE:
+            top = self._here()
+            self._expression(children[0])
+            exit_jump = self._emit(JUMP_IF_FALSE)
+            self._block(children[1])
+            self._emit(JUMP, top)
+            self._patch(exit_jump)
+
+        elif kind == NodeOrdinal.DO_WHILE or kind == NodeOrdinal.REPEAT_UNTIL:
+            top = self._here()
+            self._block(children[0])
+            self._expression(children[1])
+            self._emit(JUMP_IF_TRUE if kind == NodeOrdinal.DO_WHILE else JUMP_IF_FALSE, top)
+
+        elif kind == NodeOrdinal.FOR or kind == NodeOrdinal.FOR_IN:
+            self._for(node, kind, children)
+
+        elif kind == NodeOrdinal.FUNC:
+            self._function(node, children)
+
+        elif kind == NodeOrdinal.CALL:
+            self._load(self._name(node))
+            for argument in children:
+                self._load(self._name(argument))
+            self._emit(CALL, len(children))
+            self._emit(POP)
+
+        elif kind == NodeOrdinal.RETURN:
+            if children:
+                self._expression(children[0])
+            else:
+                self._emit(LOAD_CONST, self._constant(None))
+            self._emit(RETURN)
+
+        elif kind == NodeOrdinal.INCREMENT or kind == NodeOrdinal.DECREMENT:
+            name = self._name(node)
+            self._load(name)
+            self._emit(LOAD_CONST, self._constant(1))
+            self._emit(BINARY, 0 if kind == NodeOrdinal.INCREMENT else 1)
+            self._store(name)
+
+        elif kind == NodeOrdinal.COMPOUND_ASSIGN:
+            name = self._name(node)
+            operator_type = tree.tokens[tree.token_indices[node] + 1].type.value
+            # `x op= e` reads x before evaluating e, so a CALL in e that assigns x
+            # does not change the left operand; TreeInterpreter does the same
+            self._load(name)
+            self._expression(children[0])
+            self._emit(BINARY, BINARY_ARGUMENTS[operator_type])
+            self._store(name)
+
+        else:
+            raise ValueError(f"not a statement: {tree.kind(node).name}")
+
+    def _block(self, block: int):
+        for statement in self.tree.children(block):
+            self._statement(statement)
+
+    def _for(self, node: int, kind: int, children):
+        """
+        FOR v = a TO b [STEP s] runs while v <= b (v >= b for a negative step),
+        FOR v IN Range(a, b, s) while v < b (v > b), like Python's range().
+        A literal step picks the comparison at compile time.
+        """
+        tree = self.tree
+        variable = self._name(node)
+        bounds, body = children[:-1], children[-1]
+        self._expression(bounds[0])
+        self._store(variable)
+        end = self._hidden_slot()
+        self._expression(bounds[1])
+        self._store(end)
+
+        constant_step = 1
+        if len(bounds) == 3:
+            constant_step = self._constant_value(bounds[2])
+            if type(constant_step) is not int or constant_step <= 0:
+                constant_step = None
+        if constant_step is None:
+            step = self._hidden_slot()
+            self._expression(bounds[2])
+            self._store(step)
+
+        top = self._here()
+        self._load(variable)
+        self._load(end)
+        if constant_step is not None:
+            # LESS / SMALLER_EQUAL
+            self._emit(COMPARE, 3 if kind == NodeOrdinal.FOR_IN else 5)
+        else:
+            self._load(step)
+            self._emit(RANGE_TEST if kind == NodeOrdinal.FOR_IN else FOR_TEST)
+        exit_jump = self._emit(JUMP_IF_FALSE)
+
+        self._block(body)
+
+        self.line = tree.token(node).line
+        self._load(variable)
+        if constant_step is not None:
+            self._emit(LOAD_CONST, self._constant(constant_step))
+        else:
+            self._load(step)
+        self._emit(BINARY, 0)
+        self._store(variable)
+        self._emit(JUMP, top)
+        self._patch(exit_jump)
+
+    def _function(self, node: int, children):
+        tree = self.tree
+        parameters = [self._name(child) for child in children[:-1]]
+        function = CodeObject(self._name(node), len(parameters))
+
+        outer_slots = self.local_slots
+        self.local_slots = {}
+        for name in parameters + self._assigned_names(children[-1]):
+            if name not in self.local_slots:
+                self.local_slots[name] = len(self.local_slots)
+                function.local_names.append(name)
+        self._compile_body(function, children[-1])
+        self.local_slots = outer_slots
+
+        self.line = tree.token(node).line
+        self._emit(LOAD_CONST, self._constant(function))
+        self._emit(STORE_GLOBAL, self.global_slots.setdefault(function.name, len(self.global_slots)))
+
+    def _assigned_names(self, block: int) -> List[str]:
+        """Targets of plain LET and FOR statements in a function body, outside nested functions."""
+        tree = self.tree
+        names = []
+        pending = [block]
+        while pending:
+            node = pending.pop()
+            kind = tree.kinds[node]
+            if kind == NodeOrdinal.FUNC:
+                continue
+            if (kind == NodeOrdinal.LET and len(tree.children(node)) == 1) or \
+                    kind == NodeOrdinal.FOR or kind == NodeOrdinal.FOR_IN:
+                names.append(self._name(node))
+            pending.extend(reversed(tree.children(node)))
+        return names
+
+    # ----------------------------------------
+    # Expressions
+    # ----------------------------------------
+
+    def _expression(self, node: int):
+        tree = self.tree
+        kind = tree.kinds[node]
+        if kind == NodeOrdinal.NUMBER:
+            self._emit(LOAD_CONST, self._constant(int(self._name(node))))
+        elif kind == NodeOrdinal.NAME:
+            self._load(self._name(node))
+        elif kind == NodeOrdinal.BINARY:
+            left, right = tree.children(node)
+            operator_type = tree.tokens[tree.token_indices[node]].type.value
+            if operator_type == TokenOrdinal.AND or operator_type == TokenOrdinal.OR:
+                self._expression(left)
+                jump = self._emit(JUMP_IF_FALSE_OR_POP if operator_type == TokenOrdinal.AND else JUMP_IF_TRUE_OR_POP)
+                self._expression(right)
+                self._patch(jump)
+                return
+            self._expression(left)
+            self._expression(right)
+            if operator_type in COMPARE_ARGUMENTS:
+                self._emit(COMPARE, COMPARE_ARGUMENTS[operator_type])
+            else:
+                self._emit(BINARY, BINARY_ARGUMENTS[operator_type])
+        elif kind == NodeOrdinal.INDEX:
+            self._load(self._name(node))
+            for index in tree.children(node):
+                self._expression(index)
+                self._emit(INDEX)
+        elif kind == NodeOrdinal.ARRAY:
+            elements = tree.children(node)
+            for element in elements:
+                self._expression(element)
+            self._emit(BUILD_LIST, len(elements))
+        elif kind == NodeOrdinal.CALL_EXPR:
+            arguments = tree.children(node)
+            self._load(self._name(node))
+            for argument in arguments:
+                self._expression(argument)
+            self._emit(CALL, len(arguments))
+        elif kind == NodeOrdinal.CONSTANT:
+            self._emit(LOAD_CONST, self._constant(tree.values[node]))
+        elif kind == NodeOrdinal.STRING:
+            self._emit(LOAD_CONST, self._constant(self._name(node)))
+        else:
+            raise ValueError(f"not an expression: {tree.kind(node).name}")
+
+
+def compile_tree(tree: SyntaxTree) -> Program:
+    return Compiler(tree).compile()
+
+
+# ----------------------------------------
+# Virtual Machine
+# ----------------------------------------
+
+class VirtualMachine:
+    """
+    Stack machine running a Program.
+    Calls push a frame onto an explicit list rather than recursing in Python,
+    so script recursion is limited by max_depth only.
+    """
+    def __init__(self, program: Program, max_depth: int = 10000):
+        self.program = program
+        self.max_depth = max_depth
+        self.globals: List = [UNDEFINED] * len(program.global_names)
+
+    def run(self) -> Dict[str, object]:
+        """Execute the program and return its global variables."""
+        global_values = self.globals
+        binary_functions, compare_functions = BINARY_FUNCTIONS, COMPARE_FUNCTIONS
+        frames = []
+        stack = []
+        push, pop = stack.append, stack.pop
+        function = self.program.main
+        code, constants, local_values = function.code, function.constants, []
+        pc = 0
+
+        try:
+            while True:
+                opcode = code[pc]
+                argument = code[pc + 1]
+                pc += 2
+
+                if opcode == LOAD_LOCAL:
+                    value = local_values[argument]
+                    if value is UNDEFINED:
+                        raise NameError(f"Undefined variable '{function.local_names[argument]}'")
+                    push(value)
+                elif opcode == LOAD_CONST:
+                    push(constants[argument])
+                elif opcode == LOAD_GLOBAL:
+                    value = global_values[argument]
+                    if value is UNDEFINED:
+                        raise NameError(f"Undefined variable '{self.program.global_names[argument]}'")
+                    push(value)
+                elif opcode == STORE_LOCAL:
+                    local_values[argument] = pop()
+                elif opcode == STORE_GLOBAL:
+                    global_values[argument] = pop()
+                elif opcode == BINARY:
+                    right = pop()
+                    stack[-1] = binary_functions[argument](stack[-1], right)
+                elif opcode == COMPARE:
+                    right = pop()
+                    stack[-1] = compare_functions[argument](stack[-1], right)
+                elif opcode == JUMP_IF_FALSE:
+                    if not pop():
+                        pc = argument
+                elif opcode == JUMP:
+                    pc = argument
+                elif opcode == JUMP_IF_TRUE:
+                    if pop():
+                        pc = argument
+                elif opcode == INDEX:
+                    index = pop()
+                    stack[-1] = stack[-1][index]
+                elif opcode == CALL:
+                    callee = stack[-argument - 1]
+                    if type(callee) is not CodeObject:
+                        raise TypeError(f"{callee!r} is not a function")
+                    if argument != callee.parameter_count:
+                        raise TypeError(
+                            f"{callee.name}() takes {callee.parameter_count} arguments but {argument} were given"
+                        )
+                    if len(frames) >= self.max_depth:
+                        raise RecursionError(f"call depth exceeded {self.max_depth}")
+                    frames.append((function, pc, local_values))
+                    local_values = stack[len(stack) - argument:]
+                    local_values.extend([UNDEFINED] * (len(callee.local_names) - argument))
+                    del stack[len(stack) - argument - 1:]
+                    function = callee
+                    code, constants, pc = callee.code, callee.constants, 0
+                elif opcode == RETURN:
+                    if not frames:
+                        break
+                    function, pc, local_values = frames.pop()
+                    code, constants = function.code, function.constants
+                elif opcode == POP:
+                    pop()
+                elif opcode == JUMP_IF_FALSE_OR_POP:
+                    if stack[-1]:
+                        pop()
+                    else:
+                        pc = argument
+                elif opcode == JUMP_IF_TRUE_OR_POP:
+                    if stack[-1]:
+                        pc = argument
+                    else:
+                        pop()
+                elif opcode == BUILD_LIST:
+                    if argument:
+                        elements = stack[-argument:]
+                        del stack[-argument:]
+                    else:
+                        elements = []
+                    push(elements)
+                elif opcode == STORE_INDEX:
+                    value = pop()
+                    index = pop()
+                    pop()[index] = value
+                elif opcode == FOR_TEST or opcode == RANGE_TEST:
+                    step = pop()
+                    end = pop()
+                    value = stack[-1]
+                    if step == 0:
+                        raise ValueError("loop STEP must not be zero")
+                    if opcode == FOR_TEST:
+                        stack[-1] = value <= end if step > 0 else value >= end
+                    else:
+                        stack[-1] = value < end if step > 0 else value > end
+                else:
+                    raise ValueError(f"bad opcode {opcode}")
+        except (NameError, TypeError, ValueError, IndexError, ArithmeticError, RecursionError) as error:
+            raise ExecutionError(str(error), function.lines[(pc - 2) // 2]) from None
+
+        names = self.program.global_names
+        return {
+            name: value for name, value in zip(names, global_values)
+            if value is not UNDEFINED and not name.startswith('<')
+        }
+
+
+def execute(source: str) -> Dict[str, object]:
+    """Lex, parse, compile and run source; returns its global variables."""
+    tokens, _ = LexicalAnalyzer(engine='regex').tokenize(source)
+    return VirtualMachine(compile_tree(parse(tokens))).run()
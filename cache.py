@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from lexer import LexicalAnalyzer, LexicalError
+from symbols import SymbolTable
+from syntax_validation import SyntaxValidator
+from tokens import Token, TokenType, TOKEN_TYPES_BY_ORDINAL
+import lexer
+import symbols
+import serialization
+import syntax_validation
+import tokens
+
+# bump when the layout of a cache entry changes
+CACHE_FORMAT_VERSION = 2
+
+_ERROR_KINDS = ('lexical', 'syntax')
+# written into every fingerprint directory; only directories carrying it are
+# ever deleted as stale, so unrelated data in the cache directory is left alone
+MARKER_NAME = '.result-cache'
+
+
+def schema_fingerprint() -> str:
+    """
+    Hash identifying everything a cached result depends on besides the source:
+    the entry format, the TokenType members and the lexer/validator code.
+    Entries written under another fingerprint are never read.
+    """
+    digest = hashlib.sha256(f"format={CACHE_FORMAT_VERSION}\n".encode())
+    for token_type in TokenType:
+        digest.update(f"{token_type.name}={token_type.value}\n".encode())
+    for module in (lexer, tokens, symbols, syntax_validation):
+        with open(module.__file__, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def _is_fingerprint(name: str) -> bool:
+    return len(name) == 32 and all(char in '0123456789abcdef' for char in name)
+
+
+class CacheEntry:
+    """
+    Result of lexing and validating one source.
+    error is None or (kind, message, line, position) where kind is 'lexical'
+    for errors raised by the lexer and 'syntax' for validator errors.
+    """
+    def __init__(self, tokens: List[Token], symbols: Dict[str, Dict],
+                 error: Optional[Tuple[str, str, Optional[int], Optional[int]]] = None):
+        self.tokens = tokens
+        self.symbols = symbols
+        self.error = error
+
+    @property
+    def symbol_table(self) -> SymbolTable:
+        symbol_table = SymbolTable()
+        symbol_table.symbols = self.symbols
+        return symbol_table
+
+    def reraise(self):
+        """Raise the recorded error as the lexer or validator originally did."""
+        if self.error is None:
+            return
+        kind, message, line, position = self.error
+        if kind == 'lexical':
+            raise LexicalError(message, line, position)
+        raise syntax_validation.SyntaxError(message, line, position)
+
+    def to_bytes(self) -> bytes:
+        """
+        Encode as the recorded error in JSON on the first line followed by a
+        serialization token stream of the tokens and symbols. Unlike pickle,
+        decoding a cache file never runs code.
+        """
+        return json.dumps(self.error).encode() + b'\n' + serialization.dumps(self.tokens, self.symbol_table)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'CacheEntry':
+        """Inverse of to_bytes(); raises on anything to_bytes() did not write."""
+        header, separator, stream = data.partition(b'\n')
+        if not separator:
+            raise ValueError("not a cache entry: missing error header")
+        error = json.loads(header)
+        if error is not None:
+            if not (isinstance(error, list) and len(error) == 4 and error[0] in _ERROR_KINDS
+                    and isinstance(error[1], str) and all(value is None or type(value) is int for value in error[2:])):
+                raise ValueError("not a cache entry: malformed error")
+            error = tuple(error)
+        token_list, symbol_table = serialization.loads(stream)
+        if not isinstance(symbol_table.symbols, dict):
+            raise ValueError("not a cache entry: malformed symbols")
+        return cls(token_list, symbol_table.symbols, error)
+
+    def __getstate__(self):
+        return {
+            'tokens': [(token.type.value, token.lexeme, token.line, token.position) for token in self.tokens],
+            'symbols': self.symbols,
+            'error': self.error,
+        }
+
+    def __setstate__(self, state):
+        self.tokens = [
+            Token(TOKEN_TYPES_BY_ORDINAL[value], lexeme, line, position)
+            for value, lexeme, line, position in state['tokens']
+        ]
+        self.symbols = state['symbols']
+        self.error = state['error']
+
+
+def analyze_source(source: str, engine: str = 'regex') -> CacheEntry:
+    """Lex and validate source, recording the first error instead of raising it."""
+    lexical_analyzer = LexicalAnalyzer(engine=engine)
+    try:
+        token_list, symbol_table = lexical_analyzer.tokenize(source)
+    except LexicalError as e:
+        return CacheEntry([], lexical_analyzer.symbol_table.symbols, ('lexical', str(e), e.line, e.position))
+
+    try:
+        SyntaxValidator(token_list).validate()
+    except syntax_validation.SyntaxError as e:
+        return CacheEntry(token_list, symbol_table.symbols, ('syntax', e.message, e.line, e.position))
+    return CacheEntry(token_list, symbol_table.symbols)
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of CacheEntry objects.
+    Entries live in directory/<fingerprint>/ and are keyed by the SHA-256 of
+    the source, so unchanged scripts are never lexed twice. Reads refresh an
+    entry's mtime and put() evicts the least recently used entries once the
+    cache grows past max_bytes. Directories left by other fingerprints, e.g.
+    after TokenType changed, are deleted on open if they carry MARKER_NAME.
+    """
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024, fingerprint: Optional[str] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.fingerprint = fingerprint or schema_fingerprint()
+        self.path = os.path.join(directory, self.fingerprint[:32])
+        self._size: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+        self._make_directory()
+        for name in os.listdir(directory):
+            stale = os.path.join(directory, name)
+            if stale != self.path and _is_fingerprint(name) and os.path.isfile(os.path.join(stale, MARKER_NAME)):
+                shutil.rmtree(stale, ignore_errors=True)
+
+    def key(self, source: str) -> str:
+        return hashlib.sha256(source.encode('utf-8', 'surrogatepass')).hexdigest()
+
+    def get(self, source: str) -> Optional[CacheEntry]:
+        path = os.path.join(self.path, self.key(source))
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            self.misses += 1
+            return None
+        try:
+            entry = CacheEntry.from_bytes(data)
+        except Exception:
+            # corrupt or foreign file: drop it and recompute
+            self.misses += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return entry
+
+    def put(self, source: str, entry: CacheEntry):
+        data = entry.to_bytes()
+        # write to a temporary file first so concurrent readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, os.path.join(self.path, self.key(source)))
+
+        if self._size is None:
+            self._size = self._disk_usage()
+        else:
+            self._size += len(data)
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def analyze(self, source: str, engine: str = 'regex') -> CacheEntry:
+        """Cached analyze_source()."""
+        entry = self.get(source)
+        if entry is None:
+            entry = analyze_source(source, engine)
+            self.put(source, entry)
+        return entry
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        try:
+            items = list(os.scandir(self.path))
+        except FileNotFoundError:
+            # the directory was removed under us, e.g. by another cache's sweep
+            items = []
+        for item in items:
+            if item.is_file() and not item.name.startswith('.'):
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+        entries.sort()
+
+        size = sum(entry[1] for entry in entries)
+        for _, entry_size, path in entries:
+            if size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            size -= entry_size
+        self._size = size
+
+    def clear(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+        self._make_directory()
+        self._size = 0
+
+    def _make_directory(self):
+        os.makedirs(self.path, exist_ok=True)
+        open(os.path.join(self.path, MARKER_NAME), 'a').close()
+
+    def _disk_usage(self) -> int:
+        return sum(item.stat().st_size for item in os.scandir(self.path) if item.is_file())
@@ -0,0 +1,176 @@
+import random
+import string
+from typing import List
+from lexer import KEYWORDS
+
+# identifiers are case-insensitive keywords too
+_KEYWORDS = frozenset(KEYWORDS)
+
+_COMMENT_WORDS = ("total", "is", "now", "loop", "example", "value", "counter", "should", "be", "result")
+
+
+class ProgramGenerator:
+    """
+    Seeded generator of valid scripts built from the constructs of
+    tests.test_cases: assignments, arithmetic, arrays and indexing, compound
+    assignment, ++/--, IF/ELSE, WHILE, FOR ... TO ... STEP, FOR ... IN Range,
+    DO/WHILE, REPEAT/UNTIL, FUNC and CALL.
+    max_depth bounds the nesting of blocks, comment_density is the share of
+    statements followed by a { comment } and identifier_length the length of
+    generated names. The same seed and settings always give the same script.
+    """
+    def __init__(self, seed: int = 0, max_depth: int = 3, comment_density: float = 0.1, identifier_length: int = 8):
+        if identifier_length < 1:
+            raise ValueError("identifier_length must be at least 1")
+        self.random = random.Random(seed)
+        self.max_depth = max_depth
+        self.comment_density = comment_density
+        self.identifier_length = identifier_length
+        self.variables: List[str] = []
+        # (name, parameter count)
+        self.functions: List[tuple] = []
+        self.statements = 0
+
+    def generate(self, size: int) -> str:
+        """A script of at least `size` bytes, cut at the first top-level statement boundary after it."""
+        out: List[str] = []
+        length = 0
+        while length < size:
+            start = len(out)
+            self._statement(out, 0, top_level=True)
+            length += sum(len(piece) for piece in out[start:])
+        return "".join(out)
+
+    # ----------------------------------------
+    # Pieces
+    # ----------------------------------------
+
+    def _name(self) -> str:
+        rng = self.random
+        while True:
+            name = rng.choice(string.ascii_letters) + "".join(
+                rng.choice(string.ascii_letters + string.digits + "_") for _ in range(self.identifier_length - 1)
+            )
+            if name.upper() not in _KEYWORDS:
+                return name
+
+    def _variable(self) -> str:
+        if not self.variables or self.random.random() < 0.1:
+            self.variables.append(self._name())
+        return self.random.choice(self.variables)
+
+    def _operand(self) -> str:
+        rng = self.random
+        choice = rng.random()
+        if choice < 0.4:
+            return str(rng.randint(0, 1000))
+        if choice < 0.85 or not self.functions:
+            return self._variable()
+        if choice < 0.93:
+            return f"{self._variable()}[{rng.randint(0, 9)}]"
+        name, parameter_count = rng.choice(self.functions)
+        if parameter_count == 0:
+            return f"CALL {name}"
+        return f"CALL {name}({', '.join(self._operand() for _ in range(parameter_count))})"
+
+    def _expression(self) -> str:
+        rng = self.random
+        parts = [self._operand()]
+        for _ in range(rng.randint(0, 3)):
+            parts.append(rng.choice("+-*/"))
+            parts.append(self._operand())
+        return " ".join(parts)
+
+    def _condition(self) -> str:
+        rng = self.random
+        condition = f"{self._expression()} {rng.choice(('<', '>', '<=', '>=', '=', '!='))} {self._expression()}"
+        if rng.random() < 0.2:
+            condition += f" {rng.choice(('AND', 'OR'))} {self._variable()} > {rng.randint(0, 100)}"
+        return condition
+
+    def _comment(self) -> str:
+        words = self.random.sample(_COMMENT_WORDS, self.random.randint(1, 5))
+        return "{ " + " ".join(words) + " }"
+
+    # ----------------------------------------
+    # Statements
+    # ----------------------------------------
+
+    def _statement(self, out: List[str], depth: int, top_level: bool = False, in_do: bool = False):
+        rng = self.random
+        indent = "    " * depth
+        self.statements += 1
+        nested = depth < self.max_depth
+        choice = rng.random()
+
+        if top_level and choice < 0.08:
+            self._function(out)
+        elif nested and choice < 0.16:
+            out.append(f"{indent}IF {self._condition()} THEN\n")
+            self._block(out, depth + 1)
+            if rng.random() < 0.5:
+                out.append(f"{indent}ELSE\n")
+                self._block(out, depth + 1)
+            out.append(f"{indent}ENDIF\n")
+        elif nested and choice < 0.21 and not in_do:
+            # a WHILE statement would end an enclosing DO body
+            out.append(f"{indent}WHILE {self._condition()} DO\n")
+            self._block(out, depth + 1)
+            out.append(f"{indent}ENDWHILE\n")
+        elif nested and choice < 0.26:
+            step = f" STEP {rng.randint(1, 5)}" if rng.random() < 0.5 else ""
+            out.append(f"{indent}FOR {self._variable()} = {self._expression()} TO {self._expression()}{step} DO\n")
+            self._block(out, depth + 1)
+            out.append(f"{indent}ENDFOR\n")
+        elif nested and choice < 0.30:
+            out.append(f"{indent}FOR {self._variable()} IN Range({rng.randint(0, 10)}, {rng.randint(10, 100)}, 1) DO\n")
+            self._block(out, depth + 1)
+            out.append(f"{indent}ENDFOR\n")
+        elif nested and choice < 0.33:
+            out.append(f"{indent}DO\n")
+            self._block(out, depth + 1, in_do=True)
+            out.append(f"{indent}WHILE {self._condition()}\n")
+        elif nested and choice < 0.36:
+            out.append(f"{indent}REPEAT\n")
+            self._block(out, depth + 1)
+            out.append(f"{indent}UNTIL {self._condition()}\n")
+        elif choice < 0.42 and self.functions:
+            name, parameter_count = rng.choice(self.functions)
+            if parameter_count == 0:
+                out.append(f"{indent}CALL {name}\n")
+            else:
+                arguments = ", ".join(self._variable() for _ in range(parameter_count))
+                out.append(f"{indent}CALL {name}({arguments})\n")
+        elif choice < 0.50:
+            out.append(f"{indent}{self._variable()} {rng.choice(('+=', '-=', '*=', '/='))} {self._expression()}\n")
+        elif choice < 0.55:
+            out.append(f"{indent}{self._variable()}{rng.choice(('++', '--'))}\n")
+        elif choice < 0.62:
+            elements = ", ".join(self._operand() for _ in range(rng.randint(0, 5)))
+            out.append(f"{indent}LET {self._variable()} = [{elements}]\n")
+        elif choice < 0.66:
+            out.append(f"{indent}LET {self._variable()}[{rng.randint(0, 9)}] = {self._expression()}\n")
+        else:
+            out.append(f"{indent}LET {self._variable()} = {self._expression()}\n")
+
+        if rng.random() < self.comment_density:
+            out.append(f"{indent}{self._comment()}\n")
+
+    def _block(self, out: List[str], depth: int, in_do: bool = False):
+        for _ in range(self.random.randint(1, 4)):
+            self._statement(out, depth, in_do=in_do)
+
+    def _function(self, out: List[str]):
+        rng = self.random
+        name = self._name()
+        parameters = [self._name() for _ in range(rng.randint(0, 3))]
+        out.append(f"FUNC {name}({', '.join(parameters)}) BEGIN\n")
+        self._block(out, 1)
+        out.append(f"    RETURN {self._expression()}\nEND\n")
+        self.statements += 1
+        self.functions.append((name, len(parameters)))
+
+
+def generate_program(size: int, seed: int = 0, max_depth: int = 3, comment_density: float = 0.1,
+                     identifier_length: int = 8) -> str:
+    return ProgramGenerator(seed, max_depth, comment_density, identifier_length).generate(size)
@@ -0,0 +1,463 @@
+from bisect import bisect_left, bisect_right
+from typing import List, Optional, Tuple
+from lexer import LexicalAnalyzer, MASTER_PATTERN, WHITESPACE_PATTERN
+from symbols import CrossReferenceIndex, SymbolTable
+from syntax_validation import SyntaxValidator
+from tokens import LineIndex, Token, TokenOrdinal, TokenType
+import syntax_validation
+
+
+class _Block:
+    """A run of consecutive tokens with a pending offset/line shift."""
+    __slots__ = ('tokens', 'starts', 'flags', 'offset_shift', 'line_shift')
+
+    def __init__(self, tokens: List[Token], starts: List[int], flags: List[bool]):
+        self.tokens = tokens
+        self.starts = starts
+        # flags[i] is True when tokens[i] starts a top-level statement
+        self.flags = flags
+        self.offset_shift = 0
+        self.line_shift = 0
+
+    def normalize(self):
+        if self.offset_shift:
+            shift = self.offset_shift
+            self.starts = [start + shift for start in self.starts]
+            self.offset_shift = 0
+        if self.line_shift:
+            shift = self.line_shift
+            for token in self.tokens:
+                token.line += shift
+            self.line_shift = 0
+
+
+class _DocumentTypes:
+    __slots__ = ('document',)
+
+    def __init__(self, document: 'Document'):
+        self.document = document
+
+    def __getitem__(self, index: int) -> int:
+        if index == self.document._count:
+            return TokenOrdinal.EOF
+        return self.document[index].type._value_
+
+
+class _DocumentTokens:
+    """Token access for CrossReferenceIndex.update(), straight from the blocks."""
+    __slots__ = ('document', 'types', 'count')
+
+    def __init__(self, document: 'Document'):
+        self.document = document
+        self.types = document.types
+        self.count = document._count
+
+    def lexeme(self, index: int) -> str:
+        return self.document[index].lexeme
+
+    def start(self, index: int) -> int:
+        return self.document._token_start(index)
+
+    def index_at(self, offset: int) -> int:
+        return self.document._index_at_offset(offset)
+
+
+class _TokenColumns:
+    """Token access for CrossReferenceIndex.build(), over flat copies of the blocks."""
+    __slots__ = ('tokens', 'starts', 'types', 'count')
+
+    def __init__(self, tokens: List[Token], starts: List[int]):
+        self.tokens = tokens
+        self.starts = starts
+        self.types = bytearray([token.type._value_ for token in tokens])
+        self.count = len(tokens) - 1
+
+    def lexeme(self, index: int) -> str:
+        return self.tokens[index].lexeme
+
+    def start(self, index: int) -> int:
+        return self.starts[index]
+
+    def index_at(self, offset: int) -> int:
+        return bisect_left(self.starts, offset, 0, self.count)
+
+
+class Document:
+    """
+    Source text kept lexed and validated across edits.
+
+    Tokens are stored in blocks whose offset/line shifts are applied lazily, so
+    an edit re-lexes only the damaged region until the token stream
+    resynchronizes with the old one and re-validates only the top-level
+    statements it touches. The tokens and the first error always match what
+    LexicalAnalyzer.tokenize() followed by SyntaxValidator.validate() report
+    for the current text.
+    """
+    BLOCK_SIZE = 512
+
+    def __init__(self, text: str = ""):
+        self.text = ""
+        self._lexer = LexicalAnalyzer(engine='regex')
+        self._blocks: List[_Block] = []
+        self._block_starts: List[int] = []
+        self._block_offsets: List[int] = []
+        self._count = 0
+        self._lex_error: Optional[Exception] = None
+        self._dirty: Optional[Tuple[int, int]] = None
+        # (statement offset, token offset or None for EOF, message) of the first syntax error
+        self._syntax_error: Optional[Tuple[int, Optional[int], str]] = None
+        # statement starts at or after this offset are known to validate through to EOF
+        self._valid_tail = 0
+        self._symbol_table: Optional[SymbolTable] = None
+        self._cross_references: Optional[CrossReferenceIndex] = None
+        self._line_index: Optional[LineIndex] = None
+        # offset from which tokens changed and old offset of the first one kept after them, None for none
+        self._last_change: Tuple[int, Optional[int]] = (0, None)
+        self.apply_edit(0, 0, text)
+
+    # ----------------------------------------
+    # Public API
+    # ----------------------------------------
+
+    def apply_edit(self, start: int, end: int, text: str) -> Tuple[int, int]:
+        """
+        Replace self.text[start:end] with text.
+        Returns the [first, stop) range of token indices that were re-lexed.
+        """
+        if not 0 <= start <= end <= len(self.text):
+            raise ValueError(f"Invalid edit range {start}:{end} for a text of length {len(self.text)}")
+
+        old_text = self.text
+        delta = len(text) - (end - start)
+        line_delta = text.count('\n') - old_text.count('\n', start, end)
+        self.text = old_text[:start] + text + old_text[end:]
+        self._symbol_table = None
+        self._line_index = None
+
+        region_start, region_end = start, end
+        if self._dirty is not None:
+            region_start = min(region_start, self._dirty[0])
+            region_end = max(region_end, self._dirty[1])
+
+        if self._syntax_error is not None:
+            statement, token, message = self._syntax_error
+            self._syntax_error = (
+                self._shift_offset(statement, region_start, region_end, delta),
+                None if token is None else self._shift_offset(token, region_start, region_end, delta),
+                message
+            )
+        self._valid_tail = max(self._valid_tail, region_end) + delta
+
+        first, stop = self._relex(region_start, region_end, delta, line_delta)
+        if self._cross_references is not None:
+            self._cross_references.update(_DocumentTokens(self), *self._last_change, delta)
+        if self._lex_error is None:
+            self._revalidate(first, stop)
+        return first, stop
+
+    @property
+    def error(self) -> Optional[Exception]:
+        """The first lexical or syntax error of the text, None when it is valid."""
+        if self._lex_error is not None:
+            return self._lex_error
+        if self._syntax_error is None:
+            return None
+        _, offset, message = self._syntax_error
+        token = self[len(self) - 1] if offset is None else self[self._index_at_offset(offset)]
+        return syntax_validation.SyntaxError(message, token.line, token.position)
+
+    @property
+    def tokens(self) -> List[Token]:
+        """All tokens, EOF included."""
+        tokens = []
+        for block in self._blocks:
+            block.normalize()
+            tokens.extend(block.tokens)
+        tokens.append(self._eof_token())
+        return tokens
+
+    @property
+    def symbol_table(self) -> SymbolTable:
+        """
+        Symbols as tokenize() detects them. They depend on raw lookahead across
+        the whole text, so they are rebuilt on first access after an edit.
+        """
+        if self._symbol_table is None:
+            self._symbol_table = LexicalAnalyzer(engine='regex').tokenize(self.text)[1]
+        return self._symbol_table
+
+    @property
+    def cross_references(self) -> CrossReferenceIndex:
+        """
+        Definition and use sites of every identifier, with offsets into text.
+        Built on first access and then updated with every edit, rescanning
+        only the part of the index around the re-lexed tokens.
+        """
+        if self._cross_references is None:
+            starts = []
+            for block in self._blocks:
+                block.normalize()
+                starts.extend(block.starts)
+            index = CrossReferenceIndex()
+            index.build(_TokenColumns(self.tokens, starts))
+            self._cross_references = index
+        self._cross_references.line_index = self.line_index
+        return self._cross_references
+
+    @property
+    def line_index(self) -> LineIndex:
+        """Line and position of offsets into text, counted like token positions from the first non-blank character."""
+        if self._line_index is None:
+            self._line_index = LineIndex(self.text, origin=WHITESPACE_PATTERN.match(self.text).end())
+        return self._line_index
+
+    @property
+    def types(self) -> _DocumentTypes:
+        return _DocumentTypes(self)
+
+    def __len__(self) -> int:
+        return self._count + 1
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += self._count + 1
+        if index == self._count:
+            return self._eof_token()
+        block, offset = self._locate(index)
+        return block.tokens[offset]
+
+    # ----------------------------------------
+    # Re-lexing
+    # ----------------------------------------
+
+    def _relex(self, region_start: int, region_end: int, delta: int, line_delta: int) -> Tuple[int, int]:
+        """
+        Re-lex the text around the old [region_start, region_end) range and
+        splice the new tokens in. Scanning stops at the first old token past the
+        region that lines up with a new one on a later line, since from there
+        on both token streams are identical up to an offset/line shift.
+        """
+        text = self.text
+        first = self._index_at_offset(region_start)
+        if first > 0 and self._token_end(first - 1) >= region_start:
+            first -= 1
+
+        if first == 0:
+            pos = WHITESPACE_PATTERN.match(text).end()
+            line = position = 1
+        else:
+            previous = self[first - 1]
+            pos = self._token_end(first - 1)
+            line, position = previous.line, previous.position + len(previous.lexeme)
+
+        new_region_end = region_end + delta
+        resync = self._index_at_offset(region_end)
+        new_tokens, new_starts = [], []
+        try:
+            for token_type, start, end, line, position in self._lexer.scan(text, pos, line, position):
+                if start >= new_region_end:
+                    while resync < self._count and self._token_start(resync) + delta < start:
+                        resync += 1
+                    # columns only match when both tokens sit past an unchanged newline
+                    if (resync < self._count and self._token_start(resync) + delta == start
+                            and line > 1 and self[resync].line > 1
+                            and text.rfind('\n', new_region_end, start) != -1):
+                        line_delta = line - self[resync].line
+                        break
+                new_tokens.append(Token(token_type, text[start:end], line, position))
+                new_starts.append(start)
+            else:
+                resync = self._count
+        except SyntaxError as e:
+            # keep the old tokens past the error; the range up to it stays dirty
+            # and is re-lexed with the next edit until the error is fixed
+            error_from = new_starts[-1] + len(new_tokens[-1].lexeme) if new_tokens else pos
+            dirty_end = max(new_region_end, self._error_offset(error_from) + 1)
+            self._lex_error = e
+            self._dirty = (pos, dirty_end)
+            resync = self._index_at_offset(dirty_end - delta)
+        else:
+            self._lex_error = None
+            self._dirty = None
+
+        self._last_change = (pos, self._token_start(resync) if resync < self._count else None)
+        self._splice(first, resync, new_tokens, new_starts, delta, line_delta)
+        return first, first + len(new_tokens)
+
+    def _error_offset(self, pos: int) -> int:
+        """Offset of the lexical error that follows pos, past any whitespace and comments."""
+        for match in MASTER_PATTERN.finditer(self.text, pos):
+            if match.lastgroup not in ('whitespace', 'comment', 'other'):
+                return match.start()
+        return len(self.text)
+
+    def _splice(self, first: int, stop: int, tokens: List[Token], starts: List[int], delta: int, line_delta: int):
+        """Replace tokens [first, stop) and shift the ones after them."""
+        blocks = self._blocks
+        first_block = bisect_right(self._block_starts, first) - 1 if first < self._count else len(blocks) - 1
+        last_block = bisect_right(self._block_starts, stop) - 1 if stop < self._count else len(blocks) - 1
+        first_block = max(first_block, 0)
+
+        combined_tokens, combined_starts, combined_flags = [], [], []
+        if blocks:
+            head = blocks[first_block]
+            head.normalize()
+            cut = first - self._block_starts[first_block]
+            combined_tokens.extend(head.tokens[:cut])
+            combined_starts.extend(head.starts[:cut])
+            combined_flags.extend(head.flags[:cut])
+
+        combined_tokens.extend(tokens)
+        combined_starts.extend(starts)
+        combined_flags.extend([False] * len(tokens))
+
+        if blocks and stop < self._count:
+            tail = blocks[last_block]
+            tail.normalize()
+            cut = stop - self._block_starts[last_block]
+            for token in tail.tokens[cut:]:
+                token.line += line_delta
+            combined_tokens.extend(tail.tokens[cut:])
+            combined_starts.extend(start + delta for start in tail.starts[cut:])
+            combined_flags.extend(tail.flags[cut:])
+
+        for block in blocks[last_block + 1:]:
+            block.offset_shift += delta
+            block.line_shift += line_delta
+
+        size = self.BLOCK_SIZE
+        replacement = [
+            _Block(combined_tokens[i:i + size], combined_starts[i:i + size], combined_flags[i:i + size])
+            for i in range(0, len(combined_tokens), size)
+        ]
+        blocks[first_block:last_block + 1] = replacement
+        self._count += len(tokens) - (stop - first)
+        self._reindex()
+
+    def _reindex(self):
+        self._block_starts = []
+        self._block_offsets = []
+        count = 0
+        for block in self._blocks:
+            self._block_starts.append(count)
+            self._block_offsets.append(block.starts[0] + block.offset_shift)
+            count += len(block.tokens)
+
+    # ----------------------------------------
+    # Re-validation
+    # ----------------------------------------
+
+    def _revalidate(self, first: int, stop: int):
+        """
+        Re-validate the top-level statements around the re-lexed tokens
+        [first, stop). Validation restarts at the statement holding the token
+        before `first`, whose lookahead may have changed, and stops at the first
+        untouched statement boundary after `stop` that either precedes the old
+        error or is known to validate through to EOF.
+        """
+        error = self._syntax_error
+        error_statement = error[0] if error is not None else None
+        if error is not None:
+            error_index = self._count if error[1] is None else self._index_at_offset(error[1])
+            if first > error_index + 1:
+                return
+
+        def trusted(index: int) -> bool:
+            return error_statement is None or self._token_start(index) <= error_statement
+
+        start = max(first - 1, 0)
+        while start > 0 and not (self._is_statement_start(start) and trusted(start)):
+            start -= 1
+
+        validator = SyntaxValidator(self)
+        validator.current = start
+        while not validator._is_at_end():
+            index = validator.current
+            if index >= stop and index > start and self._is_statement_start(index):
+                offset = self._token_start(index)
+                if error_statement is not None and offset < error_statement:
+                    return
+                if offset >= self._valid_tail:
+                    self._syntax_error = None
+                    self._valid_tail = 0
+                    return
+            self._set_statement_start(index, True)
+            try:
+                validator._validate_statement()
+            except syntax_validation.SyntaxError as e:
+                current = validator.current
+                offset = None if current >= self._count else self._token_start(current)
+                statement = self._token_start(index)
+                self._syntax_error = (statement, offset, e.message)
+                self._valid_tail = max(self._valid_tail, statement + 1)
+                return
+            for inner in range(index + 1, validator.current):
+                self._set_statement_start(inner, False)
+
+        self._syntax_error = None
+        self._valid_tail = 0
+
+    # ----------------------------------------
+    # Utility Functions
+    # ----------------------------------------
+
+    @staticmethod
+    def _shift_offset(offset: int, region_start: int, region_end: int, delta: int) -> int:
+        """Map an offset across an edit; offsets inside the edited region collapse to its start."""
+        if offset >= region_end:
+            return offset + delta
+        return min(offset, region_start)
+
+    def _locate(self, index: int) -> Tuple[_Block, int]:
+        block_index = bisect_right(self._block_starts, index) - 1
+        block = self._blocks[block_index]
+        block.normalize()
+        return block, index - self._block_starts[block_index]
+
+    def _index_at_offset(self, offset: int) -> int:
+        """Index of the first token starting at or after offset."""
+        block_index = bisect_right(self._block_offsets, offset) - 1
+        if block_index < 0:
+            return 0
+        block = self._blocks[block_index]
+        block.normalize()
+        return self._block_starts[block_index] + bisect_left(block.starts, offset)
+
+    def _token_start(self, index: int) -> int:
+        block, offset = self._locate(index)
+        return block.starts[offset]
+
+    def _token_end(self, index: int) -> int:
+        block, offset = self._locate(index)
+        return block.starts[offset] + len(block.tokens[offset].lexeme)
+
+    def _is_statement_start(self, index: int) -> bool:
+        block, offset = self._locate(index)
+        return block.flags[offset]
+
+    def _set_statement_start(self, index: int, value: bool):
+        block, offset = self._locate(index)
+        block.flags[offset] = value
+
+    def _eof_token(self) -> Token:
+        """EOF sits right after the last non-whitespace character, as tokenize() strips the text."""
+        text = self.text
+        end = len(text)
+        while end and text[end - 1].isspace():
+            end -= 1
+        if self._count:
+            last = self[self._count - 1]
+            origin = self._token_start(self._count - 1)
+            line, position = last.line, last.position
+        else:
+            origin = WHITESPACE_PATTERN.match(text).end()
+            line, position = 1, 1
+            end = max(end, origin)
+
+        newlines = text.count('\n', origin, end)
+        if newlines:
+            line += newlines
+            position = end - text.rfind('\n', origin, end)
+        else:
+            position += end - origin
+        return Token(TokenType.EOF, "", line, position)
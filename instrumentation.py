@@ -0,0 +1,204 @@
+import time
+from typing import Callable, Dict, Optional, Tuple
+from lexer import LexicalAnalyzer
+from syntax_validation import SyntaxValidator
+from tokens import TOKEN_TYPES_BY_ORDINAL
+
+# Opt-in instrumentation. instrument_lexer() and instrument_validator() wrap
+# the methods of one instance by setting instance attributes, the way
+# SyntaxValidator.validate_all() reroutes _validate_statement, so objects that
+# are not instrumented run the original code with no extra checks at all.
+
+
+class Metrics:
+    """
+    Named counters, cumulative timers and maxima, each optionally split by one
+    label. Exported as a plain dict or as Prometheus text exposition format.
+    """
+    def __init__(self, prefix: str = ""):
+        self.prefix = prefix
+        # metric -> label value ('' when unlabelled) -> value
+        self.values: Dict[str, Dict[str, float]] = {}
+        # metric -> (Prometheus type, label name or None, help text)
+        self.definitions: Dict[str, Tuple[str, Optional[str], str]] = {}
+
+    def define(self, name: str, kind: str, label: Optional[str], help_text: str) -> Dict[str, float]:
+        """Register a metric ('counter' or 'gauge'); returns its label -> value dict."""
+        if name not in self.definitions:
+            self.definitions[name] = (kind, label, help_text)
+            self.values[name] = {}
+        return self.values[name]
+
+    def to_dict(self) -> Dict[str, object]:
+        """Unlabelled metrics as numbers, labelled ones as label -> number dicts."""
+        result = {}
+        for name, (_, label, _) in self.definitions.items():
+            values = self.values[name]
+            result[name] = dict(values) if label else values.get('', 0)
+        return result
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, (kind, label, help_text) in self.definitions.items():
+            full_name = self.prefix + name
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            values = self.values[name]
+            if label is None:
+                lines.append(f"{full_name} {_format(values.get('', 0))}")
+                continue
+            for label_value, value in sorted(values.items()):
+                escaped = label_value.replace('\\', '\\\\').replace('"', '\\"')
+                lines.append(f'{full_name}{{{label}="{escaped}"}} {_format(value)}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for values in self.values.values():
+            values.clear()
+
+
+def _format(value: float) -> str:
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _timed(method: Callable, label: str, calls: Dict[str, float], seconds: Dict[str, float]) -> Callable:
+    perf_counter = time.perf_counter
+    calls.setdefault(label, 0)
+    seconds.setdefault(label, 0.0)
+
+    def timed(*args):
+        start = perf_counter()
+        try:
+            return method(*args)
+        finally:
+            seconds[label] += perf_counter() - start
+            calls[label] += 1
+    return timed
+
+
+# ----------------------------------------
+# Lexer
+# ----------------------------------------
+
+LEXER_HANDLERS = ('comment', 'number', 'identifier', 'operator')
+
+
+def instrument_lexer(lexer: LexicalAnalyzer, metrics: Optional[Metrics] = None) -> Metrics:
+    """
+    Record tokenize() calls, time, bytes and tokens per engine, and the hits
+    and misses of the analyzer's identifier cache during them. The legacy
+    engine also records calls and cumulative time of each _handle_* method
+    and the bytes _skip_whitespace() skips; the regex and table engines
+    handle every token kind inside one loop, so they only have the totals.
+    """
+    metrics = metrics if metrics is not None else Metrics()
+    tokenize_calls = metrics.define('lexer_tokenize_calls_total', 'counter', 'engine', "tokenize() calls")
+    tokenize_seconds = metrics.define('lexer_tokenize_seconds_total', 'counter', 'engine', "Time spent in tokenize()")
+    source_bytes = metrics.define('lexer_source_bytes_total', 'counter', 'engine', "Source characters tokenized")
+    token_count = metrics.define('lexer_tokens_total', 'counter', 'engine', "Tokens produced, EOF included")
+    handler_calls = metrics.define('lexer_handler_calls_total', 'counter', 'handler', "Token handler calls")
+    handler_seconds = metrics.define(
+        'lexer_handler_seconds_total', 'counter', 'handler', "Cumulative time spent in each token handler"
+    )
+    skipped = metrics.define('lexer_whitespace_bytes_skipped_total', 'counter', None, "Characters skipped as whitespace")
+    cache_hits = metrics.define(
+        'lexer_identifier_cache_hits_total', 'counter', None, "Identifiers found in the identifier cache"
+    )
+    cache_misses = metrics.define(
+        'lexer_identifier_cache_misses_total', 'counter', None, "Identifiers added to the identifier cache"
+    )
+    cache_size = metrics.define('lexer_identifier_cache_size', 'gauge', None, "Spellings held by the identifier cache")
+
+    for handler in LEXER_HANDLERS:
+        attribute = f'_handle_{handler}'
+        setattr(lexer, attribute, _timed(getattr(lexer, attribute), handler, handler_calls, handler_seconds))
+
+    skip_whitespace = lexer._skip_whitespace
+    skipped.setdefault('', 0)
+
+    def counted_skip_whitespace():
+        start = lexer.current_pos
+        skip_whitespace()
+        skipped[''] += lexer.current_pos - start
+    lexer._skip_whitespace = counted_skip_whitespace
+
+    tokenize = lexer.tokenize
+    timed_tokenize = _timed(tokenize, lexer.engine, tokenize_calls, tokenize_seconds)
+
+    identifier_cache = lexer.identifier_cache
+    for values in (cache_hits, cache_misses, cache_size):
+        values.setdefault('', 0)
+
+    def counted_tokenize(source_code: str, compact: bool = False, lazy_positions: bool = False):
+        hits, misses = identifier_cache.hits, identifier_cache.misses
+        tokens, symbol_table = timed_tokenize(source_code, compact, lazy_positions)
+        engine = lexer.engine
+        source_bytes[engine] = source_bytes.get(engine, 0) + len(source_code)
+        token_count[engine] = token_count.get(engine, 0) + len(tokens)
+        cache_hits[''] += identifier_cache.hits - hits
+        cache_misses[''] += identifier_cache.misses - misses
+        cache_size[''] = len(identifier_cache.entries)
+        return tokens, symbol_table
+    lexer.tokenize = counted_tokenize
+    return metrics
+
+
+# ----------------------------------------
+# Validator
+# ----------------------------------------
+
+class _DepthTrackingList(list):
+    """scope_stack that remembers the deepest it has been."""
+    __slots__ = ('maximum',)
+
+    def __init__(self, maximum: Dict[str, float]):
+        super().__init__()
+        self.maximum = maximum
+
+    def append(self, item):
+        super().append(item)
+        if len(self) > self.maximum['']:
+            self.maximum[''] = len(self)
+
+
+def instrument_validator(validator: SyntaxValidator, metrics: Optional[Metrics] = None) -> Metrics:
+    """
+    Record calls, cumulative time and tokens consumed per statement kind and
+    the deepest scope_stack. Times and tokens of a statement include the
+    statements nested in it. Statements are only visible to the recursive
+    engine, so the iterative one is refused.
+    """
+    if validator.engine != 'recursive':
+        raise ValueError("Statement instrumentation needs the recursive validator engine")
+    metrics = metrics if metrics is not None else Metrics()
+    statement_calls = metrics.define('validator_statements_total', 'counter', 'kind', "Statements validated")
+    statement_seconds = metrics.define(
+        'validator_statement_seconds_total', 'counter', 'kind', "Time spent per statement kind, nested statements included"
+    )
+    statement_tokens = metrics.define(
+        'validator_statement_tokens_total', 'counter', 'kind', "Tokens consumed per statement kind, nested statements included"
+    )
+    scope_depth = metrics.define('validator_scope_depth_max', 'gauge', None, "Deepest scope_stack seen")
+    scope_depth.setdefault('', 0)
+
+    def counted(method: Callable, kind: str) -> Callable:
+        timed = _timed(method, kind, statement_calls, statement_seconds)
+        statement_tokens.setdefault(kind, 0)
+
+        def counted_statement(*args):
+            start = validator.current
+            try:
+                return timed(*args)
+            finally:
+                statement_tokens[kind] += validator.current - start
+        return counted_statement
+
+    # handlers are looked up on the instance first, so an instance copy of the table reroutes dispatch
+    validator.STATEMENT_HANDLERS = {
+        token_type: counted(handler, TOKEN_TYPES_BY_ORDINAL[token_type].name)
+        for token_type, handler in type(validator).STATEMENT_HANDLERS.items()
+    }
+    validator._validate_increment_decrement = counted(validator._validate_increment_decrement, 'INCREMENT_DECREMENT')
+    validator._validate_compound_assignment = counted(validator._validate_compound_assignment, 'COMPOUND_ASSIGNMENT')
+    validator.scope_stack = _DepthTrackingList(scope_depth)
+    return metrics
@@ -1,57 +1,286 @@
+import mmap
+import os
 import re
+import sys
+from array import array
+from concurrent.futures import Executor, ProcessPoolExecutor
 from enum import Enum, auto
-from typing import List, Dict, Tuple, Optional
-from tokens import Token, TokenType, print_tokens_table
+from typing import List, Dict, Tuple, Optional, Iterator, TextIO, Union
+from tokens import (
+    LineIndex, MappedTokenBuffer, OffsetTokenBuffer, TOKEN_TYPES_BY_ORDINAL, Token, TokenBuffer, TokenType,
+    print_tokens_table,
+)
 from symbols import SymbolTable
 
-class LexicalAnalyzer:
-    def __init__(self):
-        self.keywords = {
-            'LET': TokenType.LET,
-            'IF': TokenType.IF,
-            'THEN': TokenType.THEN,
-            'ELSE': TokenType.ELSE,
-            'ENDIF': TokenType.ENDIF,
-            'WHILE': TokenType.WHILE,
-            'DO': TokenType.DO,
-            'ENDWHILE': TokenType.ENDWHILE,
-            'FOR': TokenType.FOR,
-            'TO': TokenType.TO,
-            'STEP': TokenType.STEP,
-            'ENDFOR': TokenType.ENDFOR,
-            'IN': TokenType.IN,
-            'REPEAT': TokenType.REPEAT,
-            'UNTIL': TokenType.UNTIL,
-            'FUNC': TokenType.FUNC,
-            'BEGIN': TokenType.BEGIN,
-            'RETURN': TokenType.RETURN,
-            'END': TokenType.END,
-            'CALL': TokenType.CALL,
-            'AND': TokenType.AND,
-            'OR': TokenType.OR,
-            'NOT': TokenType.NOT
-        }
-        
-        self.operators = {
-            '+': TokenType.PLUS,
-            '-': TokenType.MINUS,
-            '*': TokenType.MULTIPLY,
-            '/': TokenType.DIVIDE,
-            '=': TokenType.EQUAL,
-            '>': TokenType.GREATER,
-            '<': TokenType.LESS,
-            '!=': TokenType.NOT_EQUAL,
-            '+=': TokenType.PLUS_EQUAL,
-            '-=': TokenType.MINUS_EQUAL,
-            '*=': TokenType.MULTIPLY_EQUAL,
-            '/=': TokenType.DIVIDE_EQUAL,
-            '++': TokenType.INCREMENT,
-            '--': TokenType.DECREMENT,
-            '==': TokenType.EQUAL_EQUAL,
-            '>=': TokenType.GREATER_EQUAL,
-            '<=': TokenType.SMALLER_EQUAL,
+# single combined pattern used by the "regex" engine; alternatives are tried in
+# order so the first group that matches decides the token kind
+MASTER_PATTERN = re.compile(r"""
+    (?P<whitespace>\s+)
+  | (?P<comment>\{[^}]*\})
+  | (?P<unclosed_comment>\{)
+  | (?P<number>[0-9]+)
+  | (?P<identifier>[a-zA-Z_][a-zA-Z0-9_]*)
+  | (?P<operator>[+\-]{2}|[+\-*/=<>!]=?)
+  | (?P<delimiter>[()\[\],])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+# MASTER_PATTERN for tokenize(lazy_positions=True): the whitespace and comments
+# before a token are skipped inside its match, so each match is one token, or
+# the end of the source. '{' only matches as an unclosed comment, which keeps
+# the skipped prefix from backtracking into comment text.
+OFFSET_PATTERN = re.compile(r"""
+    (?:\s|\{[^}]*\})*
+    (?:
+        (?P<number>[0-9]+)
+      | (?P<identifier>[a-zA-Z_][a-zA-Z0-9_]*)
+      | (?P<operator>[+\-]{2}|[+\-*/=<>!]=?)
+      | (?P<delimiter>[()\[\],])
+      | (?P<unclosed_comment>\{)
+      | (?P<end>\Z)
+      | (?P<other>.)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+CALL_TARGET_PATTERN = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)')
+WHITESPACE_PATTERN = re.compile(r'\s*')
+
+# Recognition tables, built once at import and shared by every analyzer.
+# Keywords are case-insensitive and matched by upper-casing the identifier:
+# in CPython one str.upper() and one dict probe beat length-bucketed tables,
+# which need more bytecode per identifier. The engines go one step further
+# and look spellings up in an IdentifierCache, which does the upper() once
+# per distinct spelling.
+KEYWORDS = {
+    'LET': TokenType.LET,
+    'IF': TokenType.IF,
+    'THEN': TokenType.THEN,
+    'ELSE': TokenType.ELSE,
+    'ENDIF': TokenType.ENDIF,
+    'WHILE': TokenType.WHILE,
+    'DO': TokenType.DO,
+    'ENDWHILE': TokenType.ENDWHILE,
+    'FOR': TokenType.FOR,
+    'TO': TokenType.TO,
+    'STEP': TokenType.STEP,
+    'ENDFOR': TokenType.ENDFOR,
+    'IN': TokenType.IN,
+    'REPEAT': TokenType.REPEAT,
+    'UNTIL': TokenType.UNTIL,
+    'FUNC': TokenType.FUNC,
+    'BEGIN': TokenType.BEGIN,
+    'RETURN': TokenType.RETURN,
+    'END': TokenType.END,
+    'CALL': TokenType.CALL,
+    'AND': TokenType.AND,
+    'OR': TokenType.OR,
+    'NOT': TokenType.NOT
+}
+
+OPERATORS = {
+    '+': TokenType.PLUS,
+    '-': TokenType.MINUS,
+    '*': TokenType.MULTIPLY,
+    '/': TokenType.DIVIDE,
+    '=': TokenType.EQUAL,
+    '>': TokenType.GREATER,
+    '<': TokenType.LESS,
+    '!=': TokenType.NOT_EQUAL,
+    '+=': TokenType.PLUS_EQUAL,
+    '-=': TokenType.MINUS_EQUAL,
+    '*=': TokenType.MULTIPLY_EQUAL,
+    '/=': TokenType.DIVIDE_EQUAL,
+    '++': TokenType.INCREMENT,
+    '--': TokenType.DECREMENT,
+    '==': TokenType.EQUAL_EQUAL,
+    '>=': TokenType.GREATER_EQUAL,
+    '<=': TokenType.SMALLER_EQUAL,
+}
+
+PATTERNS = {
+    'number': r'[0-9]+',
+    'identifier': r'[a-zA-Z_][a-zA-Z0-9_]*',
+    'operator': r'[+\-]{2}|[+\-*/=<>!]=?',
+    'delimiter': r'[\(\)\[\],]',
+    'whitespace': r'\s+',
+    'comment': r'\{[^}]*\}'
+}
+
+COMPILED_PATTERNS = {name: re.compile(pattern) for name, pattern in PATTERNS.items()}
+
+OPERATOR_CHARACTERS = '+-*/=<>!'
+
+
+def _operator_dispatch_table() -> Tuple[Tuple[Tuple[str, Optional[TokenType]], ...], ...]:
+    """
+    For each character code, the operator lexemes starting with it, longest
+    first, as PATTERNS['operator'] would match them. Lexemes the pattern
+    matches but OPERATORS lacks (such as '+-' or '!') map to None, which the
+    lexer reports as an invalid operator.
+    """
+    pattern = COMPILED_PATTERNS['operator']
+    table = [()] * 256
+    for first in OPERATOR_CHARACTERS:
+        candidates = {first: OPERATORS.get(first)}
+        for second in OPERATOR_CHARACTERS:
+            lexeme = pattern.match(first + second).group()
+            if len(lexeme) == 2:
+                candidates[lexeme] = OPERATORS.get(lexeme)
+        table[ord(first)] = tuple(sorted(candidates.items(), key=lambda candidate: -len(candidate[0])))
+    return tuple(table)
+
+
+OPERATOR_DISPATCH = _operator_dispatch_table()
+
+DELIMITERS = {
+    '(': TokenType.LEFT_PAREN,
+    ')': TokenType.RIGHT_PAREN,
+    '[': TokenType.LEFT_BRACKET,
+    ']': TokenType.RIGHT_BRACKET,
+    ',': TokenType.COMMA,
+}
+
+
+class IdentifierCache:
+    """
+    Identifier spelling -> (interned spelling, upper-case form, keyword
+    TokenType or IDENTIFIER). A spelling seen before costs one dict probe
+    instead of a str.upper() and a keyword lookup, and every token of one
+    spelling shares one string. At most max_size spellings are kept; a new
+    one arriving when full empties the cache first, so a stream of distinct
+    names cannot grow it without bound. hits and misses count lookups since
+    the last reset_statistics(); engines add their hits when tokenize()
+    returns.
+    """
+    def __init__(self, max_size: int = 65536):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.max_size = max_size
+        self.entries: Dict[str, Tuple[str, str, TokenType]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.resets = 0
+
+    def lookup(self, lexeme: str) -> Tuple[str, str, TokenType]:
+        entry = self.entries.get(lexeme)
+        if entry is None:
+            return self.add(lexeme)
+        self.hits += 1
+        return entry
+
+    def add(self, lexeme: str) -> Tuple[str, str, TokenType]:
+        """Entry of a spelling that missed the cache, counted as a miss."""
+        self.misses += 1
+        entries = self.entries
+        if len(entries) >= self.max_size:
+            entries.clear()
+            self.resets += 1
+        lexeme = sys.intern(lexeme)
+        upper = sys.intern(lexeme.upper())
+        entry = entries[lexeme] = (lexeme, upper, KEYWORDS.get(upper, TokenType.IDENTIFIER))
+        return entry
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def statistics(self) -> Dict[str, float]:
+        return {
+            'size': len(self.entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'resets': self.resets,
         }
-        
+
+    def reset_statistics(self):
+        self.hits = self.misses = self.resets = 0
+
+    def clear(self):
+        self.entries.clear()
+
+
+# shared by every analyzer not given a cache of its own
+IDENTIFIER_CACHE = IdentifierCache()
+
+# bytes versions for tokenize_file(); in bytes patterns \s only matches ASCII
+# whitespace, other whitespace is skipped character by character instead,
+# which advances the position the same way
+BYTE_MASTER_PATTERN = re.compile(MASTER_PATTERN.pattern.encode(), re.VERBOSE | re.DOTALL)
+BYTE_DELIMITERS = {lexeme.encode(): token_type for lexeme, token_type in DELIMITERS.items()}
+BYTE_KEYWORDS = {name.encode(): token_type for name, token_type in KEYWORDS.items()}
+BYTE_OPERATORS = {lexeme.encode(): token_type for lexeme, token_type in OPERATORS.items()}
+# UTF-8 encoded characters that str.isspace(), and so str.strip(), accepts
+_BYTE_WHITESPACE = (
+    rb'(?:[\t\n\x0b\x0c\r\x1c-\x1f ]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)'
+)
+BYTE_STRIP_PATTERN = re.compile(_BYTE_WHITESPACE + rb'+')
+BYTE_CALL_TARGET_PATTERN = re.compile(_BYTE_WHITESPACE + rb'*([a-zA-Z_][a-zA-Z0-9_]*)')
+# the three byte ones, for stripping the end
+_BYTE_STRIP_TAILS = frozenset((
+    b'\xe1\x9a\x80', b'\xe2\x80\xa8', b'\xe2\x80\xa9', b'\xe2\x80\xaf', b'\xe2\x81\x9f', b'\xe3\x80\x80',
+)) | frozenset(b'\xe2\x80' + bytes([last]) for last in range(0x80, 0x8b))
+
+# character classes of the "table" engine, indexed by character code; every
+# character past the table is whitespace if str.isspace() says so, else other
+_WHITESPACE, _LETTER, _DIGIT, _OPERATOR, _DELIMITER, _COMMENT, _OTHER = range(7)
+
+
+def _character_classes() -> Tuple[int, ...]:
+    classes = []
+    for code in range(128):
+        char = chr(code)
+        if char.isspace():
+            classes.append(_WHITESPACE)
+        elif 'a' <= char.lower() <= 'z' or char == '_':
+            classes.append(_LETTER)
+        elif '0' <= char <= '9':
+            classes.append(_DIGIT)
+        elif char in OPERATOR_CHARACTERS:
+            classes.append(_OPERATOR)
+        elif char in DELIMITERS:
+            classes.append(_DELIMITER)
+        elif char == '{':
+            classes.append(_COMMENT)
+        else:
+            classes.append(_OTHER)
+    return tuple(classes)
+
+
+CHARACTER_CLASSES = _character_classes()
+
+ENGINES = ('legacy', 'regex', 'table')
+
+
+class LexicalError(SyntaxError):
+    """
+    What the lexer raises, with the line and position its message names;
+    position is None for an unclosed comment, reported by line only. str()
+    is the message alone, as for a plain SyntaxError.
+    """
+    def __init__(self, message: str, line: Optional[int] = None, position: Optional[int] = None):
+        super().__init__(message)
+        self.line = line
+        self.position = position
+
+    def __reduce__(self):
+        # SyntaxError pickles args only; worker processes send these back
+        return type(self), (self.args[0], self.line, self.position)
+
+
+class LexicalAnalyzer:
+    def __init__(self, engine: str = 'legacy', identifier_cache: Optional[IdentifierCache] = None):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown lexer engine '{engine}', expected one of {', '.join(ENGINES)}")
+        self.engine = engine
+        self.identifier_cache = identifier_cache if identifier_cache is not None else IDENTIFIER_CACHE
+
+        # shared module-level tables, kept as attributes for existing callers
+        self.keywords = KEYWORDS
+        self.operators = OPERATORS
+
         self.source_code = ""
         self.tokens: List[Token] = []
         self.current_pos = 0
@@ -59,20 +288,26 @@ class LexicalAnalyzer:
         self.position = 1
         self.symbol_table = SymbolTable()
         
-        self.patterns = {
-            'number': r'[0-9]+',
-            'identifier': r'[a-zA-Z_][a-zA-Z0-9_]*',
-            'operator': r'[+\-]{2}|[+\-*/=<>!]=?',
-            'delimiter': r'[\(\)\[\],]',
-            'whitespace': r'\s+',
-            'comment': r'\{[^}]*\}'
-        }
-        
-        self.compiled_patterns = {
-            name: re.compile(pattern) 
-            for name, pattern in self.patterns.items()
-        }
-    def tokenize(self, source_code: str) -> Tuple[List[Token], SymbolTable]:
+        self.patterns = PATTERNS
+        self.compiled_patterns = COMPILED_PATTERNS
+
+    def tokenize(self, source_code: str, compact: bool = False,
+                 lazy_positions: bool = False) -> Tuple[Union[List[Token], TokenBuffer], SymbolTable]:
+        """
+        Tokenize source_code and return the tokens with the symbol table.
+        compact=True returns a columnar TokenBuffer instead of a list; it is
+        always filled by the single-pass scanner, whatever the engine.
+        lazy_positions=True returns an OffsetTokenBuffer whose tokens only
+        store their offset and look up line and position when read, with the
+        same values as the other engines; no engine counts lines on the way.
+        """
+        if lazy_positions:
+            return self._tokenize_offsets(source_code)
+        if compact or self.engine == 'regex':
+            return self._tokenize_regex(source_code, compact)
+        if self.engine == 'table':
+            return self._tokenize_table(source_code)
+
         self.source_code = source_code.strip()
         self.current_pos = 0
         self.tokens = []
@@ -117,6 +352,667 @@ class LexicalAnalyzer:
         self.tokens.append(Token(TokenType.EOF, "", self.line, self.position))
         return self.tokens, self.symbol_table
 
+    def _tokenize_regex(self, source_code: str, compact: bool = False) -> Tuple[Union[List[Token], TokenBuffer], SymbolTable]:
+        """
+        Single pass over the source with MASTER_PATTERN.
+        Produces the same tokens and symbols as the legacy engine without ever
+        slicing the remaining source. With compact=True the tokens are stored
+        in a TokenBuffer instead of one Token object each.
+        """
+        src = self.source_code = source_code.strip()
+        tokens = TokenBuffer(src) if compact else []
+        self.tokens = tokens
+        identifier_cache = self.identifier_cache
+        cached = identifier_cache.entries.get
+        hits = 0
+        operators = OPERATORS
+        line = self.line
+        position = self.position
+        prev_type = None
+
+        for match in MASTER_PATTERN.finditer(src):
+            kind = match.lastgroup
+            start, end = match.span()
+
+            if kind == 'whitespace' or kind == 'comment':
+                newlines = src.count('\n', start, end)
+                if newlines:
+                    line += newlines
+                    position = end - src.rfind('\n', start, end)
+                else:
+                    position += end - start
+                continue
+
+            if kind == 'identifier':
+                entry = cached(match.group())
+                if entry is None:
+                    entry = identifier_cache.add(match.group())
+                else:
+                    hits += 1
+                lexeme, _, token_type = entry
+                if token_type == TokenType.CALL:
+                    self._record_call_target(src, end)
+                if prev_type == TokenType.LET:
+                    self.symbol_table.set_symbol(lexeme, 'integer')
+                elif prev_type == TokenType.FUNC:
+                    self.symbol_table.set_symbol(lexeme, 'function')
+            elif kind == 'number':
+                token_type = TokenType.NUMBER
+            elif kind == 'operator':
+                token_type = operators.get(match.group())
+                if token_type is None:
+                    identifier_cache.hits += hits
+                    raise LexicalError(f"Invalid operator at line {line}, position {position}", line, position)
+            elif kind == 'delimiter':
+                token_type = DELIMITERS[match.group()]
+            elif kind == 'unclosed_comment':
+                identifier_cache.hits += hits
+                line += src.count('\n', start)
+                raise LexicalError(f"Unclosed comment starting at line {line}", line)
+            else:
+                # unknown characters are skipped, as in the legacy engine
+                position += 1
+                continue
+
+            if compact:
+                tokens.append(token_type, start, end, line, position)
+            else:
+                tokens.append(Token(token_type, lexeme if kind == 'identifier' else match.group(), line, position))
+            prev_type = token_type
+            position += end - start
+
+        identifier_cache.hits += hits
+        self.line = line
+        self.position = position
+        self.current_pos = len(src)
+        if compact:
+            tokens.append(TokenType.EOF, len(src), len(src), line, position)
+        else:
+            tokens.append(Token(TokenType.EOF, "", line, position))
+        return tokens, self.symbol_table
+
+    def _tokenize_offsets(self, source_code: str) -> Tuple[OffsetTokenBuffer, SymbolTable]:
+        """
+        Single pass over the source with OFFSET_PATTERN, recording offsets
+        only. Line and position are left to a LineIndex, which errors and
+        token reads consult.
+        """
+        src = self.source_code = source_code.strip()
+        line_index = LineIndex(src, self.line, self.position)
+        tokens = OffsetTokenBuffer(src, line_index)
+        self.tokens = tokens
+        append = tokens.append
+        identifier_cache = self.identifier_cache
+        cached = identifier_cache.entries.get
+        hits = 0
+        operators = OPERATORS
+        prev_type = None
+
+        for match in OFFSET_PATTERN.finditer(src):
+            kind = match.lastgroup
+            if kind == 'identifier':
+                start, end = match.span(kind)
+                lexeme = src[start:end]
+                entry = cached(lexeme)
+                if entry is None:
+                    entry = identifier_cache.add(lexeme)
+                else:
+                    hits += 1
+                lexeme, _, token_type = entry
+                if token_type == TokenType.CALL:
+                    self._record_call_target(src, end)
+                if prev_type == TokenType.LET:
+                    self.symbol_table.set_symbol(lexeme, 'integer')
+                elif prev_type == TokenType.FUNC:
+                    self.symbol_table.set_symbol(lexeme, 'function')
+            elif kind == 'number':
+                start, end = match.span(kind)
+                token_type = TokenType.NUMBER
+            elif kind == 'operator':
+                start, end = match.span(kind)
+                token_type = operators.get(src[start:end])
+                if token_type is None:
+                    identifier_cache.hits += hits
+                    line, position = line_index.locate(start)
+                    raise LexicalError(f"Invalid operator at line {line}, position {position}", line, position)
+            elif kind == 'delimiter':
+                start, end = match.span(kind)
+                token_type = DELIMITERS[src[start:end]]
+            elif kind == 'end':
+                break
+            elif kind == 'unclosed_comment':
+                identifier_cache.hits += hits
+                line = self.line + src.count('\n')
+                raise LexicalError(f"Unclosed comment starting at line {line}", line)
+            else:
+                continue
+
+            append(token_type, start, end)
+            prev_type = token_type
+
+        identifier_cache.hits += hits
+        # where the other engines leave off, without building the index
+        length = len(src)
+        newline = src.rfind('\n')
+        if newline == -1:
+            self.position += length
+        else:
+            self.line += src.count('\n')
+            self.position = length - newline
+        self.current_pos = length
+        append(TokenType.EOF, length, length)
+        return tokens, self.symbol_table
+
+    def _tokenize_table(self, source_code: str) -> Tuple[List[Token], SymbolTable]:
+        """
+        The legacy engine's character dispatch, driven by CHARACTER_CLASSES.
+        The class of a token's first character picks its handler, runs of
+        whitespace, letters and digits are matched in one call each and
+        comments end at str.find('}'). The cursor lives in locals and is
+        written back to the analyzer once, at the end. Tokens and symbols are
+        the same as the regex engine's; unlike the legacy engine, non-ASCII
+        letters and digits are skipped as unknown characters.
+        """
+        src = self.source_code = source_code.strip()
+        tokens = self.tokens = []
+        append = tokens.append
+        classes = CHARACTER_CLASSES
+        match_whitespace = COMPILED_PATTERNS['whitespace'].match
+        match_identifier = COMPILED_PATTERNS['identifier'].match
+        match_number = COMPILED_PATTERNS['number'].match
+        identifier_cache = self.identifier_cache
+        cached = identifier_cache.entries.get
+        hits = 0
+        set_symbol = self.symbol_table.set_symbol
+        length = len(src)
+        pos = 0
+        line = self.line
+        position = self.position
+        prev_type = None
+
+        while pos < length:
+            char = src[pos]
+            if char == ' ':
+                # single spaces between tokens are the commonest case; splitting
+                # a whitespace run changes neither line nor position
+                position += 1
+                pos += 1
+                continue
+            code = ord(char)
+            if code < 128:
+                kind = classes[code]
+            else:
+                kind = _WHITESPACE if char.isspace() else _OTHER
+
+            if kind == _WHITESPACE:
+                end = match_whitespace(src, pos).end()
+                newline = src.rfind('\n', pos, end)
+                if newline != -1:
+                    line += src.count('\n', pos, newline + 1)
+                    position = end - newline
+                else:
+                    position += end - pos
+                pos = end
+                continue
+
+            if kind == _LETTER:
+                end = match_identifier(src, pos).end()
+                entry = cached(src[pos:end])
+                if entry is None:
+                    entry = identifier_cache.add(src[pos:end])
+                else:
+                    hits += 1
+                lexeme, _, token_type = entry
+                if token_type == TokenType.CALL:
+                    self._record_call_target(src, end)
+                if prev_type == TokenType.LET:
+                    set_symbol(lexeme, 'integer')
+                elif prev_type == TokenType.FUNC:
+                    set_symbol(lexeme, 'function')
+            elif kind == _OPERATOR:
+                for lexeme, token_type in OPERATOR_DISPATCH[code]:
+                    if src.startswith(lexeme, pos):
+                        break
+                if token_type is None:
+                    identifier_cache.hits += hits
+                    self.line, self.position, self.current_pos = line, position, pos
+                    raise LexicalError(f"Invalid operator at line {line}, position {position}", line, position)
+                end = pos + len(lexeme)
+            elif kind == _DELIMITER:
+                lexeme = char
+                token_type = DELIMITERS[char]
+                end = pos + 1
+            elif kind == _DIGIT:
+                end = match_number(src, pos).end()
+                lexeme = src[pos:end]
+                token_type = TokenType.NUMBER
+            elif kind == _COMMENT:
+                end = src.find('}', pos + 1)
+                if end == -1:
+                    identifier_cache.hits += hits
+                    line += src.count('\n', pos)
+                    self.line, self.position, self.current_pos = line, position, length
+                    raise LexicalError(f"Unclosed comment starting at line {line}", line)
+                end += 1
+                newline = src.rfind('\n', pos, end)
+                if newline != -1:
+                    line += src.count('\n', pos, newline + 1)
+                    position = end - newline
+                else:
+                    position += end - pos
+                pos = end
+                continue
+            else:
+                position += 1
+                pos += 1
+                continue
+
+            append(Token(token_type, lexeme, line, position))
+            prev_type = token_type
+            position += end - pos
+            pos = end
+
+        identifier_cache.hits += hits
+        self.line = line
+        self.position = position
+        self.current_pos = length
+        append(Token(TokenType.EOF, "", line, position))
+        return tokens, self.symbol_table
+
+    def tokenize_file(self, path: str) -> Tuple[MappedTokenBuffer, SymbolTable]:
+        """
+        Tokenize a UTF-8 file by memory-mapping it and scanning its bytes, so
+        neither the file nor a stripped copy of it is loaded as a str. Returns
+        the same tokens and symbols as tokenize() on the decoded contents
+        (without newline translation, as with open(path, newline='')), in a
+        MappedTokenBuffer whose lexemes are decoded on access; close it to
+        release the mapping.
+        """
+        with open(path, 'rb') as file:
+            size = file.seek(0, 2)
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+
+        # the bounds of data.strip(), without the copy
+        begin = 0
+        match = BYTE_STRIP_PATTERN.match(data)
+        if match:
+            begin = match.end()
+        end = len(data)
+        while end > begin:
+            if data[end - 1] in b'\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f ':
+                end -= 1
+            elif data[max(begin, end - 2):end] in (b'\xc2\x85', b'\xc2\xa0'):
+                end -= 2
+            elif data[max(begin, end - 3):end] in _BYTE_STRIP_TAILS:
+                end -= 3
+            else:
+                break
+
+        tokens = MappedTokenBuffer(data)
+        self.tokens = tokens
+        keywords = BYTE_KEYWORDS
+        operators = BYTE_OPERATORS
+        line = self.line
+        position = self.position
+        prev_type = None
+
+        for match in BYTE_MASTER_PATTERN.finditer(data, begin, end):
+            kind = match.lastgroup
+            start, stop = match.span()
+
+            if kind == 'whitespace':
+                newline = data.rfind(b'\n', start, stop)
+                if newline != -1:
+                    line += match.group().count(b'\n')
+                    position = stop - newline
+                else:
+                    position += stop - start
+                continue
+
+            if kind == 'comment':
+                text = match.group()
+                newline = text.rfind(b'\n')
+                if newline != -1:
+                    line += text.count(b'\n')
+                    text = text[newline + 1:]
+                    position = 1
+                # comments may hold multi-byte characters; positions count characters
+                position += len(text) if text.isascii() else len(text.decode('utf-8', 'replace'))
+                continue
+
+            if kind == 'identifier':
+                lexeme = match.group()
+                token_type = keywords.get(lexeme.upper(), TokenType.IDENTIFIER)
+                if token_type == TokenType.CALL:
+                    self._record_byte_call_target(data, stop, end)
+                if prev_type == TokenType.LET:
+                    self.symbol_table.set_symbol(lexeme.decode('ascii'), 'integer')
+                elif prev_type == TokenType.FUNC:
+                    self.symbol_table.set_symbol(lexeme.decode('ascii'), 'function')
+            elif kind == 'number':
+                token_type = TokenType.NUMBER
+            elif kind == 'operator':
+                token_type = operators.get(match.group())
+                if token_type is None:
+                    raise LexicalError(f"Invalid operator at line {line}, position {position}", line, position)
+            elif kind == 'delimiter':
+                token_type = BYTE_DELIMITERS[match.group()]
+            elif kind == 'unclosed_comment':
+                line += data[start:end].count(b'\n')
+                raise LexicalError(f"Unclosed comment starting at line {line}", line)
+            else:
+                # unknown characters are skipped; UTF-8 continuation bytes are
+                # part of the character before them
+                if not 0x80 <= data[start] < 0xC0:
+                    position += 1
+                continue
+
+            tokens.append(token_type, start, stop, line, position)
+            prev_type = token_type
+            position += stop - start
+
+        self.line = line
+        self.position = position
+        self.current_pos = end
+        tokens.append(TokenType.EOF, end, end, line, position)
+        return tokens, self.symbol_table
+
+    def _record_byte_call_target(self, data, next_pos: int, end: int):
+        """_record_call_target() on the stripped bytes data[:end]."""
+        func_match = BYTE_CALL_TARGET_PATTERN.match(data, next_pos, end)
+        if not func_match:
+            return
+        func_name = func_match.group(1).decode('ascii')
+        params = []
+
+        next_pos = func_match.end()
+        if next_pos < end and data[next_pos:next_pos + 1] == b'(':
+            param_end = data.find(b')', next_pos + 1, end)
+            if param_end != -1:
+                param_str = data[next_pos + 1:param_end].decode('utf-8', 'replace')
+                params = [p.strip() for p in param_str.split(',') if p.strip()]
+
+        self.symbol_table.set_symbol(func_name, 'function', params)
+
+    def tokenize_parallel(self, source_code: str, jobs: Optional[int] = None, compact: bool = False,
+                          chunk_size: int = 1 << 20,
+                          executor: Optional[Executor] = None) -> Tuple[Union[List[Token], TokenBuffer], SymbolTable]:
+        """
+        tokenize() for one large source over a process pool. The source is
+        cut at newlines outside comments every chunk_size characters or so
+        (see chunk_boundaries()), each chunk is lexed by the single-pass
+        scanner starting at its own line, and the token columns are
+        concatenated in order. Symbol updates are replayed in source order,
+        including the ones that need text across a cut: a LET or FUNC ending
+        one chunk, a CALL target or parameter list running into the next.
+        Tokens, symbol table, line/position afterwards and the first error
+        are those of tokenize() with the regex or table engine.
+        compact=True returns the merged TokenBuffer; the list form builds its
+        Token objects in this process, which takes about as long as lexing
+        the list serially. jobs=1 or a source of a single chunk is lexed
+        in-process by the regex engine, whatever self.engine is.
+        """
+        src = source_code.strip()
+        boundaries = chunk_boundaries(src, chunk_size)
+        jobs = jobs or os.cpu_count() or 1
+        if len(boundaries) == 1 or (jobs == 1 and executor is None):
+            return self._tokenize_regex(source_code, compact)
+
+        tasks = []
+        start, line, position = 0, self.line, self.position
+        for end in boundaries:
+            tasks.append((src[start:end], start, line, position))
+            line += src.count('\n', start, end)
+            start, position = end, 1
+
+        owned = executor is None
+        if owned:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+        try:
+            tokens, line, position = self._merge_chunks(src, executor.map(_tokenize_chunk, tasks))
+        finally:
+            if owned:
+                executor.shutdown(cancel_futures=True)
+
+        self.line, self.position = line, position
+        self.source_code = src
+        self.current_pos = len(src)
+        tokens.append(TokenType.EOF, len(src), len(src), line, position)
+        if not compact:
+            types, starts, ends = tokens.types, tokens.starts, tokens.ends
+            intern = sys.intern
+            tokens = [
+                Token(TOKEN_TYPES_BY_ORDINAL[token_type],
+                      intern(src[start:end]) if token_type in _WORD_ORDINALS else src[start:end], line, position)
+                for token_type, start, end, line, position in zip(types, starts, ends, tokens.lines, tokens.positions)
+            ]
+        self.tokens = tokens
+        return tokens, self.symbol_table
+
+    def _merge_chunks(self, src: str, results: Iterator[tuple]) -> Tuple[TokenBuffer, int, int]:
+        """
+        Concatenate the chunks of tokenize_parallel() and replay their symbol
+        updates, raising the first error. Returns the tokens and the line and
+        position after them.
+        """
+        tokens = TokenBuffer(src)
+        set_symbol = self.symbol_table.set_symbol
+        previous = None
+        for types, starts, ends, lines, positions, updates, head, line, position, error in results:
+            for index, update in enumerate(updates):
+                if index == head:
+                    self._replay_first_word(src, types, starts, ends, previous)
+                if update[0] == _SET_SYMBOL:
+                    set_symbol(*update[1:])
+                else:
+                    self._record_call_target(src, update[1])
+            if head == len(updates):
+                self._replay_first_word(src, types, starts, ends, previous)
+            if error is not None:
+                raise error
+            tokens.types += types
+            tokens.starts += starts
+            tokens.ends += ends
+            tokens.lines += lines
+            tokens.positions += positions
+            if types:
+                previous = types[-1]
+        return tokens, line, position
+
+    def _replay_first_word(self, src: str, types: bytes, starts: array, ends: array, previous: Optional[int]):
+        """The symbol a chunk's lexer missed because the LET or FUNC before its first word ended the chunk before."""
+        if not types or types[0] not in _WORD_ORDINALS:
+            return
+        if previous == TokenType.LET.value:
+            self.symbol_table.set_symbol(src[starts[0]:ends[0]], 'integer')
+        elif previous == TokenType.FUNC.value:
+            self.symbol_table.set_symbol(src[starts[0]:ends[0]], 'function')
+
+    def iter_tokens(self, source_or_file: Union[str, TextIO], chunk_size: int = 65536) -> Iterator[Token]:
+        """
+        Lazily yield the tokens of a source string or a text stream.
+        Streams are read chunk_size characters at a time and only the unconsumed
+        tail of the current chunk is kept, so memory stays bounded regardless of
+        the input size. Tokens, comments and CALL argument lists may span chunk
+        boundaries. The symbol table is filled as tokens are produced and the
+        result is the same as tokenize(), without building self.tokens.
+        """
+        if isinstance(source_or_file, str):
+            chunks = iter((source_or_file,))
+            read = lambda: next(chunks, '')
+        else:
+            read = lambda: source_or_file.read(chunk_size)
+
+        lookup_identifier = self.identifier_cache.lookup
+        operators = OPERATORS
+        line = self.line
+        position = self.position
+        prev_type = None
+        started = False  # leading whitespace is dropped, like tokenize() strips it
+        before_whitespace = None  # line/position before a trailing whitespace run
+        buf = ''
+        pos = 0
+        eof = False
+
+        while True:
+            match = MASTER_PATTERN.match(buf, pos)
+            if match is None or (not eof and (match.end() == len(buf) or match.lastgroup == 'unclosed_comment')):
+                # the token may continue in the next chunk
+                if eof:
+                    break
+                chunk = read()
+                if chunk:
+                    buf = buf[pos:] + chunk
+                    pos = 0
+                else:
+                    eof = True
+                continue
+
+            kind = match.lastgroup
+            start, end = match.span()
+
+            if kind == 'whitespace':
+                if started:
+                    before_whitespace = (line, position)
+                    newlines = buf.count('\n', start, end)
+                    if newlines:
+                        line += newlines
+                        position = end - buf.rfind('\n', start, end)
+                    else:
+                        position += end - start
+                pos = end
+                continue
+
+            started = True
+            before_whitespace = None
+
+            if kind == 'comment':
+                newlines = buf.count('\n', start, end)
+                if newlines:
+                    line += newlines
+                    position = end - buf.rfind('\n', start, end)
+                else:
+                    position += end - start
+                pos = end
+                continue
+
+            if kind == 'identifier':
+                lexeme, _, token_type = lookup_identifier(match.group())
+                if token_type == TokenType.CALL:
+                    if not eof and not self._call_target_complete(buf, end):
+                        chunk = read()
+                        if chunk:
+                            buf = buf[pos:] + chunk
+                            pos = 0
+                        else:
+                            eof = True
+                        continue
+                    self._record_call_target(buf, end)
+                token = Token(token_type, lexeme, line, position)
+                if prev_type == TokenType.LET:
+                    self.symbol_table.set_symbol(lexeme, 'integer')
+                elif prev_type == TokenType.FUNC:
+                    self.symbol_table.set_symbol(lexeme, 'function')
+            elif kind == 'number':
+                token = Token(TokenType.NUMBER, match.group(), line, position)
+            elif kind == 'operator':
+                lexeme = match.group()
+                if lexeme not in operators:
+                    raise LexicalError(f"Invalid operator at line {line}, position {position}", line, position)
+                token = Token(operators[lexeme], lexeme, line, position)
+            elif kind == 'delimiter':
+                lexeme = match.group()
+                token = Token(DELIMITERS[lexeme], lexeme, line, position)
+            elif kind == 'unclosed_comment':
+                line += buf.count('\n', start, len(buf.rstrip()))
+                raise LexicalError(f"Unclosed comment starting at line {line}", line)
+            else:
+                position += 1
+                pos = end
+                continue
+
+            prev_type = token.type
+            position += end - start
+            pos = end
+            yield token
+
+        if before_whitespace is not None:
+            line, position = before_whitespace
+        self.line = line
+        self.position = position
+        yield Token(TokenType.EOF, "", line, position)
+
+    def scan(self, source: str, pos: int = 0, line: int = 1, position: int = 1) -> Iterator[Tuple[TokenType, int, int, int, int]]:
+        """
+        Yield (type, start, end, line, position) for every token of source from
+        offset pos on, given the line/position at pos. Unlike tokenize() this
+        neither strips the source, fills the symbol table nor emits EOF, which
+        makes it usable to re-lex part of a larger text.
+        """
+        lookup_identifier = self.identifier_cache.lookup
+        operators = OPERATORS
+
+        for match in MASTER_PATTERN.finditer(source, pos):
+            kind = match.lastgroup
+            start, end = match.span()
+
+            if kind == 'whitespace' or kind == 'comment':
+                newlines = source.count('\n', start, end)
+                if newlines:
+                    line += newlines
+                    position = end - source.rfind('\n', start, end)
+                else:
+                    position += end - start
+                continue
+
+            if kind == 'identifier':
+                token_type = lookup_identifier(match.group())[2]
+            elif kind == 'number':
+                token_type = TokenType.NUMBER
+            elif kind == 'operator':
+                token_type = operators.get(match.group())
+                if token_type is None:
+                    raise LexicalError(f"Invalid operator at line {line}, position {position}", line, position)
+            elif kind == 'delimiter':
+                token_type = DELIMITERS[match.group()]
+            elif kind == 'unclosed_comment':
+                line += source.count('\n', start, len(source.rstrip()))
+                raise LexicalError(f"Unclosed comment starting at line {line}", line)
+            else:
+                position += 1
+                continue
+
+            yield token_type, start, end, line, position
+            position += end - start
+
+    @staticmethod
+    def _call_target_complete(src: str, next_pos: int) -> bool:
+        """Whether src holds enough text after a CALL to read its target and parameters."""
+        func_match = CALL_TARGET_PATTERN.match(src, next_pos)
+        if not func_match:
+            return WHITESPACE_PATTERN.match(src, next_pos).end() < len(src)
+        end = func_match.end()
+        if end == len(src):
+            return False
+        return src[end] != '(' or src.find(')', end + 1) != -1
+
+    def _record_call_target(self, src: str, next_pos: int):
+        """Register the function named after a CALL keyword ending at next_pos."""
+        func_match = CALL_TARGET_PATTERN.match(src, next_pos)
+        if not func_match:
+            return
+        func_name = func_match.group(1)
+        params = []
+
+        next_pos = func_match.end()
+        if next_pos < len(src) and src[next_pos] == '(':
+            param_end = src.find(')', next_pos + 1)
+            if param_end != -1:
+                param_str = src[next_pos + 1:param_end]
+                params = [p.strip() for p in param_str.split(',') if p.strip()]
+
+        self.symbol_table.set_symbol(func_name, 'function', params)
+
     def _skip_whitespace(self):
         match = self.compiled_patterns['whitespace'].match(
             self.source_code[self.current_pos:]
@@ -144,7 +1040,7 @@ class LexicalAnalyzer:
             self.current_pos += 1
         
         if self.current_pos >= len(self.source_code):
-            raise SyntaxError(f"Unclosed comment starting at line {self.line}")
+            raise LexicalError(f"Unclosed comment starting at line {self.line}", self.line)
         
         self.current_pos += 1
         self.position += 1
@@ -160,41 +1056,30 @@ class LexicalAnalyzer:
             self.position += len(number)
 
     def _handle_identifier(self):
-        match = self.compiled_patterns['identifier'].match(
-            self.source_code[self.current_pos:]
-        )
+        match = COMPILED_PATTERNS['identifier'].match(self.source_code, self.current_pos)
         if match:
-            lexeme = match.group()
-            upper_lexeme = lexeme.upper()
-            
-            if upper_lexeme in self.keywords:
-                token_type = self.keywords[upper_lexeme]
-                
-                if token_type == TokenType.CALL:
-                    next_pos = self.current_pos + len(lexeme)
-                    while next_pos < len(self.source_code) and self.source_code[next_pos].isspace():
-                        next_pos += 1
-                    
-                    func_match = self.compiled_patterns['identifier'].match(
-                        self.source_code[next_pos:]
-                    )
-                    if func_match:
-                        func_name = func_match.group()
-                        params = []
-                        
-                        next_pos += len(func_name)
-                        if next_pos < len(self.source_code) and self.source_code[next_pos] == '(':
-                            param_start = next_pos + 1
-                            param_end = self.source_code.find(')', param_start)
-                            if param_end != -1:
-                                param_str = self.source_code[param_start:param_end]
-                                params = [p.strip() for p in param_str.split(',') if p.strip()]
-                        
-                        self.symbol_table.set_symbol(func_name, 'function', params)
+            lexeme, _, token_type = self.identifier_cache.lookup(match.group())
+
+            if token_type == TokenType.CALL:
+                next_pos = self.current_pos + len(lexeme)
+                while next_pos < len(self.source_code) and self.source_code[next_pos].isspace():
+                    next_pos += 1
+
+                func_match = COMPILED_PATTERNS['identifier'].match(self.source_code, next_pos)
+                if func_match:
+                    func_name = func_match.group()
+                    params = []
+
+                    next_pos += len(func_name)
+                    if next_pos < len(self.source_code) and self.source_code[next_pos] == '(':
+                        param_start = next_pos + 1
+                        param_end = self.source_code.find(')', param_start)
+                        if param_end != -1:
+                            param_str = self.source_code[param_start:param_end]
+                            params = [p.strip() for p in param_str.split(',') if p.strip()]
+
+                    self.symbol_table.set_symbol(func_name, 'function', params)
 
-            else:
-                token_type = TokenType.IDENTIFIER
-                
             self.tokens.append(Token(token_type, lexeme, self.line, self.position))
             self.current_pos += len(lexeme)
             self.position += len(lexeme)
@@ -205,17 +1090,121 @@ class LexicalAnalyzer:
                 self.symbol_table.set_symbol(lexeme, 'function') 
 
     def _handle_operator(self):
-        match = self.compiled_patterns['operator'].match(
-            self.source_code[self.current_pos:]
-        )
-        if match:
-            operator = match.group()
-            if operator in self.operators:
-                # self.tokens.append(Token(self.operators[operator], operator, self.line, self.position))
-                token = Token(self.operators[operator], operator, self.line, self.position)
-                self.tokens.append(token)
-                # print(f"Debug: Generated token {token}")
-                self.current_pos += len(operator)
-                self.position += len(operator)
-            else:
-                raise SyntaxError(f"Invalid operator at line {self.line}, position {self.position}")
+        source_code, current_pos = self.source_code, self.current_pos
+        for operator, token_type in OPERATOR_DISPATCH[ord(source_code[current_pos])]:
+            if source_code.startswith(operator, current_pos):
+                break
+        if token_type is None:
+            raise LexicalError(f"Invalid operator at line {self.line}, position {self.position}", self.line, self.position)
+        self.tokens.append(Token(token_type, operator, self.line, self.position))
+        self.current_pos += len(operator)
+        self.position += len(operator)
+
+
+# ----------------------------------------
+# Parallel lexing
+# ----------------------------------------
+
+# ordinals of tokens lexed as words: identifiers and keywords
+_WORD_ORDINALS = frozenset([TokenType.IDENTIFIER.value] + [token_type.value for token_type in KEYWORDS.values()])
+
+# symbol updates recorded by the chunks of tokenize_parallel(): set_symbol()
+# arguments, or the offset after a CALL whose target continues past the chunk
+_SET_SYMBOL, _CALL_TARGET = range(2)
+
+
+def chunk_boundaries(src: str, chunk_size: int) -> List[int]:
+    """
+    Ends of the chunks tokenize_parallel() cuts src into, the last being
+    len(src). Every other end follows the first newline at least
+    chunk_size characters after the previous end that is outside a
+    { comment }; no token but whitespace spans such a newline. Comments do
+    not nest and end at the first '}', so the text since the last '}' tells
+    whether a newline is inside one, and only the text since the previous
+    end is searched.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    boundaries = []
+    length = len(src)
+    # outside any comment
+    safe = 0
+    target = chunk_size
+    while target < length:
+        newline = src.find('\n', target)
+        if newline == -1:
+            break
+        closed = src.rfind('}', safe, newline)
+        opening = src.find('{', closed + 1 if closed != -1 else safe, newline)
+        if opening != -1:
+            closing = src.find('}', newline)
+            if closing == -1:
+                break
+            safe = target = closing + 1
+            continue
+        safe = newline + 1
+        boundaries.append(safe)
+        target = safe + chunk_size
+    boundaries.append(length)
+    return boundaries
+
+
+def _tokenize_chunk(task: Tuple[str, int, int, int]) -> tuple:
+    """
+    Lex one chunk of tokenize_parallel(), given as its text, its offset in
+    the stripped source and the line and position it starts at. Returns the
+    token columns with offsets into the whole source and no EOF, the symbol
+    updates in order, how many of them come before the symbol of the first
+    token, the line and position after the chunk and the SyntaxError that
+    stopped it, if any.
+    """
+    chunk, offset, line, position = task
+    text = chunk.lstrip()
+    leading = len(chunk) - len(text)
+    newline = chunk.rfind('\n', 0, leading)
+    if newline == -1:
+        position += leading
+    else:
+        line += chunk.count('\n', 0, newline + 1)
+        position = leading - newline
+    offset += leading
+
+    updates = []
+    analyzer = LexicalAnalyzer('regex')
+    analyzer.line, analyzer.position = line, position
+    analyzer.symbol_table.set_symbol = lambda name, type, params=None: updates.append((_SET_SYMBOL, name, type, params))
+    record_call_target = analyzer._record_call_target
+
+    # updates that precede the symbol the first token would get after a LET or
+    # FUNC in the previous chunk: a CALL records its target before that
+    head = 0
+
+    def record_or_defer_call_target(src: str, next_pos: int):
+        nonlocal head
+        if analyzer._call_target_complete(src, next_pos):
+            record_call_target(src, next_pos)
+        else:
+            updates.append((_CALL_TARGET, offset + next_pos))
+        if not analyzer.tokens.types:
+            head = len(updates)
+    analyzer._record_call_target = record_or_defer_call_target
+
+    error = None
+    try:
+        analyzer.tokenize(text, compact=True)
+    except SyntaxError as exception:
+        error = exception
+    tokens = analyzer.tokens
+    count = len(tokens.types) - (error is None)
+    return (
+        bytes(tokens.types[:count]),
+        array('I', [start + offset for start in tokens.starts[:count]]),
+        array('I', [end + offset for end in tokens.ends[:count]]),
+        tokens.lines[:count],
+        tokens.positions[:count],
+        updates,
+        head,
+        analyzer.line,
+        analyzer.position,
+        error,
+    )
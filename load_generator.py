@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+from benchmark import parse_size
+from corpus import generate_program
+from server import SERVICE_ENGINES, CompileClient
+
+
+def percentile(sorted_values: List[float], share: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+
+async def run_load(sources: List[str], connections: int = 16, requests: int = 100, depth: int = 1,
+                   host: str = '127.0.0.1', port: int = 8765, path: Optional[str] = None, engine: str = 'regex',
+                   tokens: bool = True, seed: int = 0) -> Dict:
+    """
+    Send `requests` compile requests on each of `connections` connections,
+    keeping `depth` of them outstanding per connection, each for a random
+    one of `sources`. Reports latency percentiles, throughput and the
+    server's own counters.
+    """
+    rng = random.Random(seed)
+    clients = [await CompileClient.connect(host, port, path) for _ in range(connections)]
+    latencies: List[float] = []
+    failures = {'request': 0, 'internal': 0, 'lexical': 0, 'syntax': 0}
+    cached = 0
+
+    async def worker(client: CompileClient, count: int):
+        nonlocal cached
+        for _ in range(count):
+            source = rng.choice(sources)
+            start = time.perf_counter()
+            response = await client.compile(source, engine, tokens)
+            latencies.append(time.perf_counter() - start)
+            cached += response['cached']
+            if response['error'] is not None:
+                failures[response['error']['kind']] += 1
+
+    before = await clients[0].statistics()
+    start = time.perf_counter()
+    workers = []
+    for client in clients:
+        for slot in range(depth):
+            workers.append(worker(client, requests // depth + (slot < requests % depth)))
+    await asyncio.gather(*workers)
+    elapsed = time.perf_counter() - start
+    after = await clients[0].statistics()
+    for client in clients:
+        await client.close()
+
+    latencies.sort()
+    batches = after['batches'] - before['batches']
+    return {
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'requests_per_second': len(latencies) / elapsed,
+        'latency_ms': {
+            name: percentile(latencies, share) * 1000
+            for name, share in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))
+        },
+        'cached': cached,
+        'errors': failures,
+        'batches': batches,
+        'mean_batch': (after['compiled'] - before['compiled']) / batches if batches else 0.0,
+    }
+
+
+def start_server(jobs: Optional[int], extra: List[str]) -> Tuple[subprocess.Popen, str]:
+    """Start server.py on a free local port; returns the process and host:port once it listens."""
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py"), "--port", "0"]
+    command += extra
+    if jobs:
+        command += ["--jobs", str(jobs)]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("listening on "):
+        process.kill()
+        raise RuntimeError(f"Compile server did not start: {line!r}")
+    return process, line[len("listening on "):].strip()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test a compile server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", default=None, help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--spawn", action="store_true", help="start a local server on a free port for the run")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes of a spawned server")
+    parser.add_argument("--batch-delay", type=float, default=None, help="--batch-delay of a spawned server")
+    parser.add_argument("-c", "--connections", type=int, default=16)
+    parser.add_argument("-n", "--requests", type=int, default=100, help="requests per connection")
+    parser.add_argument("--depth", type=int, default=1, help="outstanding requests per connection")
+    parser.add_argument("--size", default="4K", help="size of each generated script, e.g. 512, 4K, 1M")
+    parser.add_argument("--distinct", type=int, default=64,
+                        help="distinct scripts to pick from; fewer means more cache hits")
+    parser.add_argument("--engine", choices=SERVICE_ENGINES, default='regex')
+    parser.add_argument("--no-tokens", action="store_true", help="only ask for symbols and diagnostics")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    size = parse_size(args.size)
+    sources = [generate_program(size, args.seed + index) for index in range(args.distinct)]
+    host, port = args.host, args.port
+    process = None
+    if args.spawn:
+        extra = ["--batch-delay", str(args.batch_delay)] if args.batch_delay is not None else []
+        process, address = start_server(args.jobs, extra)
+        host, port = address.rsplit(":", 1)
+        port = int(port)
+    try:
+        report = asyncio.run(run_load(
+            sources, args.connections, args.requests, args.depth, host, port, args.unix, args.engine,
+            not args.no_tokens, args.seed,
+        ))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        latency = report['latency_ms']
+        print(f"{report['requests']} requests in {report['seconds']:.2f}s, {report['requests_per_second']:.0f} requests/s")
+        print(f"  latency p50 {latency['p50']:.2f}ms  p90 {latency['p90']:.2f}ms  "
+              f"p99 {latency['p99']:.2f}ms  max {latency['max']:.2f}ms")
+        print(f"  {report['cached']} answered from recent results, {report['batches']} batches "
+              f"of {report['mean_batch']:.1f} scripts on average")
+        errors = ", ".join(f"{kind} {count}" for kind, count in report['errors'].items() if count)
+        if errors:
+            print(f"  errors: {errors}")
+    return 1 if report['errors']['request'] or report['errors']['internal'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,39 @@
+import argparse
+from typing import Optional
+from cache import ResultCache
 from lexer import LexicalAnalyzer
 from tokens import print_tokens_table
 from syntax_validation import SyntaxValidator, SyntaxError
 from tests import test_cases
 
-def main():
+def main(cache: Optional[ResultCache] = None):
     cnt = 1
     for test_case in test_cases:
         print("==================")
         print(f"\033[92mTest Case {cnt}\033[0m")
         try:
-            lexer = LexicalAnalyzer()
-            tokens, symbol_table = lexer.tokenize(test_case)
-            validator = SyntaxValidator(tokens)
-            if validator.validate():
-                print_tokens_table(tokens)
-                symbol_table.print_table()
+            if cache is not None:
+                entry = cache.analyze(test_case, engine='legacy')
+                entry.reraise()
+                print_tokens_table(entry.tokens)
+                entry.symbol_table.print_table()
+            else:
+                lexer = LexicalAnalyzer()
+                tokens, symbol_table = lexer.tokenize(test_case)
+                validator = SyntaxValidator(tokens)
+                if validator.validate():
+                    print_tokens_table(tokens)
+                    symbol_table.print_table()
         except SyntaxError as e:
             print(f"\033[91mError: {e}\033[0m")
         cnt += 1
         print("==================")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the mini compiler on the test cases")
+    parser.add_argument("--cache", metavar="DIR", default=None, help="reuse results stored in this cache directory")
+    args = parser.parse_args()
     try:
-        main()
+        main(ResultCache(args.cache) if args.cache else None)
     except Exception as e:
-        print(f"\033[91mError: {e}\033[0m")
\ No newline at end of file
+        print(f"\033[91mError: {e}\033[0m")
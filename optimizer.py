@@ -0,0 +1,355 @@
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from bytecode import BINARY_ARGUMENTS, BINARY_FUNCTIONS, COMPARE_ARGUMENTS, COMPARE_FUNCTIONS
+from syntax_tree import NodeOrdinal, SyntaxTree
+from tokens import TokenOrdinal
+
+PASSES = ('fold', 'branches', 'unroll')
+
+# statements whose identifier token is assigned to
+ASSIGNMENTS = frozenset({
+    NodeOrdinal.LET, NodeOrdinal.FOR, NodeOrdinal.FOR_IN, NodeOrdinal.INCREMENT,
+    NodeOrdinal.DECREMENT, NodeOrdinal.COMPOUND_ASSIGN, NodeOrdinal.FUNC,
+})
+
+_NO_VALUE = object()
+
+
+class Optimizer:
+    """
+    Rewrites a SyntaxTree into a new, equivalent one. Passes run in order:
+      fold      folds operators on constants into CONSTANT nodes and
+                substitutes top-level LET constants that are never reassigned
+                into the uses that follow them
+      branches  drops IF/WHILE/DO/REPEAT branches decided by constant conditions
+      unroll    expands FOR loops with constant bounds and at most
+                unroll_limit iterations, folding the loop variable into
+                each copy of the body
+    stats holds one (pass, counters) entry per pass that ran.
+    """
+    def __init__(self, tree: SyntaxTree, passes=PASSES, unroll_limit: int = 8, unroll_budget: int = 256):
+        unknown = set(passes) - set(PASSES)
+        if unknown:
+            raise ValueError(f"Unknown optimization pass: {', '.join(sorted(unknown))}")
+        self.tree = tree
+        self.passes = passes
+        self.unroll_limit = unroll_limit
+        self.unroll_budget = unroll_budget
+        self.stats: List[Tuple[str, Dict[str, float]]] = []
+
+    def optimize(self) -> SyntaxTree:
+        tree = self.tree
+        for name in self.passes:
+            start = time.perf_counter()
+            rewriter = _PASS_CLASSES[name](tree, self)
+            optimized = rewriter.run()
+            counters = rewriter.counters
+            counters['nodes_before'] = count_nodes(tree)
+            counters['nodes_after'] = count_nodes(optimized)
+            counters['seconds'] = time.perf_counter() - start
+            self.stats.append((name, counters))
+            tree = optimized
+        return tree
+
+    def report(self) -> str:
+        lines = []
+        for name, counters in self.stats:
+            details = ", ".join(
+                f"{key} {value:.4f}" if isinstance(value, float) else f"{key} {value}"
+                for key, value in counters.items()
+            )
+            lines.append(f"{name}: {details}")
+        return "\n".join(lines)
+
+
+def count_nodes(tree: SyntaxTree) -> int:
+    """Nodes reachable from the root; rewritten trees never hold unreachable ones."""
+    count = 0
+    pending = [tree.root]
+    while pending:
+        node = pending.pop()
+        count += 1
+        pending.extend(tree.children(node))
+    return count
+
+
+def optimize(tree: SyntaxTree, passes=PASSES) -> Tuple[SyntaxTree, List[Tuple[str, Dict[str, float]]]]:
+    optimizer = Optimizer(tree, passes)
+    return optimizer.optimize(), optimizer.stats
+
+
+# ----------------------------------------
+# Rewriting
+# ----------------------------------------
+
+class _Rewriter:
+    """
+    Copies a tree node by node into a new one. rewrite() returns the list of
+    nodes that replace a node, so statements can be dropped or spliced into
+    the enclosing block; expressions always map to exactly one node.
+    """
+    def __init__(self, source: SyntaxTree, optimizer: Optimizer):
+        self.source = source
+        self.target = SyntaxTree(source.tokens)
+        self.optimizer = optimizer
+        self.counters: Dict[str, float] = {}
+        # name -> value substituted for NAME uses
+        self.bindings: Dict[str, object] = {}
+
+    def run(self) -> SyntaxTree:
+        self.target.root, = self.rewrite(self.source.root)
+        return self.target
+
+    def rewrite(self, node: int) -> List[int]:
+        source = self.source
+        kind = source.kinds[node]
+
+        if kind == NodeOrdinal.BINARY:
+            left, right = source.children(node)
+            left, = self.rewrite(left)
+            right, = self.rewrite(right)
+            value = _fold(source.tokens[source.token_indices[node]].type.value,
+                          self.constant_value(self.target, left), self.constant_value(self.target, right))
+            if value is not _NO_VALUE:
+                self.count('folds')
+                return [self.constant(value, source.token_indices[node])]
+            return [self.add(kind, source.token_indices[node], (left, right))]
+
+        if kind == NodeOrdinal.NAME and self.bindings:
+            name = source.token(node).lexeme
+            if name in self.bindings:
+                self.count('propagated')
+                return [self.constant(self.bindings[name], source.token_indices[node])]
+
+        elif kind == NodeOrdinal.CALL:
+            # statement arguments are names, not expressions
+            return [self.add(kind, source.token_indices[node], [
+                self.add(NodeOrdinal.NAME, source.token_indices[child]) for child in source.children(node)
+            ])]
+
+        return [self.copy(node)]
+
+    def copy(self, node: int) -> int:
+        """Copy a node with rewritten children."""
+        children = []
+        for child in self.source.children(node):
+            children.extend(self.rewrite(child))
+        return self.add(self.source.kinds[node], self.source.token_indices[node], children,
+                        self.source.values.get(node, _NO_VALUE))
+
+    def add(self, kind: int, token_index: int, children=(), value=_NO_VALUE) -> int:
+        node = self.target.add(kind, token_index, children)
+        if value is not _NO_VALUE:
+            self.target.values[node] = value
+        return node
+
+    def constant(self, value, token_index: int) -> int:
+        return self.add(NodeOrdinal.CONSTANT, token_index, (), value)
+
+    def count(self, counter: str, amount: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def constant_value(self, tree: SyntaxTree, node: int):
+        """Value of a NUMBER or CONSTANT node, _NO_VALUE for anything else."""
+        kind = tree.kinds[node]
+        if kind == NodeOrdinal.NUMBER:
+            return int(tree.token(node).lexeme)
+        if kind == NodeOrdinal.CONSTANT:
+            return tree.values[node]
+        return _NO_VALUE
+
+
+class _FoldRewriter(_Rewriter):
+    def __init__(self, source: SyntaxTree, optimizer: Optimizer):
+        super().__init__(source, optimizer)
+        self.counters.update(folds=0, propagated=0)
+        self.assignments = _assignment_counts(source)
+        self.top_level = set(source.children(source.root))
+
+    def rewrite(self, node: int) -> List[int]:
+        new_node, = super().rewrite(node)
+        source, target = self.source, self.target
+        if source.kinds[node] == NodeOrdinal.LET and node in self.top_level:
+            children = target.children(new_node)
+            name = source.token(node).lexeme
+            if len(children) == 1 and self.assignments.get(name) == 1:
+                value = self.constant_value(target, children[0])
+                if value is not _NO_VALUE:
+                    self.bindings[name] = value
+        return [new_node]
+
+
+class _BranchRewriter(_Rewriter):
+    def __init__(self, source: SyntaxTree, optimizer: Optimizer):
+        super().__init__(source, optimizer)
+        self.counters.update(branches_removed=0)
+
+    def rewrite(self, node: int) -> List[int]:
+        source = self.source
+        kind = source.kinds[node]
+        children = source.children(node)
+
+        if kind == NodeOrdinal.IF:
+            condition = self.constant_value(source, children[0])
+            if condition is not _NO_VALUE:
+                self.count('branches_removed')
+                if condition:
+                    return self.rewrite_statements(children[1])
+                return self.rewrite_statements(children[2]) if len(children) == 3 else []
+
+        elif kind == NodeOrdinal.WHILE:
+            condition = self.constant_value(source, children[0])
+            if condition is not _NO_VALUE and not condition:
+                self.count('branches_removed')
+                return []
+
+        elif kind == NodeOrdinal.DO_WHILE or kind == NodeOrdinal.REPEAT_UNTIL:
+            # a body that cannot repeat runs exactly once
+            condition = self.constant_value(source, children[1])
+            if condition is not _NO_VALUE and bool(condition) == (kind == NodeOrdinal.REPEAT_UNTIL):
+                self.count('branches_removed')
+                return self.rewrite_statements(children[0])
+
+        return [self.copy(node)]
+
+    def rewrite_statements(self, block: int) -> List[int]:
+        statements = []
+        for statement in self.source.children(block):
+            statements.extend(self.rewrite(statement))
+        return statements
+
+
+class _UnrollRewriter(_Rewriter):
+    def __init__(self, source: SyntaxTree, optimizer: Optimizer):
+        super().__init__(source, optimizer)
+        self.counters.update(loops_unrolled=0, folds=0, propagated=0)
+        # a called function may change these, so a body with a CALL keeps them live
+        self.function_assignments = _function_assignments(source)
+
+    def rewrite(self, node: int) -> List[int]:
+        kind = self.source.kinds[node]
+        if kind == NodeOrdinal.FOR or kind == NodeOrdinal.FOR_IN:
+            values = self.trip_values(node, kind)
+            if values is not None:
+                return self.unroll(node, values)
+        return super().rewrite(node)
+
+    def trip_values(self, node: int, kind: int) -> Optional[List[int]]:
+        """Loop variable values of a loop worth unrolling, None if it is not."""
+        source = self.source
+        children = source.children(node)
+        bounds, body = children[:-1], children[-1]
+        values = [self.constant_value(source, bound) for bound in bounds]
+        if len(values) == 2:
+            values.append(1)
+        start, end, step = values
+        if any(type(value) is not int for value in values) or step == 0:
+            return None
+
+        if kind == NodeOrdinal.FOR:
+            end += 1 if step > 0 else -1
+        trips = list(range(start, end, step))
+        if len(trips) > self.optimizer.unroll_limit:
+            return None
+
+        variable = source.token(node).lexeme
+        calls_may_assign = variable in self.function_assignments
+        body_nodes = 0
+        pending = [body]
+        while pending:
+            current = pending.pop()
+            body_nodes += 1
+            current_kind = source.kinds[current]
+            if current_kind == NodeOrdinal.FUNC:
+                return None
+            if current_kind in ASSIGNMENTS and source.token(current).lexeme == variable:
+                return None
+            if calls_may_assign and (current_kind == NodeOrdinal.CALL or current_kind == NodeOrdinal.CALL_EXPR):
+                return None
+            pending.extend(source.children(current))
+        if body_nodes * len(trips) > self.optimizer.unroll_budget:
+            return None
+        return trips + [start + len(trips) * step]
+
+    def unroll(self, node: int, values: List[int]) -> List[int]:
+        """LET the variable to each value before a copy of the body, then to its final value."""
+        source = self.source
+        variable_token = source.token_indices[node]
+        variable = source.token(node).lexeme
+        body = source.children(node)[-1]
+        statements = []
+        outer = self.bindings.get(variable, _NO_VALUE)
+        for value in values[:-1]:
+            statements.append(self.add(NodeOrdinal.LET, variable_token, (self.constant(value, variable_token),)))
+            self.bindings[variable] = value
+            for statement in source.children(body):
+                statements.extend(self.rewrite(statement))
+        if outer is _NO_VALUE:
+            self.bindings.pop(variable, None)
+        else:
+            self.bindings[variable] = outer
+        statements.append(self.add(NodeOrdinal.LET, variable_token, (self.constant(values[-1], variable_token),)))
+        self.count('loops_unrolled')
+        return statements
+
+
+def _fold(operator_type: int, left, right):
+    """Value of `left operator right`, _NO_VALUE if an operand is unknown or it would fail."""
+    if left is _NO_VALUE or right is _NO_VALUE:
+        return _NO_VALUE
+    if operator_type == TokenOrdinal.AND:
+        return left and right
+    if operator_type == TokenOrdinal.OR:
+        return left or right
+    if operator_type in COMPARE_ARGUMENTS:
+        function = COMPARE_FUNCTIONS[COMPARE_ARGUMENTS[operator_type]]
+    else:
+        function = BINARY_FUNCTIONS[BINARY_ARGUMENTS[operator_type]]
+    try:
+        return function(left, right)
+    except (ArithmeticError, TypeError):
+        # leave the error to happen at run time
+        return _NO_VALUE
+
+
+def _assignment_counts(tree: SyntaxTree) -> Dict[str, int]:
+    """How often each name is assigned anywhere, function parameters included."""
+    counts: Dict[str, int] = {}
+    pending = [tree.root]
+    while pending:
+        node = pending.pop()
+        kind = tree.kinds[node]
+        children = tree.children(node)
+        if kind in ASSIGNMENTS:
+            name = tree.token(node).lexeme
+            counts[name] = counts.get(name, 0) + 1
+        if kind == NodeOrdinal.FUNC:
+            for parameter in children[:-1]:
+                name = tree.token(parameter).lexeme
+                counts[name] = counts.get(name, 0) + 1
+        pending.extend(children)
+    return counts
+
+
+def _function_assignments(tree: SyntaxTree) -> Set[str]:
+    """Names assigned anywhere inside a function body, parameters included."""
+    names: Set[str] = set()
+    pending = [(tree.root, False)]
+    while pending:
+        node, in_function = pending.pop()
+        kind = tree.kinds[node]
+        children = tree.children(node)
+        if in_function and kind in ASSIGNMENTS:
+            names.add(tree.token(node).lexeme)
+        if kind == NodeOrdinal.FUNC:
+            names.update(tree.token(parameter).lexeme for parameter in children[:-1])
+            in_function = True
+        pending.extend((child, in_function) for child in children)
+    return names
+
+
+_PASS_CLASSES = {
+    'fold': _FoldRewriter,
+    'branches': _BranchRewriter,
+    'unroll': _UnrollRewriter,
+}
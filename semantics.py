@@ -0,0 +1,233 @@
+import argparse
+import sys
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from lexer import LexicalAnalyzer
+from syntax_tree import NodeOrdinal, SyntaxTree, parse
+from tokens import Token
+
+
+class SemanticError(Exception):
+    def __init__(self, message: str, line: int, position: int):
+        super().__init__(f"Semantic Error at line {line}, position {position}: {message}")
+        self.message = message
+        self.line = line
+        self.position = position
+
+
+# work items of the walk besides plain nodes
+_DEFINE, _LEAVE_FUNCTION = range(2)
+
+
+class SemanticAnalyzer:
+    """
+    Reports every use of an undefined variable, call of an undefined function,
+    call with the wrong number of arguments, top-level call before the FUNC
+    that defines it and RETURN outside a function.
+
+    Follows the run-time rules: a function's locals are its parameters and
+    the targets of its plain LETs and FORs, other names are globals. Program
+    code runs in order, so its uses must follow a definition; function bodies
+    run when called, so the globals they use and the functions they call only
+    need to exist somewhere in the program. Locals must be assigned before
+    they are read.
+
+    Two walks over the tree, each visiting every node once: the first indexes
+    function definitions and locals, the second checks uses in program order
+    and defers the checks that need the whole program.
+    """
+    def __init__(self, tree: SyntaxTree):
+        self.tree = tree
+        self.errors: List[SemanticError] = []
+        # name -> (FUNC node, parameter count) of its first definition
+        self.functions: Dict[str, Tuple[int, int]] = {}
+        # FUNC node -> its local names
+        self.locals: Dict[int, Set[str]] = {}
+
+    def analyze(self) -> List[SemanticError]:
+        self._index()
+        self._check()
+        self.errors.sort(key=lambda error: (error.line, error.position))
+        return self.errors
+
+    def _error(self, token_index: int, message: str):
+        token = self.tree.tokens[token_index]
+        self.errors.append(SemanticError(message, token.line, token.position))
+
+    # ----------------------------------------
+    # Definitions
+    # ----------------------------------------
+
+    def _index(self):
+        tree = self.tree
+        kinds, token_indices, tokens = tree.kinds, tree.token_indices, tree.tokens
+        functions, function_locals = self.functions, self.locals
+        pending: List[Tuple[int, Optional[Set[str]]]] = [(tree.root, None)]
+        while pending:
+            node, local_names = pending.pop()
+            kind = kinds[node]
+            children = tree.children(node)
+            if kind == NodeOrdinal.FUNC:
+                name = tokens[token_indices[node]].lexeme
+                if name not in functions:
+                    functions[name] = (node, len(children) - 1)
+                local_names = function_locals[node] = {
+                    tokens[token_indices[parameter]].lexeme for parameter in children[:-1]
+                }
+                pending.append((children[-1], local_names))
+                continue
+            if local_names is not None and (
+                kind == NodeOrdinal.FOR or kind == NodeOrdinal.FOR_IN
+                or kind == NodeOrdinal.LET and self._is_plain_let(node)
+            ):
+                local_names.add(tokens[token_indices[node]].lexeme)
+            for child in children:
+                pending.append((child, local_names))
+
+    def _is_plain_let(self, node: int) -> bool:
+        """LET name = value, as opposed to LET name[index] = value."""
+        tree = self.tree
+        return tree.child_ends[node] - tree.child_starts[node] == 1
+
+    # ----------------------------------------
+    # Uses
+    # ----------------------------------------
+
+    def _check(self):
+        tree = self.tree
+        kinds, token_indices, tokens = tree.kinds, tree.token_indices, tree.tokens
+        functions = self.functions
+        # globals and functions program code has defined so far
+        defined: Set[str] = set()
+        defined_functions: Set[str] = set()
+        # all globals any code defines, for the deferred checks
+        global_names: Set[str] = set(functions)
+        # (token index, name) of uses in function bodies resolved against global_names at the end
+        deferred_uses: List[Tuple[int, str]] = []
+        # (token index, name, argument count, in a function) of every call
+        calls: List[Tuple[int, str, int, bool]] = []
+
+        # function context: (locals, locals assigned so far) of the innermost FUNC being walked
+        function: Optional[Tuple[Set[str], Set[str]]] = None
+        outer_functions = []
+        pending: List[tuple] = [(tree.root,)]
+
+        def use(token_index: int):
+            name = tokens[token_index].lexeme
+            if function is None:
+                if name not in defined:
+                    self._error(token_index, f"Undefined variable '{name}'")
+            elif name in function[0]:
+                if name not in function[1]:
+                    self._error(token_index, f"Local variable '{name}' used before assignment")
+            else:
+                deferred_uses.append((token_index, name))
+
+        while pending:
+            item = pending.pop()
+            if len(item) == 2:
+                action, value = item
+                if action == _DEFINE:
+                    name = tokens[value].lexeme
+                    if function is None:
+                        defined.add(name)
+                        global_names.add(name)
+                    elif name in function[0]:
+                        function[1].add(name)
+                else:
+                    function = outer_functions.pop()
+                continue
+
+            node, = item
+            kind = kinds[node]
+            token_index = token_indices[node]
+            children = tree.children(node)
+
+            if kind == NodeOrdinal.NAME:
+                use(token_index)
+                continue
+
+            if kind == NodeOrdinal.LET:
+                if len(children) == 1:
+                    pending.append((_DEFINE, token_index))
+                else:
+                    use(token_index)
+            elif kind == NodeOrdinal.FOR or kind == NodeOrdinal.FOR_IN:
+                # the variable is assigned after the bounds and before the body
+                pending.append((children[-1],))
+                pending.append((_DEFINE, token_index))
+                children = children[:-1]
+            elif kind == NodeOrdinal.INCREMENT or kind == NodeOrdinal.DECREMENT or kind == NodeOrdinal.COMPOUND_ASSIGN:
+                use(token_index)
+            elif kind == NodeOrdinal.INDEX:
+                use(token_index)
+            elif kind == NodeOrdinal.CALL or kind == NodeOrdinal.CALL_EXPR:
+                name = tokens[token_index].lexeme
+                calls.append((token_index, name, len(children), function is not None))
+                if function is None and name in functions and name not in defined_functions:
+                    self._error(token_index, f"Function '{name}' called before its definition")
+            elif kind == NodeOrdinal.RETURN:
+                if function is None:
+                    self._error(token_index, "RETURN outside of a function")
+            elif kind == NodeOrdinal.FUNC:
+                name = tokens[token_index].lexeme
+                defined_functions.add(name)
+                if function is None:
+                    defined.add(name)
+                local_names = self.locals[node]
+                outer_functions.append(function)
+                pending.append((_LEAVE_FUNCTION, node))
+                pending.append((children[-1],))
+                function = (local_names, {tokens[token_indices[parameter]].lexeme for parameter in children[:-1]})
+                continue
+
+            pending.extend((child,) for child in reversed(children))
+
+        for token_index, name in deferred_uses:
+            if name not in global_names:
+                self._error(token_index, f"Undefined variable '{name}'")
+
+        for token_index, name, argument_count, in_function in calls:
+            definition = functions.get(name)
+            if definition is None:
+                self._error(token_index, f"Undefined function '{name}'")
+                continue
+            parameter_count = definition[1]
+            if argument_count != parameter_count:
+                self._error(
+                    token_index,
+                    f"Function '{name}' takes {parameter_count} argument{'s' if parameter_count != 1 else ''}"
+                    f" but {argument_count} {'were' if argument_count != 1 else 'was'} given"
+                )
+
+
+def analyze(tokens: Iterable[Token]) -> List[SemanticError]:
+    """Parse the tokens and return their semantic errors; raises SyntaxError on invalid syntax."""
+    return SemanticAnalyzer(parse(tokens)).analyze()
+
+
+def analyze_source(source: str) -> List[SemanticError]:
+    tokens, _ = LexicalAnalyzer(engine='regex').tokenize(source)
+    return analyze(tokens)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Report semantic errors in scripts")
+    parser.add_argument("paths", nargs="+", help="script files")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for path in args.paths:
+        with open(path, encoding='utf-8') as file:
+            source = file.read()
+        try:
+            errors = analyze_source(source)
+        except Exception as e:
+            errors = [e]
+        for error in errors:
+            print(f"{path}: {error}")
+        failed = failed or bool(errors)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
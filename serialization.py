@@ -0,0 +1,279 @@
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+from symbols import SymbolTable
+from tokens import Token, TokenType, TOKEN_TYPES_BY_ORDINAL
+
+# Binary token stream format, all integers little-endian:
+#
+#     header      HEADER struct, see below
+#     types       one TokenType ordinal byte per token
+#     lexeme ids  one index into the lexeme table per token, 1, 2 or 4 bytes wide
+#     coordinates varint pairs per token: zigzag(line - previous line), then
+#                 zigzag(position - previous position) on the same line or
+#                 zigzag(position) on a new line
+#     lexemes     uint32 offsets (lexeme count + 1) into the UTF-8 blob that follows
+#     symbols     the symbol table as UTF-8 JSON
+#
+# Sections start on 4-byte boundaries so the fixed width columns can be cast
+# straight out of an mmap.
+
+MAGIC = b'TOKS'
+FORMAT_VERSION = 1
+# magic, version, lexeme id width, reserved, TokenType fingerprint, token count,
+# lexeme count, then the offsets of the ids, coordinates, lexemes and symbols
+# sections and the total length
+HEADER = struct.Struct('<4sBBHIIIIIIII')
+
+# written into every stream so a reader with a different TokenType refuses it
+TOKEN_TYPES_FINGERPRINT = zlib.crc32(
+    ','.join(f"{token_type.name}={token_type.value}" for token_type in TokenType).encode()
+)
+
+_ID_FORMATS = {1: 'B', 2: 'H', 4: 'I'}
+
+
+def _align(data: bytearray):
+    data.extend(bytes(-len(data) % 4))
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint_tail(data: Iterator[int], value: int) -> int:
+    """Finish a varint whose first byte `value` had the continuation bit set."""
+    value &= 0x7F
+    shift = 7
+    while True:
+        byte = next(data)
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value
+        shift += 7
+
+
+def dumps(tokens: Iterable[Token], symbol_table: Optional[SymbolTable] = None) -> bytes:
+    """Serialize a token stream (list, TokenBuffer, iterator) and its symbol table."""
+    types = bytearray()
+    ids = array('I')
+    coordinates = bytearray()
+    interned = {}
+    previous_line = previous_position = 0
+    for token in tokens:
+        types.append(token.type.value)
+        lexeme_id = interned.get(token.lexeme)
+        if lexeme_id is None:
+            lexeme_id = interned[token.lexeme] = len(interned)
+        ids.append(lexeme_id)
+
+        line_delta = token.line - previous_line
+        _write_varint(coordinates, _zigzag(line_delta))
+        _write_varint(coordinates, _zigzag(token.position - previous_position if line_delta == 0 else token.position))
+        previous_line, previous_position = token.line, token.position
+
+    id_width = 1 if len(interned) <= 0x100 else 2 if len(interned) <= 0x10000 else 4
+    lexeme_offsets = array('I', [0])
+    blob = bytearray()
+    for lexeme in interned:
+        blob.extend(lexeme.encode('utf-8', 'surrogatepass'))
+        lexeme_offsets.append(len(blob))
+    symbols = json.dumps(symbol_table.symbols if symbol_table is not None else {}).encode()
+
+    body = bytearray(HEADER.size)
+    body.extend(types)
+    _align(body)
+    ids_offset = len(body)
+    body.extend(_little_endian(array(_ID_FORMATS[id_width], ids)))
+    _align(body)
+    coordinates_offset = len(body)
+    body.extend(coordinates)
+    _align(body)
+    lexemes_offset = len(body)
+    body.extend(_little_endian(lexeme_offsets))
+    body.extend(blob)
+    symbols_offset = len(body)
+    body.extend(symbols)
+
+    HEADER.pack_into(
+        body, 0, MAGIC, FORMAT_VERSION, id_width, 0, TOKEN_TYPES_FINGERPRINT, len(types), len(interned),
+        ids_offset, coordinates_offset, lexemes_offset, symbols_offset, len(body)
+    )
+    return bytes(body)
+
+
+def dump(tokens: Iterable[Token], symbol_table: Optional[SymbolTable], file: BinaryIO):
+    file.write(dumps(tokens, symbol_table))
+
+
+def loads(data: bytes) -> Tuple[List[Token], SymbolTable]:
+    """Inverse of dumps(); returns the same (tokens, symbol_table) pair as tokenize()."""
+    stream = TokenStream(data)
+    return list(stream), stream.symbol_table
+
+
+class TokenStream:
+    """
+    Read-only view of a serialized token stream.
+    The type and lexeme id columns are read in place from the underlying
+    buffer; coordinates are decoded on first use and lexemes as they are
+    requested. Like TokenBuffer it exposes `types`, so it can be handed to
+    SyntaxValidator without building any Token objects.
+    """
+    def __init__(self, data: Union[bytes, bytearray, memoryview, mmap.mmap]):
+        self._data = data
+        view = memoryview(data)
+        if len(view) < HEADER.size:
+            raise ValueError("not a token stream: truncated header")
+        (magic, version, id_width, _, fingerprint, count, lexeme_count,
+         ids_offset, coordinates_offset, lexemes_offset, symbols_offset, length) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError("not a token stream: bad magic")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"unsupported token stream version {version}")
+        if fingerprint != TOKEN_TYPES_FINGERPRINT:
+            raise ValueError("token stream was written with a different set of token types")
+        if len(view) < length:
+            raise ValueError("token stream is truncated")
+
+        self._view = view
+        self._count = count
+        self._coordinates_range = (coordinates_offset, lexemes_offset)
+        self._symbols_range = (symbols_offset, length)
+        self.types = view[HEADER.size:HEADER.size + count]
+        self._ids = self._column(view[ids_offset:ids_offset + count * id_width], _ID_FORMATS[id_width])
+        offsets_end = lexemes_offset + (lexeme_count + 1) * 4
+        self._lexeme_offsets = self._column(view[lexemes_offset:offsets_end], 'I')
+        self._blob = view[offsets_end:symbols_offset]
+        self._lexemes: List[Optional[str]] = [None] * lexeme_count
+        self._lines: Optional[array] = None
+        self._positions: Optional[array] = None
+        self._symbol_table: Optional[SymbolTable] = None
+
+    @staticmethod
+    def _column(view: memoryview, typecode: str):
+        if sys.byteorder == 'big' and typecode != 'B':
+            values = array(typecode, view.tobytes())
+            values.byteswap()
+            return values
+        return view.cast(typecode)
+
+    def lexeme(self, lexeme_id: int) -> str:
+        lexeme = self._lexemes[lexeme_id]
+        if lexeme is None:
+            offsets = self._lexeme_offsets
+            lexeme = self._lexemes[lexeme_id] = str(
+                self._blob[offsets[lexeme_id]:offsets[lexeme_id + 1]], 'utf-8', 'surrogatepass'
+            )
+        return lexeme
+
+    @property
+    def lines(self) -> array:
+        if self._lines is None:
+            self._decode_coordinates()
+        return self._lines
+
+    @property
+    def positions(self) -> array:
+        if self._positions is None:
+            self._decode_coordinates()
+        return self._positions
+
+    def _decode_coordinates(self):
+        start, end = self._coordinates_range
+        data = iter(self._view[start:end])
+        lines = array('I')
+        positions = array('I')
+        line = position = 0
+        for _ in range(self._count):
+            value = next(data)
+            if value & 0x80:
+                value = _read_varint_tail(data, value)
+            line_delta = (value >> 1) ^ -(value & 1)
+            value = next(data)
+            if value & 0x80:
+                value = _read_varint_tail(data, value)
+            value = (value >> 1) ^ -(value & 1)
+            if line_delta:
+                line += line_delta
+                position = value
+            else:
+                position += value
+            lines.append(line)
+            positions.append(position)
+        self._lines = lines
+        self._positions = positions
+
+    @property
+    def symbol_table(self) -> SymbolTable:
+        if self._symbol_table is None:
+            start, end = self._symbols_range
+            self._symbol_table = SymbolTable()
+            self._symbol_table.symbols = json.loads(str(self._view[start:end], 'utf-8'))
+        return self._symbol_table
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("token index out of range")
+        return Token(
+            TOKEN_TYPES_BY_ORDINAL[self.types[index]],
+            self.lexeme(self._ids[index]),
+            self.lines[index],
+            self.positions[index]
+        )
+
+    def __iter__(self) -> Iterator[Token]:
+        types, ids, lines, positions = self.types, self._ids, self.lines, self.positions
+        lexeme = self.lexeme
+        for index in range(self._count):
+            yield Token(TOKEN_TYPES_BY_ORDINAL[types[index]], lexeme(ids[index]), lines[index], positions[index])
+
+    def close(self):
+        """Release the views so an underlying mmap can be closed."""
+        for name in ('types', '_ids', '_lexeme_offsets', '_blob', '_view'):
+            value = getattr(self, name, None)
+            if isinstance(value, memoryview):
+                value.release()
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+
+    def __enter__(self) -> 'TokenStream':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def write_token_file(path: str, tokens: Iterable[Token], symbol_table: Optional[SymbolTable] = None):
+    with open(path, 'wb') as file:
+        dump(tokens, symbol_table, file)
+
+
+def open_token_file(path: str) -> TokenStream:
+    """Map a token file into memory; close the returned stream when done."""
+    with open(path, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return TokenStream(data)
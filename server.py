@@ -0,0 +1,403 @@
+import argparse
+import asyncio
+import collections
+import hashlib
+import itertools
+import json
+import os
+import signal
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from cache import CacheEntry, analyze_source
+from lexer import ENGINES
+
+# JSON-lines compile service. Every line a client sends is one request:
+#   {"id": 1, "source": "LET x = 1", "engine": "regex", "tokens": true}
+#   {"id": 2, "op": "stats"}
+# and every line it gets back answers one of them, in completion order:
+#   {"id": 1, "cached": false, "ok": true, "token_count": 4, "symbols": {...},
+#    "error": null, "tokens": [["LET", "LET", 1, 1], ...]}
+# error is null or {"kind": "lexical" | "syntax" | "internal" | "request",
+# "message": ..., "line": ..., "position": ...}.
+
+# lexer engines clients may pick; the legacy engine loops forever on non-ASCII
+# letters, which would wedge a worker for good
+SERVICE_ENGINES = tuple(engine for engine in ENGINES if engine != 'legacy')
+
+# longest request or response line
+LINE_LIMIT = 256 * 1024 * 1024
+
+
+def result_body(entry: CacheEntry, include_tokens: bool) -> bytes:
+    """The JSON object describing one analysis, without id and cached."""
+    result = {'ok': entry.error is None, 'token_count': len(entry.tokens), 'symbols': entry.symbols, 'error': None}
+    if entry.error is not None:
+        kind, message, line, position = entry.error
+        result['error'] = {'kind': kind, 'message': message, 'line': line, 'position': position}
+    if include_tokens:
+        result['tokens'] = [[token.type.name, token.lexeme, token.line, token.position] for token in entry.tokens]
+    return json.dumps(result, separators=(',', ':')).encode()
+
+
+def _error_body(kind: str, message: str) -> bytes:
+    return json.dumps({
+        'ok': False, 'token_count': 0, 'symbols': {},
+        'error': {'kind': kind, 'message': message, 'line': None, 'position': None},
+    }, separators=(',', ':')).encode()
+
+
+def _compile_batch(batch: List[Tuple[str, str, bool]]) -> List[bytes]:
+    """Worker task: result_body() of every (source, engine, include tokens) in the batch."""
+    bodies = []
+    for source, engine, include_tokens in batch:
+        try:
+            bodies.append(result_body(analyze_source(source, engine), include_tokens))
+        except Exception as e:
+            # one bad script must not fail the other requests of its batch
+            bodies.append(_error_body('internal', f"{type(e).__name__}: {e}"))
+    return bodies
+
+
+class RecentResults:
+    """Least recently used encoded results, bounded by entry count and total bytes."""
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: 'collections.OrderedDict[tuple, bytes]' = collections.OrderedDict()
+        self.size = 0
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        body = self.entries.get(key)
+        if body is not None:
+            self.entries.move_to_end(key)
+        return body
+
+    def put(self, key: tuple, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self.entries[key] = body
+        self.size += len(body)
+        while len(self.entries) > self.max_entries or self.size > self.max_bytes:
+            _, old = self.entries.popitem(last=False)
+            self.size -= len(old)
+
+
+class CompileServer:
+    """
+    Lexes and validates scripts for many clients at once.
+    Requests go through three stages: an answer from the recent results,
+    joining an identical request that is already being compiled, or the
+    queue. A batcher drains the queue into batches of up to max_batch
+    scripts, each run as one task on a pool of `jobs` worker processes and a
+    backlog split evenly between the workers that are free. At
+    most `jobs` batches are in flight, so the queue fills while the workers
+    are busy and batches grow with the load; batch_delay seconds of extra
+    waiting trades latency for larger batches on a lightly loaded server.
+    """
+    def __init__(self, jobs: Optional[int] = None, max_batch: int = 32, batch_delay: float = 0.0,
+                 cache_entries: int = 1024, cache_bytes: int = 64 * 1024 * 1024,
+                 executor: Optional[Executor] = None):
+        self.jobs = jobs or os.cpu_count() or 1
+        self.max_batch = max_batch
+        self.batch_delay = batch_delay
+        self.cache = RecentResults(cache_entries, cache_bytes)
+        self.executor = executor
+        self._owns_executor = executor is None
+        self.queue: Optional[asyncio.Queue] = None
+        # key -> future of the body being compiled for it
+        self.in_flight: Dict[tuple, asyncio.Future] = {}
+        self.stats = {
+            'requests': 0, 'cache_hits': 0, 'shared': 0, 'compiled': 0,
+            'batches': 0, 'errors': 0, 'connections': 0,
+        }
+        self._batcher: Optional[asyncio.Task] = None
+        self._tasks = set()
+
+    async def start(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.jobs)
+        self.queue = asyncio.Queue()
+        self._batcher = asyncio.get_running_loop().create_task(self._run_batcher())
+        # start the workers now rather than on the first request
+        await asyncio.get_running_loop().run_in_executor(self.executor, _compile_batch, [])
+
+    async def close(self):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._owns_executor and self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    # ----------------------------------------
+    # Compiling
+    # ----------------------------------------
+
+    async def compile(self, source: str, engine: str = 'regex', include_tokens: bool = True) -> Tuple[bytes, bool]:
+        """result_body() of source and whether it came from the recent results."""
+        self.stats['requests'] += 1
+        key = (hashlib.sha256(source.encode('utf-8', 'surrogatepass')).digest(), engine, include_tokens)
+        body = self.cache.get(key)
+        if body is not None:
+            self.stats['cache_hits'] += 1
+            return body, True
+
+        future = self.in_flight.get(key)
+        if future is None:
+            future = self.in_flight[key] = asyncio.get_running_loop().create_future()
+            self.queue.put_nowait((key, source, engine, include_tokens, future))
+        else:
+            self.stats['shared'] += 1
+        # shielded so a client that disconnects does not cancel the work others wait for
+        return await asyncio.shield(future), False
+
+    async def _run_batcher(self):
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.jobs)
+        queue = self.queue
+        while True:
+            batch = [await queue.get()]
+            await slots.acquire()
+            if self.batch_delay:
+                await asyncio.sleep(self.batch_delay)
+            # spread a backlog over all workers instead of handing it to the first one free
+            limit = min(self.max_batch, -(-(queue.qsize() + 1) // self.jobs))
+            while len(batch) < limit and not queue.empty():
+                batch.append(queue.get_nowait())
+            task = loop.create_task(self._run_batch(batch, slots))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[tuple], slots: asyncio.Semaphore):
+        self.stats['batches'] += 1
+        self.stats['compiled'] += len(batch)
+        try:
+            items = [(source, engine, include_tokens) for _, source, engine, include_tokens, _ in batch]
+            try:
+                bodies = await asyncio.get_running_loop().run_in_executor(self.executor, _compile_batch, items)
+            except Exception as e:
+                body = _error_body('internal', f"{type(e).__name__}: {e}")
+                bodies = [body] * len(batch)
+            else:
+                for (key, *_), body in zip(batch, bodies):
+                    self.cache.put(key, body)
+            for (key, *_, future), body in zip(batch, bodies):
+                if not future.done():
+                    future.set_result(body)
+        finally:
+            for key, *_ in batch:
+                self.in_flight.pop(key, None)
+            slots.release()
+
+    # ----------------------------------------
+    # Protocol
+    # ----------------------------------------
+
+    async def handle(self, line: bytes) -> bytes:
+        """Response line, without the newline, to one request line."""
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("a request must be a JSON object")
+        except ValueError as e:
+            return self._request_error(None, f"Invalid request: {e}")
+
+        request_id = request.get('id')
+        operation = request.get('op', 'compile')
+        if operation == 'stats':
+            return json.dumps({'id': request_id, 'stats': self.statistics()}, separators=(',', ':')).encode()
+        if operation != 'compile':
+            return self._request_error(request_id, f"Unknown operation '{operation}'")
+        source = request.get('source')
+        if not isinstance(source, str):
+            return self._request_error(request_id, "'source' must be a string")
+        engine = request.get('engine', 'regex')
+        if engine not in SERVICE_ENGINES:
+            return self._request_error(
+                request_id, f"Lexer engine '{engine}' is not served, expected one of {', '.join(SERVICE_ENGINES)}"
+            )
+
+        body, cached = await self.compile(source, engine, bool(request.get('tokens', True)))
+        if body.startswith(b'{"ok":false'):
+            self.stats['errors'] += 1
+        prefix = b'{"id":' + json.dumps(request_id).encode() + (b',"cached":true,' if cached else b',"cached":false,')
+        return prefix + body[1:]
+
+    def _request_error(self, request_id, message: str) -> bytes:
+        self.stats['errors'] += 1
+        return b'{"id":' + json.dumps(request_id).encode() + b',"cached":false,' + _error_body('request', message)[1:]
+
+    def statistics(self) -> Dict[str, float]:
+        statistics = dict(self.stats)
+        statistics['mean_batch'] = self.stats['compiled'] / self.stats['batches'] if self.stats['batches'] else 0.0
+        statistics['queued'] = self.queue.qsize() if self.queue is not None else 0
+        statistics['cache_entries'] = len(self.cache.entries)
+        statistics['cache_bytes'] = self.cache.size
+        return statistics
+
+    async def serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer the requests of one connection concurrently, each as soon as it is done."""
+        self.stats['connections'] += 1
+        responses = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(self._request_error(None, "Request line too long") + b'\n')
+                    break
+                except ConnectionError:
+                    break
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.get_running_loop().create_task(self._respond(line, writer))
+                responses.add(task)
+                task.add_done_callback(responses.discard)
+        finally:
+            if responses:
+                await asyncio.gather(*responses, return_exceptions=True)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _respond(self, line: bytes, writer: asyncio.StreamWriter):
+        response = await self.handle(line)
+        if writer.is_closing():
+            return
+        writer.write(response + b'\n')
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def listen(self, host: str = '127.0.0.1', port: int = 0, path: Optional[str] = None) -> asyncio.AbstractServer:
+        """Start the workers and accept connections on a TCP port, or a Unix socket when path is given."""
+        await self.start()
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve_connection, path, limit=LINE_LIMIT)
+        return await asyncio.start_server(self.serve_connection, host, port, limit=LINE_LIMIT)
+
+
+class CompileClient:
+    """Client of a CompileServer; requests on one connection may overlap."""
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count()
+        self._receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    @classmethod
+    async def connect(cls, host: str = '127.0.0.1', port: int = 8765, path: Optional[str] = None) -> 'CompileClient':
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path, limit=LINE_LIMIT)
+        else:
+            reader, writer = await asyncio.open_connection(host, port, limit=LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def request(self, request: Dict) -> Dict:
+        request_id = next(self._ids)
+        future = self.pending[request_id] = asyncio.get_running_loop().create_future()
+        self.writer.write(json.dumps(dict(request, id=request_id)).encode() + b'\n')
+        await self.writer.drain()
+        return await future
+
+    async def compile(self, source: str, engine: str = 'regex', tokens: bool = True) -> Dict:
+        return await self.request({'source': source, 'engine': engine, 'tokens': tokens})
+
+    async def statistics(self) -> Dict[str, float]:
+        return (await self.request({'op': 'stats'}))['stats']
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+        self._receiver.cancel()
+
+    async def _receive(self):
+        try:
+            while True:
+                line = await self.reader.readline()
+                if not line:
+                    break
+                response = json.loads(line)
+                future = self.pending.pop(response.get('id'), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        finally:
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the compile server closed"))
+            self.pending.clear()
+
+
+async def serve(host: str = '127.0.0.1', port: int = 8765, path: Optional[str] = None, **options):
+    """Run a CompileServer until cancelled."""
+    server = CompileServer(**options)
+    listener = await server.listen(host, port, path)
+    address = path if path is not None else "%s:%d" % listener.sockets[0].getsockname()[:2]
+    print(f"listening on {address}", flush=True)
+    loop = asyncio.get_running_loop()
+    serving = asyncio.ensure_future(listener.serve_forever())
+    try:
+        # SIGTERM (as sent by load_generator --spawn) stops serving like Ctrl-C,
+        # so the worker processes are shut down instead of orphaned
+        loop.add_signal_handler(signal.SIGTERM, serving.cancel)
+    except NotImplementedError:
+        pass
+    try:
+        async with listener:
+            try:
+                await serving
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+    finally:
+        try:
+            loop.remove_signal_handler(signal.SIGTERM)
+        except NotImplementedError:
+            pass
+        await server.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve lexing and validation over a JSON-lines socket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="TCP port, 0 picks a free one")
+    parser.add_argument("--unix", metavar="PATH", default=None, help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--max-batch", type=int, default=32, help="most scripts sent to a worker at once")
+    parser.add_argument("--batch-delay", type=float, default=0.0, help="milliseconds to wait for a batch to fill")
+    parser.add_argument("--cache-entries", type=int, default=1024, help="recent results kept")
+    parser.add_argument("--cache-size", type=int, default=64, help="recent results size limit in MiB")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(
+            args.host, args.port, args.unix, jobs=args.jobs, max_batch=args.max_batch,
+            batch_delay=args.batch_delay / 1000, cache_entries=args.cache_entries,
+            cache_bytes=args.cache_size * 1024 * 1024,
+        ))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
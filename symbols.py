@@ -1,4 +1,9 @@
-from typing import List, Dict, Tuple, Optional
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from syntax_validation import SyntaxValidator
+from tokens import LineIndex, Token, TokenBuffer, TokenOrdinal
 
 class SymbolTable:
     def __init__(self):
@@ -35,3 +40,707 @@ class SymbolTable:
             print(f"| {name:<{name_width}} | {info['type']:<{type_width}} | {params:<{params_width}} |")
         
         print(horizontal_line)
+
+
+# ----------------------------------------
+# Scoped symbol table
+# ----------------------------------------
+
+class Symbol:
+    """A declared name. kind is 'variable', 'parameter' or 'function'."""
+    __slots__ = ('name', 'kind', 'line', 'position', 'parameters', 'scope', 'uses', 'assignments')
+
+    def __init__(self, name: str, kind: str, line: int, position: int, scope: 'Scope', parameters: Tuple[str, ...] = ()):
+        self.name = name
+        self.kind = kind
+        self.line = line
+        self.position = position
+        self.parameters = parameters
+        self.scope = scope
+        self.uses = 0
+        self.assignments = 1
+
+    def __repr__(self) -> str:
+        return f"Symbol({self.name!r}, {self.kind!r}, line {self.line}, uses {self.uses})"
+
+
+class Scope:
+    """
+    kind is 'global', 'function' or 'block'. start and end are the token
+    indices the scope covers; end stays None while it is open.
+    """
+    __slots__ = ('kind', 'name', 'parent', 'symbols', 'start', 'end', 'depth')
+
+    def __init__(self, kind: str, name: str, parent: Optional['Scope'], start: int):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.symbols: Dict[str, Symbol] = {}
+        self.start = start
+        self.end: Optional[int] = None
+        self.depth = 0 if parent is None else parent.depth + 1
+
+    def __repr__(self) -> str:
+        return f"Scope({self.kind!r}, {self.name!r}, {len(self.symbols)} symbols)"
+
+
+class ScopedSymbolTable:
+    """
+    Symbols per global, function and block scope.
+    Every name maps to the stack of its visible bindings, innermost last, so
+    lookup() is a single dict access however deep the scope chain is;
+    pop_scope() unbinds the names the closing scope declared. Closed scopes
+    stay in `scopes` for later queries. Names are interned.
+
+    The language is function scoped at run time: LET and FOR targets inside
+    an IF or loop belong to the enclosing function (or the program), so block
+    scopes record their extent but variables are declared in the nearest
+    function or global scope.
+    """
+    def __init__(self):
+        self.global_scope = Scope('global', '<global>', None, 0)
+        self.scope = self.global_scope
+        self.scopes: List[Scope] = [self.global_scope]
+        self._bindings: Dict[str, List[Symbol]] = {}
+        # (name, line, position) of references to names not declared at that point
+        self.unresolved: List[Tuple[str, int, int]] = []
+
+    def push_scope(self, kind: str, name: str, start: int) -> Scope:
+        scope = self.scope = Scope(kind, name, self.scope, start)
+        self.scopes.append(scope)
+        return scope
+
+    def pop_scope(self, end: int):
+        scope = self.scope
+        scope.end = end
+        bindings = self._bindings
+        for name, symbol in scope.symbols.items():
+            stack = bindings[name]
+            if stack[-1] is symbol:
+                stack.pop()
+            else:
+                stack.remove(symbol)
+            if not stack:
+                del bindings[name]
+        self.scope = scope.parent
+
+    def declare(self, name: str, kind: str, line: int, position: int,
+                parameters: Tuple[str, ...] = (), scope: Optional[Scope] = None) -> Symbol:
+        """
+        Declare name in scope, by default the innermost function or global
+        scope. Declaring a name the scope already has counts as an assignment.
+        """
+        if scope is None:
+            scope = self.scope
+            while scope.kind == 'block':
+                scope = scope.parent
+        name = sys.intern(name)
+        symbol = scope.symbols.get(name)
+        if symbol is not None:
+            symbol.assignments += 1
+            if kind == 'function':
+                symbol.kind, symbol.parameters = kind, parameters
+            return symbol
+        symbol = scope.symbols[name] = Symbol(name, kind, line, position, scope, parameters)
+        stack = self._bindings.setdefault(name, [])
+        # an outer scope's binding goes below those of the scopes inside it
+        index = len(stack)
+        while index and stack[index - 1].scope.depth > scope.depth:
+            index -= 1
+        stack.insert(index, symbol)
+        return symbol
+
+    def lookup(self, name: str) -> Optional[Symbol]:
+        stack = self._bindings.get(name)
+        return stack[-1] if stack else None
+
+    def reference(self, name: str, line: int, position: int, assigns: bool = False) -> Optional[Symbol]:
+        """Count a use of name (and an assignment with assigns); unresolved names are recorded."""
+        stack = self._bindings.get(name)
+        if not stack:
+            self.unresolved.append((sys.intern(name), line, position))
+            return None
+        symbol = stack[-1]
+        symbol.uses += 1
+        if assigns:
+            symbol.assignments += 1
+        return symbol
+
+    def all_symbols(self) -> List[Symbol]:
+        return [symbol for scope in self.scopes for symbol in scope.symbols.values()]
+
+    def to_symbol_table(self) -> SymbolTable:
+        """The global scope in the flat SymbolTable format."""
+        table = SymbolTable()
+        for name, symbol in self.global_scope.symbols.items():
+            table.set_symbol(name, 'function' if symbol.kind == 'function' else 'integer', list(symbol.parameters))
+        return table
+
+    def print_table(self):
+        rows = [
+            (symbol.name, symbol.kind, f"{scope.kind} {scope.name}" if scope.parent else scope.name,
+             str(symbol.line), str(symbol.uses), ', '.join(symbol.parameters))
+            for scope in self.scopes for symbol in scope.symbols.values()
+        ]
+        headers = ("Name", "Kind", "Scope", "Line", "Uses", "Parameters")
+        widths = [max([len(header)] + [len(row[column]) for row in rows]) for column, header in enumerate(headers)]
+        horizontal_line = "+" + "+".join('-' * (width + 2) for width in widths) + "+"
+
+        print(horizontal_line)
+        print("| " + " | ".join(f"{header:<{width}}" for header, width in zip(headers, widths)) + " |")
+        print(horizontal_line)
+        for row in rows:
+            print("| " + " | ".join(f"{cell:<{width}}" for cell, width in zip(row, widths)) + " |")
+        print(horizontal_line)
+
+
+class SymbolCollector(SyntaxValidator):
+    """
+    SyntaxValidator that fills a ScopedSymbolTable as it validates, so
+    declarations come from the grammar rather than lexer lookahead. Function
+    names are declared globally before their body, so recursion resolves, and
+    LET targets after their value. Uses the recursive engine and needs
+    indexable tokens.
+    """
+    def __init__(self, tokens: Iterable[Token]):
+        if not hasattr(tokens, '__getitem__'):
+            tokens = list(tokens)
+        super().__init__(tokens)
+        self.symbol_table = ScopedSymbolTable()
+        self._loop_variable: Optional[int] = None
+        self._parameters: List[int] = []
+
+    def collect(self) -> ScopedSymbolTable:
+        """Validate the tokens and return their symbols; raises SyntaxError like validate()."""
+        self.validate()
+        self.symbol_table.global_scope.end = self.current
+        return self.symbol_table
+
+    def _declare(self, index: int, kind: str, parameters: Tuple[str, ...] = (), scope: Optional[Scope] = None) -> Symbol:
+        token = self.tokens[index]
+        return self.symbol_table.declare(token.lexeme, kind, token.line, token.position, parameters, scope)
+
+    def _reference(self, index: int, assigns: bool = False):
+        token = self.tokens[index]
+        self.symbol_table.reference(token.lexeme, token.line, token.position, assigns)
+
+    def _scoped(self, kind: str, name: str, handler):
+        table = self.symbol_table
+        table.push_scope(kind, name, self.current)
+        try:
+            handler()
+        finally:
+            # also on errors, so validate_all() resumes in the right scope
+            table.pop_scope(self.current)
+
+    # ----------------------------------------
+    # Statements
+    # ----------------------------------------
+
+    def _validate_let_statement(self):
+        start = self.current
+        super()._validate_let_statement()
+        if self.types[start + 2] == TokenOrdinal.LEFT_BRACKET:
+            # element assignment reads the array
+            self._reference(start + 1)
+        else:
+            self._declare(start + 1, 'variable')
+
+    def _validate_if_statement(self):
+        self._scoped('block', 'IF', super()._validate_if_statement)
+
+    def _validate_while_statement(self):
+        self._scoped('block', 'WHILE', super()._validate_while_statement)
+
+    def _validate_for_statement(self):
+        # declared by _validate_block once the bounds are read
+        self._loop_variable = self.current + 1
+        try:
+            self._scoped('block', 'FOR', super()._validate_for_statement)
+        finally:
+            self._loop_variable = None
+
+    def _validate_do_while_statement(self):
+        self._scoped('block', 'DO', super()._validate_do_while_statement)
+
+    def _validate_repeat_until_statement(self):
+        self._scoped('block', 'REPEAT', super()._validate_repeat_until_statement)
+
+    def _validate_function_definition(self):
+        start = self.current
+        self._parameters = []
+        name = self.tokens[start + 1].lexeme if self.types[start + 1] == TokenOrdinal.IDENTIFIER else '<function>'
+        self._scoped('function', name, super()._validate_function_definition)
+
+    def _validate_block(self, end_token: int, optional_mid_token: Optional[int] = None):
+        if self._loop_variable is not None:
+            self._declare(self._loop_variable, 'variable')
+            self._loop_variable = None
+        if self.symbol_table.scope.kind == 'function' and end_token == TokenOrdinal.END:
+            function_scope = self.symbol_table.scope
+            parameters = self._parameters
+            self._parameters = []
+            self._declare(
+                function_scope.start + 1, 'function',
+                tuple(sys.intern(self.tokens[index].lexeme) for index in parameters),
+                self.symbol_table.global_scope
+            )
+            for index in parameters:
+                self._declare(index, 'parameter')
+        super()._validate_block(end_token, optional_mid_token)
+
+    def _validate_function_call(self):
+        start = self.current
+        super()._validate_function_call()
+        self._reference(start + 1)
+
+    def _validate_parameter_list(self):
+        start = self.current
+        super()._validate_parameter_list()
+        names = [index for index in range(start, self.current) if self.types[index] == TokenOrdinal.IDENTIFIER]
+        # FUNC name ( parameters ) or CALL name ( arguments )
+        if self.types[start - 3] == TokenOrdinal.FUNC:
+            self._parameters = names
+        else:
+            for index in names:
+                self._reference(index)
+
+    def _validate_increment_decrement(self):
+        start = self.current
+        super()._validate_increment_decrement()
+        self._reference(start, assigns=True)
+
+    def _validate_compound_assignment(self):
+        start = self.current
+        super()._validate_compound_assignment()
+        self._reference(start, assigns=True)
+
+    # ----------------------------------------
+    # Expressions
+    # ----------------------------------------
+
+    def _validate_term(self):
+        start = self.current
+        super()._validate_term()
+        token_type = self.types[start]
+        if token_type == TokenOrdinal.IDENTIFIER:
+            self._reference(start)
+        elif token_type == TokenOrdinal.CALL:
+            self._reference(start + 1)
+
+    STATEMENT_HANDLERS = {
+        **SyntaxValidator.STATEMENT_HANDLERS,
+        TokenOrdinal.LET: _validate_let_statement,
+        TokenOrdinal.IF: _validate_if_statement,
+        TokenOrdinal.WHILE: _validate_while_statement,
+        TokenOrdinal.FOR: _validate_for_statement,
+        TokenOrdinal.DO: _validate_do_while_statement,
+        TokenOrdinal.REPEAT: _validate_repeat_until_statement,
+        TokenOrdinal.FUNC: _validate_function_definition,
+        TokenOrdinal.CALL: _validate_function_call,
+    }
+
+
+def collect_symbols(tokens: Iterable[Token]) -> ScopedSymbolTable:
+    return SymbolCollector(tokens).collect()
+
+
+# ----------------------------------------
+# Cross-reference index
+# ----------------------------------------
+
+# how an identifier occurrence refers to its name
+_USE, _CALL, _DEFINITION = range(3)
+
+
+class CrossReference:
+    """
+    What an identifier refers to. kind is 'variable', 'parameter' or
+    'function', None for names defined nowhere; scope is the function name
+    for locals and '<global>' otherwise. definition is the offset of the
+    defining identifier and uses the sorted offsets of every other
+    occurrence, assignments included.
+    """
+    __slots__ = ('name', 'kind', 'scope', 'definition', 'uses')
+
+    def __init__(self, name: str, kind: Optional[str], scope: str, definition: Optional[int], uses: List[int]):
+        self.name = name
+        self.kind = kind
+        self.scope = scope
+        self.definition = definition
+        self.uses = uses
+
+    def __repr__(self) -> str:
+        return f"CrossReference({self.name!r}, {self.kind!r}, {self.scope!r}, {len(self.uses)} uses)"
+
+
+class _Unit:
+    """
+    Identifier occurrences of a run of top-level tokens: one FUNC ... END, or
+    global code between functions. Offsets are relative to start, so an edit
+    before the unit only moves start. Scope 0 is global; functions of the
+    unit are scopes 1, 2, ... with their first definition of every local and
+    the occurrences resolving to them.
+    """
+    __slots__ = ('start', 'offsets', 'names', 'scopes', 'scope_names', 'definitions', 'occurrences',
+                 'global_definitions', 'global_occurrences')
+
+    def __init__(self, start: int):
+        self.start = start
+        self.offsets = array('I')
+        self.names: List[str] = []
+        self.scopes = array('I')
+        self.scope_names: List[str] = ['<global>']
+        self.definitions: List[Dict[str, Tuple[int, str]]] = [{}]
+        self.occurrences: List[Dict[str, List[int]]] = [{}]
+        # name -> (offset, kind, parameters) of the unit's first global definition
+        self.global_definitions: Dict[str, Tuple[int, str, Tuple[str, ...]]] = {}
+        self.global_occurrences: Dict[str, List[int]] = {}
+
+
+class _BufferTokens:
+    """The token access CrossReferenceIndex needs, over a TokenBuffer."""
+    def __init__(self, tokens: TokenBuffer):
+        self.types = tokens.types
+        self.count = len(tokens.types) - 1
+        self.source = tokens.source
+        self.starts = tokens.starts
+        self.ends = tokens.ends
+
+    def lexeme(self, index: int) -> str:
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def start(self, index: int) -> int:
+        return self.starts[index]
+
+    def index_at(self, offset: int) -> int:
+        return bisect_left(self.starts, offset, 0, self.count)
+
+
+class CrossReferenceIndex(SymbolTable):
+    """
+    Definition and use sites of every identifier, for go-to-definition and
+    find-usages without rescanning the tokens.
+
+    Names resolve as at run time: a function's locals are its parameters and
+    the targets of its plain LETs and FORs, CALL targets and every other name
+    are global, and a name is defined by its first definition in its scope.
+    The index is cut into units, one per top-level FUNC ... END and one per
+    UNIT_SIZE tokens of global code, and keeps each unit's occurrences
+    sorted by offset, so the symbol at an offset is two bisections away and
+    update() after an edit only rescans the units it touched. symbols holds
+    the global definitions in the SymbolTable format.
+
+    Tokens are read through an object with `types` (ordinals, EOF at index
+    `count`), `count`, `lexeme(index)`, `start(index)` and `index_at(offset)`,
+    the first token starting at or after offset; from_tokens() wraps a
+    TokenBuffer.
+    """
+    UNIT_SIZE = 256
+
+    def __init__(self, line_index: Optional[LineIndex] = None):
+        super().__init__()
+        self.line_index = line_index
+        self.units: List[_Unit] = []
+        self._starts: List[int] = []
+        # name -> units holding a global definition / a global occurrence of it,
+        # unordered so edits update them in constant time; reference() sorts
+        self._definition_units: Dict[str, Set[_Unit]] = {}
+        self._occurrence_units: Dict[str, Set[_Unit]] = {}
+
+    @classmethod
+    def from_tokens(cls, tokens: TokenBuffer) -> 'CrossReferenceIndex':
+        """Index a TokenBuffer, as from tokenize(compact=True) or tokenize(lazy_positions=True)."""
+        line_index = getattr(tokens, 'line_index', None)
+        if line_index is None:
+            line_index = LineIndex(tokens.source, tokens.lines[0], tokens.positions[0], tokens.starts[0]) \
+                if len(tokens) else LineIndex(tokens.source)
+        index = cls(line_index)
+        index.build(_BufferTokens(tokens))
+        return index
+
+    def build(self, tokens):
+        units, _ = self._scan(tokens, 0, {})
+        self.units = units
+        self._starts = [unit.start for unit in units]
+        self._definition_units = {}
+        self._occurrence_units = {}
+        self.symbols = {}
+        self._add_units(units)
+
+    def update(self, tokens, change_start: int, change_end: Optional[int], delta: int):
+        """
+        Catch up with an edit. Tokens starting before change_start and those
+        at or after change_end (old offsets, now shifted by delta; None when
+        every token from change_start on changed) must be unchanged; the ones
+        between are rescanned with the units around them
+        until the scan reaches an old unit boundary again.
+        """
+        starts = self._starts
+        first = max(bisect_right(starts, change_start) - 1, 0)
+        if first and starts[first] == change_start:
+            # the unit before may have ended only because of the changed token
+            first -= 1
+        resync = bisect_left(starts, change_end) if change_end is not None else len(starts)
+        begin = tokens.index_at(starts[first]) if first else 0
+        boundaries = {start + delta: number for number, start in enumerate(starts[resync:], resync)}
+        new_units, stop = self._scan(tokens, begin, boundaries)
+        if stop is None:
+            stop = len(self.units)
+
+        old_units = self.units[first:stop]
+        for unit in self.units[stop:]:
+            unit.start += delta
+        self.units[first:stop] = new_units
+        self._starts = [unit.start for unit in self.units]
+        self._remove_units(old_units)
+        self._add_units(new_units)
+
+    # ----------------------------------------
+    # Queries
+    # ----------------------------------------
+
+    def reference_at(self, offset: int) -> Optional[CrossReference]:
+        """What the identifier covering offset refers to, None if there is no identifier there."""
+        unit_index = bisect_right(self._starts, offset) - 1
+        if unit_index < 0:
+            return None
+        unit = self.units[unit_index]
+        relative = offset - unit.start
+        occurrence = bisect_right(unit.offsets, relative) - 1
+        if occurrence < 0:
+            return None
+        name = unit.names[occurrence]
+        if relative >= unit.offsets[occurrence] + len(name):
+            return None
+        scope = unit.scopes[occurrence]
+        if scope == 0:
+            return self.reference(name)
+
+        definition, kind = unit.definitions[scope][name]
+        uses = [unit.start + use for use in unit.occurrences[scope][name] if use != definition]
+        return CrossReference(name, kind, unit.scope_names[scope], unit.start + definition, uses)
+
+    def reference(self, name: str) -> CrossReference:
+        """The global symbol called name."""
+        definition = kind = None
+        units = self._definition_units.get(name)
+        if units:
+            unit = min(units, key=_unit_start)
+            relative, kind, _ = unit.global_definitions[name]
+            definition = unit.start + relative
+        uses = []
+        for unit in sorted(self._occurrence_units.get(name, ()), key=_unit_start):
+            start = unit.start
+            uses.extend(start + use for use in unit.global_occurrences[name])
+        if definition is not None:
+            uses.remove(definition)
+        return CrossReference(name, kind, '<global>', definition, uses)
+
+    def symbol_at(self, line: int, position: int) -> Optional[CrossReference]:
+        """reference_at() for a line and position, as tokens report them."""
+        try:
+            offset = self.line_index.offset(line, position)
+        except ValueError:
+            return None
+        return self.reference_at(offset)
+
+    def location(self, offset: int) -> Tuple[int, int]:
+        """(line, position) of an offset the queries returned."""
+        return self.line_index.locate(offset)
+
+    # ----------------------------------------
+    # Scanning
+    # ----------------------------------------
+
+    def _scan(self, tokens, index: int, boundaries: Dict[int, int]) -> Tuple[List[_Unit], Optional[int]]:
+        """
+        Units of the tokens from index, a top-level unit boundary, on.
+        boundaries maps the offsets of old unit starts to their unit numbers;
+        the scan stops at the first one it reaches between units and returns
+        its number, or None when it scanned to the end.
+        """
+        types, count = tokens.types, tokens.count
+        units = []
+        while index < count:
+            token_type = types[index]
+            if boundaries and token_type != TokenOrdinal.IDENTIFIER and token_type != TokenOrdinal.LEFT_BRACKET:
+                old = boundaries.get(tokens.start(index))
+                if old is not None:
+                    return units, old
+            if token_type == TokenOrdinal.FUNC:
+                unit, index = self._scan_function(tokens, index)
+            else:
+                unit, index = self._scan_global(tokens, index, boundaries)
+            units.append(unit)
+        return units, None
+
+    def _scan_global(self, tokens, index: int, boundaries: Dict[int, int]) -> Tuple[_Unit, int]:
+        """
+        Global code up to a FUNC, an old unit boundary or UNIT_SIZE tokens,
+        cut before a token no role depends on: neither an identifier, whose
+        role depends on the token before it, nor '[', which decides the role
+        of the identifier before it.
+        """
+        types, count = tokens.types, tokens.count
+        unit = _Unit(tokens.start(index))
+        raw = []
+        first = index
+        limit = index + self.UNIT_SIZE
+        previous = None
+        while index < count:
+            token_type = types[index]
+            if token_type == TokenOrdinal.FUNC:
+                break
+            if (index > first and token_type != TokenOrdinal.IDENTIFIER and token_type != TokenOrdinal.LEFT_BRACKET
+                    and (index >= limit or boundaries and tokens.start(index) in boundaries)):
+                break
+            if token_type == TokenOrdinal.IDENTIFIER:
+                role = _role(previous, types[index + 1])
+                if role is not None:
+                    raw.append((tokens.start(index) - unit.start, tokens.lexeme(index), role, 0, 'variable', ()))
+            previous = token_type
+            index += 1
+        self._resolve(unit, raw)
+        return unit, index
+
+    def _scan_function(self, tokens, index: int) -> Tuple[_Unit, int]:
+        """A top-level FUNC through its matching END, or the end of the tokens."""
+        types, count = tokens.types, tokens.count
+        unit = _Unit(tokens.start(index))
+        raw = []
+        scopes = []
+        previous = None
+        while index < count:
+            token_type = types[index]
+            if token_type == TokenOrdinal.FUNC:
+                scope = len(unit.scope_names)
+                scopes.append(scope)
+                index += 1
+                name = '<function>'
+                name_index = None
+                if types[index] == TokenOrdinal.IDENTIFIER:
+                    name_index = index
+                    name = tokens.lexeme(index)
+                    index += 1
+                parameters = []
+                if types[index] == TokenOrdinal.LEFT_PAREN:
+                    index += 1
+                    while types[index] == TokenOrdinal.IDENTIFIER or types[index] == TokenOrdinal.COMMA:
+                        if types[index] == TokenOrdinal.IDENTIFIER:
+                            parameters.append(index)
+                        index += 1
+                parameter_names = tuple(sys.intern(tokens.lexeme(parameter)) for parameter in parameters)
+                unit.scope_names.append(name)
+                unit.definitions.append({})
+                unit.occurrences.append({})
+                if name_index is not None:
+                    raw.append((tokens.start(name_index) - unit.start, name, _DEFINITION, 0, 'function', parameter_names))
+                for parameter, parameter_name in zip(parameters, parameter_names):
+                    raw.append((tokens.start(parameter) - unit.start, parameter_name, _DEFINITION, scope, 'parameter', ()))
+                previous = types[index - 1]
+                continue
+            if token_type == TokenOrdinal.END:
+                if scopes:
+                    scopes.pop()
+                if not scopes:
+                    index += 1
+                    break
+            elif token_type == TokenOrdinal.IDENTIFIER:
+                role = _role(previous, types[index + 1])
+                if role is not None:
+                    raw.append((tokens.start(index) - unit.start, tokens.lexeme(index), role,
+                                scopes[-1] if scopes else 0, 'variable', ()))
+            previous = token_type
+            index += 1
+        self._resolve(unit, raw)
+        return unit, index
+
+    @staticmethod
+    def _resolve(unit: _Unit, raw: List[tuple]):
+        """Fill unit from its (offset, name, role, scope, kind, parameters) occurrences."""
+        definitions = unit.definitions
+        for offset, name, role, scope, kind, _ in raw:
+            if role == _DEFINITION and scope and name not in definitions[scope]:
+                definitions[scope][name] = (offset, kind)
+
+        offsets, names, scopes = unit.offsets, unit.names, unit.scopes
+        occurrences = unit.occurrences
+        global_definitions, global_occurrences = unit.global_definitions, unit.global_occurrences
+        for offset, name, role, scope, kind, parameters in sorted(raw, key=_raw_offset):
+            name = sys.intern(name)
+            offsets.append(offset)
+            names.append(name)
+            if scope and role != _CALL and name in definitions[scope]:
+                scopes.append(scope)
+                occurrences[scope].setdefault(name, []).append(offset)
+                continue
+            scopes.append(0)
+            global_occurrences.setdefault(name, []).append(offset)
+            if role == _DEFINITION and name not in global_definitions:
+                global_definitions[name] = (offset, kind, parameters)
+
+    # ----------------------------------------
+    # Global bookkeeping
+    # ----------------------------------------
+
+    def _add_units(self, units: List[_Unit]):
+        changed = set()
+        for unit in units:
+            for name in unit.global_definitions:
+                self._definition_units.setdefault(name, set()).add(unit)
+                changed.add(name)
+            for name in unit.global_occurrences:
+                self._occurrence_units.setdefault(name, set()).add(unit)
+        self._refresh_symbols(changed)
+
+    def _remove_units(self, units: List[_Unit]):
+        changed = set()
+        for unit in units:
+            for name in unit.global_definitions:
+                _discard(self._definition_units, name, unit)
+                changed.add(name)
+            for name in unit.global_occurrences:
+                _discard(self._occurrence_units, name, unit)
+        self._refresh_symbols(changed)
+
+    def _refresh_symbols(self, names: Iterable[str]):
+        for name in names:
+            units = self._definition_units.get(name)
+            if not units:
+                self.symbols.pop(name, None)
+                continue
+            _, kind, parameters = min(units, key=_unit_start).global_definitions[name]
+            if kind == 'function':
+                self.set_symbol(name, 'function', list(parameters))
+            else:
+                self.set_symbol(name, 'integer')
+
+
+def _role(previous: Optional[int], following: int) -> Optional[int]:
+    """Role of an identifier from the tokens around it; None for the Range of FOR ... IN Range(...)."""
+    if previous == TokenOrdinal.CALL:
+        return _CALL
+    if previous == TokenOrdinal.FOR:
+        return _DEFINITION
+    if previous == TokenOrdinal.LET:
+        # LET name[index] = value assigns an element of an existing array
+        return _USE if following == TokenOrdinal.LEFT_BRACKET else _DEFINITION
+    if previous == TokenOrdinal.IN:
+        return None
+    return _USE
+
+
+def _discard(units_by_name: Dict[str, Set[_Unit]], name: str, unit: _Unit):
+    units = units_by_name[name]
+    units.discard(unit)
+    if not units:
+        del units_by_name[name]
+
+
+def _unit_start(unit: _Unit) -> int:
+    return unit.start
+
+
+def _raw_offset(occurrence: tuple) -> int:
+    return occurrence[0]
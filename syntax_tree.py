@@ -0,0 +1,309 @@
+from array import array
+from enum import Enum, auto
+from types import SimpleNamespace
+from typing import Dict, Iterable, List, Sequence
+from syntax_validation import SyntaxValidator
+from tokens import Token, TokenOrdinal, TOKEN_TYPES_BY_ORDINAL
+
+
+class NodeKind(Enum):
+    PROGRAM = auto()
+    BLOCK = auto()
+
+    # statements; token is the keyword unless noted
+    LET = auto()                # token: target identifier; children: index expressions..., value
+    IF = auto()                 # children: condition, then BLOCK[, else BLOCK]
+    WHILE = auto()              # children: condition, BLOCK
+    FOR = auto()                # token: loop variable; children: start, end[, step], BLOCK
+    FOR_IN = auto()             # token: loop variable; children: start, end, step, BLOCK
+    DO_WHILE = auto()           # children: BLOCK, condition
+    REPEAT_UNTIL = auto()       # children: BLOCK, condition
+    FUNC = auto()               # token: function name; children: parameter NAMEs..., BLOCK
+    CALL = auto()               # token: function name; children: argument NAMEs...
+    RETURN = auto()             # children: [value]
+    INCREMENT = auto()          # token: identifier
+    DECREMENT = auto()          # token: identifier
+    COMPOUND_ASSIGN = auto()    # token: identifier, followed by the operator; children: value
+
+    # expressions
+    NUMBER = auto()
+    STRING = auto()
+    NAME = auto()
+    INDEX = auto()              # token: array identifier; children: index expressions...
+    ARRAY = auto()              # token: '['; children: elements...
+    CALL_EXPR = auto()          # token: function name; children: arguments...
+    BINARY = auto()             # token: operator; children: left, right
+    CONSTANT = auto()           # value computed by the optimizer, in SyntaxTree.values; token: source of the value
+
+
+# plain int mirror of NodeKind, like TokenOrdinal
+NodeOrdinal = SimpleNamespace(**{kind.name: kind.value for kind in NodeKind})
+NODE_KINDS_BY_ORDINAL = {kind.value: kind for kind in NodeKind}
+
+
+class SyntaxTree:
+    """
+    AST stored as an arena of parallel arrays instead of node objects.
+    Node n has kind kinds[n] (a NodeOrdinal), refers to tokens[token_indices[n]]
+    and has the children child_list[child_starts[n]:child_ends[n]]. Children
+    are always created before their parent, so the root is the last node.
+    CONSTANT nodes keep their value in `values`, keyed by node.
+    """
+    def __init__(self, tokens: Sequence[Token]):
+        self.tokens = tokens
+        self.kinds = bytearray()
+        self.token_indices = array('I')
+        self.child_starts = array('I')
+        self.child_ends = array('I')
+        self.child_list = array('I')
+        self.values: Dict[int, object] = {}
+        self.root = 0
+
+    def add(self, kind: int, token_index: int, children: Iterable[int] = ()) -> int:
+        child_list = self.child_list
+        self.child_starts.append(len(child_list))
+        child_list.extend(children)
+        self.child_ends.append(len(child_list))
+        self.kinds.append(kind)
+        self.token_indices.append(token_index)
+        return len(self.kinds) - 1
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def kind(self, node: int) -> NodeKind:
+        return NODE_KINDS_BY_ORDINAL[self.kinds[node]]
+
+    def token(self, node: int) -> Token:
+        return self.tokens[self.token_indices[node]]
+
+    def children(self, node: int) -> array:
+        return self.child_list[self.child_starts[node]:self.child_ends[node]]
+
+    def dump(self, node: int = None) -> str:
+        """Indented text rendering, one node per line."""
+        lines = []
+        stack = [(self.root if node is None else node, 0)]
+        while stack:
+            node, depth = stack.pop()
+            label = repr(self.values[node]) if node in self.values else self.token(node).lexeme
+            lines.append(f"{'  ' * depth}{self.kind(node).name} {label}")
+            stack.extend((child, depth + 1) for child in reversed(self.children(node)))
+        return "\n".join(lines)
+
+
+class AstBuilder(SyntaxValidator):
+    """
+    SyntaxValidator that also builds a SyntaxTree.
+    Each grammar method runs unchanged and its nodes are assembled from what it
+    consumed: nodes finished during a call are collected on `pending` and
+    become the children of the node made for the call, so the builder accepts
+    and rejects exactly what the validator does. Expressions are the
+    exception: the validator reads operators left to right without
+    precedence, so the builder overrides them to group operands by precedence.
+    Uses the recursive engine and needs indexable tokens.
+    """
+    def __init__(self, tokens: Iterable[Token]):
+        if not hasattr(tokens, '__getitem__'):
+            tokens = list(tokens)
+        super().__init__(tokens)
+        self.tree = SyntaxTree(tokens)
+        self.pending: List[int] = []
+
+    def build(self) -> SyntaxTree:
+        """Validate the tokens and return their tree; raises SyntaxError like validate()."""
+        self.validate()
+        self.tree.root = self.tree.add(NodeOrdinal.PROGRAM, 0, self.pending)
+        self.pending = []
+        return self.tree
+
+    def _finish(self, kind: int, token_index: int, mark: int):
+        """Make the nodes pending since `mark` the children of a new node."""
+        pending = self.pending
+        node = self.tree.add(kind, token_index, pending[mark:])
+        del pending[mark:]
+        pending.append(node)
+
+    # ----------------------------------------
+    # Statements
+    # ----------------------------------------
+
+    def _validate_let_statement(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_let_statement()
+        self._finish(NodeOrdinal.LET, start + 1, mark)
+
+    def _validate_if_statement(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_if_statement()
+        self._finish(NodeOrdinal.IF, start, mark)
+
+    def _validate_while_statement(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_while_statement()
+        self._finish(NodeOrdinal.WHILE, start, mark)
+
+    def _validate_for_statement(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_for_statement()
+        kind = NodeOrdinal.FOR_IN if self.types[start + 2] == TokenOrdinal.IN else NodeOrdinal.FOR
+        self._finish(kind, start + 1, mark)
+
+    def _validate_do_while_statement(self):
+        self._validate_loop_until(super()._validate_do_while_statement, NodeOrdinal.DO_WHILE)
+
+    def _validate_repeat_until_statement(self):
+        self._validate_loop_until(super()._validate_repeat_until_statement, NodeOrdinal.REPEAT_UNTIL)
+
+    def _validate_loop_until(self, validate, kind: int):
+        # these loops validate their body inline rather than through
+        # _validate_block, so the body BLOCK is made from all but the
+        # trailing condition
+        start, mark = self.current, len(self.pending)
+        validate()
+        condition = self.pending.pop()
+        self._finish(NodeOrdinal.BLOCK, start + 1, mark)
+        self.pending.append(condition)
+        self._finish(kind, start, mark)
+
+    def _validate_function_definition(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_function_definition()
+        self._finish(NodeOrdinal.FUNC, start + 1, mark)
+
+    def _validate_function_call(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_function_call()
+        self._finish(NodeOrdinal.CALL, start + 1, mark)
+
+    def _validate_return_statement(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_return_statement()
+        self._finish(NodeOrdinal.RETURN, start, mark)
+
+    def _validate_increment_decrement(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_increment_decrement()
+        kind = NodeOrdinal.INCREMENT if self.types[start + 1] == TokenOrdinal.INCREMENT else NodeOrdinal.DECREMENT
+        self._finish(kind, start, mark)
+
+    def _validate_compound_assignment(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_compound_assignment()
+        self._finish(NodeOrdinal.COMPOUND_ASSIGN, start, mark)
+
+    def _validate_parameter_list(self):
+        start = self.current
+        super()._validate_parameter_list()
+        # identifiers separated by commas
+        for index in range(start, self.current, 2):
+            self.pending.append(self.tree.add(NodeOrdinal.NAME, index))
+
+    def _validate_block(self, end_token: int, optional_mid_token=None):
+        mark = len(self.pending)
+        block_start = self.current
+        while not self._check(end_token) and (optional_mid_token is None or not self._check(optional_mid_token)):
+            self._validate_statement()
+        self._finish(NodeOrdinal.BLOCK, block_start, mark)
+
+        if optional_mid_token is not None and self._match(optional_mid_token):
+            mark, block_start = len(self.pending), self.current
+            while not self._check(end_token):
+                self._validate_statement()
+            self._finish(NodeOrdinal.BLOCK, block_start, mark)
+
+        self._consume(end_token, f"Expected '{TOKEN_TYPES_BY_ORDINAL[end_token].name}'")
+
+    # ----------------------------------------
+    # Expressions
+    # ----------------------------------------
+
+    def _validate_condition(self):
+        mark = len(self.pending)
+        operators = []
+        self._validate_expression()
+        while self.types[self.current] in self.CONDITION_OPERATORS:
+            operators.append(self.current)
+            self._advance()
+            self._validate_expression()
+        if operators:
+            self._fold_binary(mark, operators)
+
+    def _validate_expression(self):
+        mark = len(self.pending)
+        operators = []
+        self._validate_term()
+        while self._is_arithmetic_operator():
+            operators.append(self.current)
+            self._advance()
+            self._validate_term()
+        if operators:
+            self._fold_binary(mark, operators)
+
+    def _validate_term(self):
+        start, mark = self.current, len(self.pending)
+        super()._validate_term()
+        token_type = self.types[start]
+        if token_type == TokenOrdinal.NUMBER:
+            self._finish(NodeOrdinal.NUMBER, start, mark)
+        elif token_type == TokenOrdinal.STRING:
+            self._finish(NodeOrdinal.STRING, start, mark)
+        elif token_type == TokenOrdinal.IDENTIFIER:
+            self._finish(NodeOrdinal.INDEX if len(self.pending) > mark else NodeOrdinal.NAME, start, mark)
+        elif token_type == TokenOrdinal.LEFT_BRACKET:
+            self._finish(NodeOrdinal.ARRAY, start, mark)
+        elif token_type == TokenOrdinal.CALL:
+            self._finish(NodeOrdinal.CALL_EXPR, start + 1, mark)
+        # a parenthesized expression is its own node
+
+    def _fold_binary(self, mark: int, operators: List[int]):
+        """Replace the operands pending since `mark` with BINARY nodes, binding by precedence."""
+        types, precedence, tree = self.types, self.PRECEDENCE, self.tree
+        operands = self.pending[mark:]
+        del self.pending[mark:]
+
+        output = [operands[0]]
+        stack = []
+        for operator, operand in zip(operators, operands[1:]):
+            level = precedence[types[operator]]
+            while stack and precedence[types[stack[-1]]] >= level:
+                right = output.pop()
+                output.append(tree.add(NodeOrdinal.BINARY, stack.pop(), (output.pop(), right)))
+            stack.append(operator)
+            output.append(operand)
+        while stack:
+            right = output.pop()
+            output.append(tree.add(NodeOrdinal.BINARY, stack.pop(), (output.pop(), right)))
+        self.pending.append(output[0])
+
+    # ----------------------------------------
+    # Lookup Tables
+    # ----------------------------------------
+
+    STATEMENT_HANDLERS = {
+        TokenOrdinal.LET: _validate_let_statement,
+        TokenOrdinal.IF: _validate_if_statement,
+        TokenOrdinal.WHILE: _validate_while_statement,
+        TokenOrdinal.FOR: _validate_for_statement,
+        TokenOrdinal.DO: _validate_do_while_statement,
+        TokenOrdinal.REPEAT: _validate_repeat_until_statement,
+        TokenOrdinal.FUNC: _validate_function_definition,
+        TokenOrdinal.CALL: _validate_function_call,
+        TokenOrdinal.RETURN: _validate_return_statement,
+    }
+
+    # binding strength of binary operators, higher binds tighter
+    PRECEDENCE = {
+        TokenOrdinal.OR: 1,
+        TokenOrdinal.AND: 2,
+        TokenOrdinal.NOT: 3,
+        TokenOrdinal.EQUAL: 4, TokenOrdinal.NOT_EQUAL: 4, TokenOrdinal.GREATER: 4, TokenOrdinal.LESS: 4,
+        TokenOrdinal.GREATER_EQUAL: 4, TokenOrdinal.SMALLER_EQUAL: 4,
+        TokenOrdinal.PLUS: 5, TokenOrdinal.MINUS: 5,
+        TokenOrdinal.MULTIPLY: 6, TokenOrdinal.DIVIDE: 6,
+    }
+
+
+def parse(tokens: Iterable[Token]) -> SyntaxTree:
+    """Validate tokens and build their SyntaxTree."""
+    return AstBuilder(tokens).build()
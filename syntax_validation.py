@@ -1,6 +1,16 @@
-from typing import List, Optional
+from typing import List, Optional, Iterable
 from enum import Enum
-from tokens import Token, TokenType
+from tokens import Token, TokenOrdinal, TokenWindow, TOKEN_TYPES_BY_ORDINAL
+
+ENGINES = ('recursive', 'iterative')
+
+# States of the iterative engine. Each names what remains to be checked of
+# the construct on top of the continuation stack, see _validate_iterative().
+(_DONE, _PROGRAM, _STATEMENT, _EXPRESSION, _EXPRESSION_TAIL, _CONDITION_TAIL,
+ _ARRAY_TAIL, _INDEX_TAIL, _PAREN_CLOSE, _CALL_ARGUMENTS_TAIL, _LET_INDEX_TAIL,
+ _IF_THEN, _IF_BODY, _ELSE_BODY, _WHILE_DO, _WHILE_BODY, _FOR_RANGE_START,
+ _FOR_RANGE_END, _FOR_RANGE_STEP, _FOR_TO, _FOR_STEP, _FOR_DO, _FOR_BODY,
+ _DO_BODY, _REPEAT_BODY, _FUNC_BODY, _CONDITION, _STATEMENT_END) = range(28)
 
 class SyntaxError(Exception):
     def __init__(self, message: str, line: int, position: int):
@@ -10,15 +20,52 @@ class SyntaxError(Exception):
         self.position = position
 
 
+class _Unwind(Exception):
+    """Abandons the innermost blocks while recovering, see _synchronize()."""
+
+
+class _ErrorLimitReached(Exception):
+    pass
+
+
 class SyntaxValidator:
-    def __init__(self, tokens: List[Token]):
+    def __init__(self, tokens: Iterable[Token], engine: str = 'recursive'):
+        """
+        tokens is either a list of tokens or any iterable of them, such as
+        LexicalAnalyzer.iter_tokens(). Iterables are pulled lazily through a
+        small lookahead window so validation runs in constant memory.
+        engine 'iterative' validates with an explicit stack instead of Python
+        recursion, so nesting depth is not bounded by the recursion limit;
+        both engines accept the same language and raise the same errors.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown validator engine: {engine}")
+        self.engine = engine
+        if not hasattr(tokens, '__getitem__'):
+            tokens = TokenWindow(tokens)
         self.tokens = tokens
+        # token types as TokenOrdinal ints; all lookahead checks read this.
+        # Containers such as TokenBuffer provide them as a `types` column.
+        if hasattr(tokens, 'types'):
+            self.types = tokens.types
+        else:
+            self.types = bytearray([token.type._value_ for token in tokens])
         self.current = 0
         self.scope_stack = []
         self.in_function = False
         self.had_return = False
+        self.errors: Optional[List[SyntaxError]] = None
+        self.max_errors = 0
 
     def validate(self) -> bool:
+        # every run starts from the first token, whatever a previous run left behind
+        self.current = 0
+        self.scope_stack = []
+        self.in_function = False
+        self.had_return = False
+        if self.engine == 'iterative':
+            return self._validate_iterative()
+
         while not self._is_at_end():
             self._validate_statement()
 
@@ -31,145 +78,210 @@ class SyntaxValidator:
             )
         return True
 
+    def validate_all(self, max_errors: int = 100) -> List[SyntaxError]:
+        """
+        Validate in panic mode and return every syntax error found, at most
+        max_errors of them; an empty list means the tokens are valid. After an
+        error the tokens up to the next statement start or block terminator are
+        skipped and validation resumes there, so the whole input is still read
+        once. The first error is the one validate() would raise. Both engines
+        recover the same way and find the same errors; on the recursive one,
+        nesting deeper than the recursion limit ends validation with a
+        "Nesting too deep" error.
+        """
+        if max_errors < 1:
+            raise ValueError("max_errors must be at least 1")
+        errors = self.errors = []
+        self.max_errors = max_errors
+        # block loops of the recursive engine call self._validate_statement();
+        # route them through the recovering version for this run only
+        self._validate_statement = self._validate_statement_recovering
+        try:
+            self.validate()
+        except _ErrorLimitReached:
+            pass
+        except SyntaxError as error:
+            if len(errors) < max_errors:
+                errors.append(error)
+        except RecursionError:
+            if len(errors) < max_errors:
+                token = self._peek()
+                errors.append(SyntaxError("Nesting too deep to validate", token.line, token.position))
+        finally:
+            del self._validate_statement
+            self.errors = None
+        return errors
+
     # ----------------------------------------
     # Main Statement Validation
     # ----------------------------------------
 
     def _validate_statement(self):
-        token = self._peek()
+        token_type = self.types[self.current]
 
-        if token.type == TokenType.IDENTIFIER and (
-            self._check_next(TokenType.INCREMENT) or 
-            self._check_next(TokenType.DECREMENT)
-        ):
+        if token_type == TokenOrdinal.IDENTIFIER and self._next_type() in self.INCREMENT_DECREMENT:
             self._validate_increment_decrement()
             return
 
-        validation_map = {
-            TokenType.LET: self._validate_let_statement,
-            TokenType.IF: self._validate_if_statement,
-            TokenType.WHILE: self._validate_while_statement,
-            TokenType.FOR: self._validate_for_statement,
-            TokenType.DO: self._validate_do_while_statement,
-            TokenType.REPEAT: self._validate_repeat_until_statement,
-            TokenType.FUNC: self._validate_function_definition,
-            TokenType.CALL: self._validate_function_call,
-            TokenType.RETURN: self._validate_return_statement, 
-        }
-
-        if token.type in validation_map:
-            validation_map[token.type]()
+        handler = self.STATEMENT_HANDLERS.get(token_type)
+        if handler is not None:
+            handler(self)
         elif self._is_compound_assignment_ahead():
             self._validate_compound_assignment()
         else:
+            token = self._peek()
             raise SyntaxError(
                 f"Unexpected token: {token.lexeme}",
                 token.line,
                 token.position
             )    
 
+    def _validate_statement_recovering(self):
+        start = self.current
+        scope_depth = len(self.scope_stack)
+        in_function, had_return = self.in_function, self.had_return
+        try:
+            SyntaxValidator._validate_statement(self)
+        except (SyntaxError, _Unwind) as error:
+            if isinstance(error, SyntaxError):
+                self._report(error)
+            del self.scope_stack[scope_depth:]
+            self.in_function, self.had_return = in_function, had_return
+            self._synchronize(start)
+
+    def _report(self, error: SyntaxError):
+        errors = self.errors
+        if errors and (errors[-1].line, errors[-1].position) == (error.line, error.position):
+            return
+        errors.append(error)
+        if len(errors) >= self.max_errors:
+            raise _ErrorLimitReached()
+
+    def _synchronize(self, start: int):
+        """
+        Skip to the next statement start or block terminator after an error in
+        the statement at `start`. A statement that failed on its first token
+        makes no progress: that token is skipped, unless it is EOF or the
+        terminator of an enclosing block, in which case the blocks in between
+        are abandoned by unwinding to the statement that opened them.
+        """
+        types = self.types
+        if self.current == start:
+            token_type = types[start]
+            if token_type == TokenOrdinal.EOF or any(
+                token_type in self.SCOPE_TERMINATORS[scope] for scope in self.scope_stack
+            ):
+                if self.scope_stack:
+                    raise _Unwind()
+                if token_type == TokenOrdinal.EOF:
+                    return
+            self.current += 1
+
+        while types[self.current] not in self.SYNC_TOKENS:
+            self.current += 1
+
     # ----------------------------------------
     # Specific Statement Handlers
     # ----------------------------------------
 
     def _validate_let_statement(self):
         """Validate a LET statement."""
-        self._consume(TokenType.LET, "Expected 'LET'")
-        self._consume(TokenType.IDENTIFIER, "Expected identifier after 'LET'")
+        self._consume(TokenOrdinal.LET, "Expected 'LET'")
+        self._consume(TokenOrdinal.IDENTIFIER, "Expected identifier after 'LET'")
         
         # array indexing in assignment
-        while self._match(TokenType.LEFT_BRACKET):
+        while self._match(TokenOrdinal.LEFT_BRACKET):
             self._validate_expression()
-            self._consume(TokenType.RIGHT_BRACKET, "Expected ']' after index")
+            self._consume(TokenOrdinal.RIGHT_BRACKET, "Expected ']' after index")
         
-        self._consume(TokenType.EQUAL, "Expected '=' after identifier")
+        self._consume(TokenOrdinal.EQUAL, "Expected '=' after identifier")
         self._validate_expression()
 
     def _validate_if_statement(self):
         """Validate an IF statement."""
-        self._consume(TokenType.IF, "Expected 'IF'")
+        self._consume(TokenOrdinal.IF, "Expected 'IF'")
         self._validate_condition() 
-        self._consume(TokenType.THEN, "Expected 'THEN' after condition")
+        self._consume(TokenOrdinal.THEN, "Expected 'THEN' after condition")
         self.scope_stack.append("IF")
 
-        self._validate_block(TokenType.ENDIF, TokenType.ELSE)
+        self._validate_block(TokenOrdinal.ENDIF, TokenOrdinal.ELSE)
 
         self.scope_stack.pop()
 
 
     def _validate_while_statement(self):
-        self._consume(TokenType.WHILE, "Expected 'WHILE'")
+        self._consume(TokenOrdinal.WHILE, "Expected 'WHILE'")
         self._validate_condition()
-        self._consume(TokenType.DO, "Expected 'DO' after condition")
+        self._consume(TokenOrdinal.DO, "Expected 'DO' after condition")
         self.scope_stack.append("WHILE")
 
-        self._validate_block(TokenType.ENDWHILE)
+        self._validate_block(TokenOrdinal.ENDWHILE)
 
         self.scope_stack.pop()
 
     def _validate_for_statement(self):
-        self._consume(TokenType.FOR, "Expected 'FOR'")
-        self._consume(TokenType.IDENTIFIER, "Expected identifier after 'FOR'")
+        self._consume(TokenOrdinal.FOR, "Expected 'FOR'")
+        self._consume(TokenOrdinal.IDENTIFIER, "Expected identifier after 'FOR'")
         
-        if self._check(TokenType.IN):
+        if self._check(TokenOrdinal.IN):
             self._advance()
-            self._consume(TokenType.IDENTIFIER, "Expected Range function")
-            self._consume(TokenType.LEFT_PAREN, "Expected '(' after Range")
+            self._consume(TokenOrdinal.IDENTIFIER, "Expected Range function")
+            self._consume(TokenOrdinal.LEFT_PAREN, "Expected '(' after Range")
             self._validate_expression()
-            self._consume(TokenType.COMMA, "Expected ',' after start value")
+            self._consume(TokenOrdinal.COMMA, "Expected ',' after start value")
             self._validate_expression()
-            self._consume(TokenType.COMMA, "Expected ',' after end value")
+            self._consume(TokenOrdinal.COMMA, "Expected ',' after end value")
             self._validate_expression()
-            self._consume(TokenType.RIGHT_PAREN, "Expected ')' after Range parameters")
+            self._consume(TokenOrdinal.RIGHT_PAREN, "Expected ')' after Range parameters")
         else:
-            self._consume(TokenType.EQUAL, "Expected '=' after identifier")
+            self._consume(TokenOrdinal.EQUAL, "Expected '=' after identifier")
             self._validate_expression()
-            self._consume(TokenType.TO, "Expected 'TO'")
+            self._consume(TokenOrdinal.TO, "Expected 'TO'")
             self._validate_expression()
-            if self._match(TokenType.STEP):
+            if self._match(TokenOrdinal.STEP):
                 self._validate_expression()
 
-        self._consume(TokenType.DO, "Expected 'DO'")
+        self._consume(TokenOrdinal.DO, "Expected 'DO'")
         self.scope_stack.append("FOR")
-        self._validate_block(TokenType.ENDFOR)
+        self._validate_block(TokenOrdinal.ENDFOR)
         self.scope_stack.pop()
 
     def _validate_do_while_statement(self):
-        self._consume(TokenType.DO, "Expected 'DO'")
+        self._consume(TokenOrdinal.DO, "Expected 'DO'")
         self.scope_stack.append("DO")
 
-        while not self._check(TokenType.WHILE):
+        while not self._check(TokenOrdinal.WHILE):
             self._validate_statement()
 
-        self._consume(TokenType.WHILE, "Expected 'WHILE'")
+        self._consume(TokenOrdinal.WHILE, "Expected 'WHILE'")
         self._validate_condition()
         self.scope_stack.pop()
 
     def _validate_repeat_until_statement(self):
-        self._consume(TokenType.REPEAT, "Expected 'REPEAT'")
+        self._consume(TokenOrdinal.REPEAT, "Expected 'REPEAT'")
         self.scope_stack.append("REPEAT")
 
-        while not self._check(TokenType.UNTIL):
+        while not self._check(TokenOrdinal.UNTIL):
             self._validate_statement()
 
-        self._consume(TokenType.UNTIL, "Expected 'UNTIL'")
+        self._consume(TokenOrdinal.UNTIL, "Expected 'UNTIL'")
         self._validate_condition()
         self.scope_stack.pop()
 
     def _validate_function_definition(self):
-        self._consume(TokenType.FUNC, "Expected 'FUNC'")
-        self._consume(TokenType.IDENTIFIER, "Expected function name")
-        self._consume(TokenType.LEFT_PAREN, "Expected '(' after function name")
+        self._consume(TokenOrdinal.FUNC, "Expected 'FUNC'")
+        self._consume(TokenOrdinal.IDENTIFIER, "Expected function name")
+        self._consume(TokenOrdinal.LEFT_PAREN, "Expected '(' after function name")
         self._validate_parameter_list()
 
-        self._consume(TokenType.RIGHT_PAREN, "Expected ')' after parameters")
-        self._consume(TokenType.BEGIN, "Expected 'BEGIN'")
+        self._consume(TokenOrdinal.RIGHT_PAREN, "Expected ')' after parameters")
+        self._consume(TokenOrdinal.BEGIN, "Expected 'BEGIN'")
         self.scope_stack.append("FUNC")
 
         self.in_function = True
         self.had_return = False
         
-        self._validate_block(TokenType.END)
+        self._validate_block(TokenOrdinal.END)
 
         if not self.had_return:
             raise SyntaxError(
@@ -183,45 +295,44 @@ class SyntaxValidator:
         self.had_return = False
 
     def _validate_return_statement(self):
-        self._consume(TokenType.RETURN, "Expected 'RETURN'")
-        if not self._check(TokenType.END):
+        self._consume(TokenOrdinal.RETURN, "Expected 'RETURN'")
+        if not self._check(TokenOrdinal.END):
             self._validate_expression()
         self.had_return = True
 
     def _validate_function_call(self):
-        self._consume(TokenType.CALL, "Expected 'CALL'")
-        self._consume(TokenType.IDENTIFIER, "Expected function name")
+        self._consume(TokenOrdinal.CALL, "Expected 'CALL'")
+        self._consume(TokenOrdinal.IDENTIFIER, "Expected function name")
 
-        if self._match(TokenType.LEFT_PAREN):
-            if not self._check(TokenType.RIGHT_PAREN):
+        if self._match(TokenOrdinal.LEFT_PAREN):
+            if not self._check(TokenOrdinal.RIGHT_PAREN):
                 self._validate_parameter_list()
-            self._consume(TokenType.RIGHT_PAREN, "Expected ')' after parameters")
+            self._consume(TokenOrdinal.RIGHT_PAREN, "Expected ')' after parameters")
 
     # ----------------------------------------
     # Utility Functions
     # ----------------------------------------
 
-    def _validate_block(self, end_token: TokenType, optional_mid_token: Optional[TokenType] = None):
+    def _validate_block(self, end_token: int, optional_mid_token: Optional[int] = None):
         """
         Validate a block of statements until an end token.
         Args:
-            end_token (TokenType): the end token of the block.
-            optional_mid_token (Optional[TokenType]): optional token that can appear within the block.
+            end_token (int): TokenOrdinal of the end token of the block.
+            optional_mid_token (Optional[int]): TokenOrdinal of an optional token that can appear within the block.
         """
         while not self._check(end_token) and (optional_mid_token is None or not self._check(optional_mid_token)):
             self._validate_statement()
 
-        if optional_mid_token and self._match(optional_mid_token):
+        if optional_mid_token is not None and self._match(optional_mid_token):
             while not self._check(end_token):
                 self._validate_statement()
 
-        self._consume(end_token, f"Expected '{end_token.name}'")
+        self._consume(end_token, f"Expected '{TOKEN_TYPES_BY_ORDINAL[end_token].name}'")
 
     def _validate_condition(self):
         self._validate_expression()
 
-        while self._peek().type in {TokenType.EQUAL, TokenType.NOT_EQUAL, TokenType.GREATER, TokenType.LESS,
-                                    TokenType.GREATER_EQUAL, TokenType.SMALLER_EQUAL, TokenType.AND, TokenType.OR, TokenType.NOT}:
+        while self.types[self.current] in self.CONDITION_OPERATORS:
             self._advance()
             self._validate_expression()
 
@@ -233,111 +344,511 @@ class SyntaxValidator:
             self._validate_term()
 
     def _validate_term(self):
-        if self._match(TokenType.NUMBER) or self._match(TokenType.STRING):
+        if self._match(TokenOrdinal.NUMBER) or self._match(TokenOrdinal.STRING):
             return
         
-        if self._match(TokenType.LEFT_BRACKET):
-            if not self._check(TokenType.RIGHT_BRACKET):
+        if self._match(TokenOrdinal.LEFT_BRACKET):
+            if not self._check(TokenOrdinal.RIGHT_BRACKET):
                 self._validate_expression()
-                while self._match(TokenType.COMMA):
+                while self._match(TokenOrdinal.COMMA):
                     self._validate_expression()
-            self._consume(TokenType.RIGHT_BRACKET, "Expected ']' after array elements")
+            self._consume(TokenOrdinal.RIGHT_BRACKET, "Expected ']' after array elements")
             return
         
         # array access: arr[index] or arr[row][col]
-        if self._match(TokenType.IDENTIFIER):
-            while self._match(TokenType.LEFT_BRACKET):
+        if self._match(TokenOrdinal.IDENTIFIER):
+            while self._match(TokenOrdinal.LEFT_BRACKET):
                 self._validate_expression()
-                self._consume(TokenType.RIGHT_BRACKET, "Expected ']' after index")
+                self._consume(TokenOrdinal.RIGHT_BRACKET, "Expected ']' after index")
             return
         
-        if self._match(TokenType.LEFT_PAREN):
+        if self._match(TokenOrdinal.LEFT_PAREN):
             self._validate_expression()
-            self._consume(TokenType.RIGHT_PAREN, "Expected ')' after expression")
+            self._consume(TokenOrdinal.RIGHT_PAREN, "Expected ')' after expression")
             return
         
-        if self._match(TokenType.CALL):
-            self._consume(TokenType.IDENTIFIER, "Expected function name")
-            if self._match(TokenType.LEFT_PAREN):
+        if self._match(TokenOrdinal.CALL):
+            self._consume(TokenOrdinal.IDENTIFIER, "Expected function name")
+            if self._match(TokenOrdinal.LEFT_PAREN):
                 self._validate_expression()
-                while self._match(TokenType.COMMA):
+                while self._match(TokenOrdinal.COMMA):
                     self._validate_expression()
-                self._consume(TokenType.RIGHT_PAREN, "Expected ')' after parameters")
+                self._consume(TokenOrdinal.RIGHT_PAREN, "Expected ')' after parameters")
             return
         
         raise SyntaxError("Expected a valid term", self._peek().line, self._peek().position) 
     
+    # The helpers below only look at self.types. EOF is never a token type the
+    # grammar asks for, so _check needs no separate end-of-input test.
+
     def _advance(self) -> Token:
-        if not self._is_at_end():
+        if self.types[self.current] != TokenOrdinal.EOF:
             self.current += 1
         return self.tokens[self.current - 1]
 
     def _peek(self) -> Token:
         return self.tokens[self.current]
 
-    def _check(self, token_type: TokenType) -> bool:
-        return not self._is_at_end() and self._peek().type == token_type
+    def _check(self, token_type: int) -> bool:
+        return self.types[self.current] == token_type
 
-    def _match(self, token_type: TokenType) -> bool:
-        if self._check(token_type):
-            self._advance()
+    def _match(self, token_type: int) -> bool:
+        if self.types[self.current] == token_type:
+            self.current += 1
             return True
         return False
 
-    def _consume(self, token_type: TokenType, error_message: str) -> Token:
-        if self._check(token_type):
-            return self._advance()
+    def _consume(self, token_type: int, error_message: str) -> Token:
+        if self.types[self.current] == token_type:
+            self.current += 1
+            return self.tokens[self.current - 1]
         raise SyntaxError(error_message, self._peek().line, self._peek().position)
 
     def _is_at_end(self) -> bool:
-        return self._peek().type == TokenType.EOF
+        return self.types[self.current] == TokenOrdinal.EOF
+
+    def _next_type(self) -> Optional[int]:
+        """Type of the token after the current one, None when the current one is EOF."""
+        types = self.types
+        if types[self.current] == TokenOrdinal.EOF:
+            return None
+        return types[self.current + 1]
 
     def _is_arithmetic_operator(self) -> bool:
-        return self._peek().type in {TokenType.PLUS, TokenType.MINUS, TokenType.MULTIPLY, TokenType.DIVIDE}
+        return self.types[self.current] in self.ARITHMETIC_OPERATORS
 
     def _is_compound_assignment_ahead(self) -> bool:
-        if self.current + 1 >= len(self.tokens):
-            return False
-        return self.tokens[self.current + 1].type in {
-            TokenType.PLUS_EQUAL,
-            TokenType.MINUS_EQUAL,
-            TokenType.MULTIPLY_EQUAL,
-            TokenType.DIVIDE_EQUAL,
-        }
+        return self._next_type() in self.COMPOUND_ASSIGNMENTS
 
     def _is_increment_decrement(self) -> bool:
-        return self._peek().type in {TokenType.INCREMENT, TokenType.DECREMENT}
+        return self.types[self.current] in self.INCREMENT_DECREMENT
 
     def _validate_increment_decrement(self):
-        self._consume(TokenType.IDENTIFIER, "Expected identifier before increment/decrement")
-        if not self._match(TokenType.INCREMENT) and not self._match(TokenType.DECREMENT):
+        self._consume(TokenOrdinal.IDENTIFIER, "Expected identifier before increment/decrement")
+        if not self._match(TokenOrdinal.INCREMENT) and not self._match(TokenOrdinal.DECREMENT):
             raise SyntaxError(
                 "Expected '++' or '--'",
                 self._peek().line,
                 self._peek().position
             )
 
-    def _check_next(self, token_type: TokenType) -> bool:
+    def _check_next(self, token_type: int) -> bool:
         """Check if the next token without consuming it."""
-        if self.current + 1 >= len(self.tokens):
-            return False
-        return self.tokens[self.current + 1].type == token_type
+        return self._next_type() == token_type
 
     def _validate_parameter_list(self):
-        if self._match(TokenType.IDENTIFIER):
-            while self._match(TokenType.COMMA):
-                self._consume(TokenType.IDENTIFIER, "Expected parameter name after ','")
+        if self._match(TokenOrdinal.IDENTIFIER):
+            while self._match(TokenOrdinal.COMMA):
+                self._consume(TokenOrdinal.IDENTIFIER, "Expected parameter name after ','")
 
     def _validate_compound_assignment(self):
         """Validate compound assignment statements like +=, -=, *=, /="""
-        self._consume(TokenType.IDENTIFIER, "Expected identifier before compound assignment")
-        if not self._match(TokenType.PLUS_EQUAL) and \
-        not self._match(TokenType.MINUS_EQUAL) and \
-        not self._match(TokenType.MULTIPLY_EQUAL) and \
-        not self._match(TokenType.DIVIDE_EQUAL):
+        self._consume(TokenOrdinal.IDENTIFIER, "Expected identifier before compound assignment")
+        if not self._match(TokenOrdinal.PLUS_EQUAL) and \
+        not self._match(TokenOrdinal.MINUS_EQUAL) and \
+        not self._match(TokenOrdinal.MULTIPLY_EQUAL) and \
+        not self._match(TokenOrdinal.DIVIDE_EQUAL):
             raise SyntaxError(
                 "Expected '+=', '-=', '*=' or '/='",
                 self._peek().line,
                 self._peek().position
             )
         self._validate_expression()
+
+    # ----------------------------------------
+    # Iterative Engine
+    # ----------------------------------------
+
+    def _validate_iterative(self) -> bool:
+        """
+        The grammar of the recursive engine run as a pushdown automaton.
+        Where the recursive engine would call into a nested construct, this
+        pushes the state to resume in afterwards onto `stack` and switches to
+        the nested one; a finished construct pops the state to return to.
+        Checks happen in the same order on the same tokens, so errors match.
+        Under validate_all() every statement also pushes _STATEMENT_END, which
+        marks where the statement returns to if it fails.
+        """
+        types = self.types
+        current = 0
+        stack = [_DONE]
+        state = _PROGRAM
+        # under validate_all(): (start, stack depth, in_function, had_return) of
+        # each statement being validated, see _recover_iterative()
+        frames = [] if self.errors is not None else None
+        EOF, IDENTIFIER = TokenOrdinal.EOF, TokenOrdinal.IDENTIFIER
+        LEFT_BRACKET, RIGHT_BRACKET = TokenOrdinal.LEFT_BRACKET, TokenOrdinal.RIGHT_BRACKET
+        LEFT_PAREN, RIGHT_PAREN, COMMA = TokenOrdinal.LEFT_PAREN, TokenOrdinal.RIGHT_PAREN, TokenOrdinal.COMMA
+        arithmetic_operators = self.ARITHMETIC_OPERATORS
+        condition_operators = self.CONDITION_OPERATORS
+        push, pop = stack.append, stack.pop
+
+        while True:
+            try:
+                if state == _EXPRESSION:
+                    # term, inlined: it is entered for every operand
+                    token_type = types[current]
+                    if token_type == IDENTIFIER:
+                        current += 1
+                        if types[current] == LEFT_BRACKET:
+                            current += 1
+                            push(_INDEX_TAIL)
+                            continue
+                        state = _EXPRESSION_TAIL
+                    elif token_type == TokenOrdinal.NUMBER or token_type == TokenOrdinal.STRING:
+                        current += 1
+                        state = _EXPRESSION_TAIL
+                    elif token_type == LEFT_BRACKET:
+                        current += 1
+                        if types[current] == RIGHT_BRACKET:
+                            current += 1
+                            state = _EXPRESSION_TAIL
+                        else:
+                            push(_ARRAY_TAIL)
+                    elif token_type == LEFT_PAREN:
+                        current += 1
+                        push(_PAREN_CLOSE)
+                    elif token_type == TokenOrdinal.CALL:
+                        current += 1
+                        current = self._expect(current, IDENTIFIER, "Expected function name")
+                        if types[current] == LEFT_PAREN:
+                            current += 1
+                            push(_CALL_ARGUMENTS_TAIL)
+                        else:
+                            state = _EXPRESSION_TAIL
+                    else:
+                        self._raise_at(current, "Expected a valid term")
+
+                elif state == _EXPRESSION_TAIL:
+                    if types[current] in arithmetic_operators:
+                        current += 1
+                        state = _EXPRESSION
+                    else:
+                        state = pop()
+
+                elif state == _STATEMENT:
+                    if frames is not None:
+                        frames.append((current, len(stack), self.in_function, self.had_return))
+                        push(_STATEMENT_END)
+                    current, state = self._iterative_statement(current, push, pop)
+
+                elif state == _STATEMENT_END:
+                    frames.pop()
+                    state = pop()
+
+                elif state == _CONDITION:
+                    push(_CONDITION_TAIL)
+                    state = _EXPRESSION
+
+                elif state == _CONDITION_TAIL:
+                    if types[current] in condition_operators:
+                        current += 1
+                        push(_CONDITION_TAIL)
+                        state = _EXPRESSION
+                    else:
+                        state = pop()
+
+                elif state == _INDEX_TAIL:
+                    current = self._expect(current, RIGHT_BRACKET, "Expected ']' after index")
+                    if types[current] == LEFT_BRACKET:
+                        current += 1
+                        push(_INDEX_TAIL)
+                        state = _EXPRESSION
+                    else:
+                        state = _EXPRESSION_TAIL
+
+                elif state == _ARRAY_TAIL:
+                    if types[current] == COMMA:
+                        current += 1
+                        push(_ARRAY_TAIL)
+                        state = _EXPRESSION
+                    else:
+                        current = self._expect(current, RIGHT_BRACKET, "Expected ']' after array elements")
+                        state = _EXPRESSION_TAIL
+
+                elif state == _PAREN_CLOSE:
+                    current = self._expect(current, RIGHT_PAREN, "Expected ')' after expression")
+                    state = _EXPRESSION_TAIL
+
+                elif state == _CALL_ARGUMENTS_TAIL:
+                    if types[current] == COMMA:
+                        current += 1
+                        push(_CALL_ARGUMENTS_TAIL)
+                        state = _EXPRESSION
+                    else:
+                        current = self._expect(current, RIGHT_PAREN, "Expected ')' after parameters")
+                        state = _EXPRESSION_TAIL
+
+                elif state in self.BLOCK_ENDS:
+                    end_token = self.BLOCK_ENDS[state]
+                    token_type = types[current]
+                    if token_type == end_token:
+                        current += 1
+                        if state == _FUNC_BODY:
+                            if not self.had_return:
+                                self._raise_at(current, "Function must have a RETURN statement")
+                            self.in_function = False
+                            self.had_return = False
+                        state = _CONDITION if state == _DO_BODY or state == _REPEAT_BODY else pop()
+                    elif state == _IF_BODY and token_type == TokenOrdinal.ELSE:
+                        current += 1
+                        state = _ELSE_BODY
+                    else:
+                        push(state)
+                        state = _STATEMENT
+
+                elif state == _LET_INDEX_TAIL:
+                    current = self._expect(current, RIGHT_BRACKET, "Expected ']' after index")
+                    if types[current] == LEFT_BRACKET:
+                        current += 1
+                        push(_LET_INDEX_TAIL)
+                    else:
+                        current = self._expect(current, TokenOrdinal.EQUAL, "Expected '=' after identifier")
+                    state = _EXPRESSION
+
+                elif state == _PROGRAM:
+                    if types[current] == EOF:
+                        return True
+                    push(_PROGRAM)
+                    state = _STATEMENT
+
+                elif state == _IF_THEN:
+                    current = self._expect(current, TokenOrdinal.THEN, "Expected 'THEN' after condition")
+                    state = _IF_BODY
+
+                elif state == _WHILE_DO:
+                    current = self._expect(current, TokenOrdinal.DO, "Expected 'DO' after condition")
+                    state = _WHILE_BODY
+
+                elif state == _FOR_TO:
+                    current = self._expect(current, TokenOrdinal.TO, "Expected 'TO'")
+                    push(_FOR_STEP)
+                    state = _EXPRESSION
+
+                elif state == _FOR_STEP:
+                    if types[current] == TokenOrdinal.STEP:
+                        current += 1
+                        push(_FOR_DO)
+                        state = _EXPRESSION
+                    else:
+                        state = _FOR_DO
+
+                elif state == _FOR_RANGE_START:
+                    current = self._expect(current, COMMA, "Expected ',' after start value")
+                    push(_FOR_RANGE_END)
+                    state = _EXPRESSION
+
+                elif state == _FOR_RANGE_END:
+                    current = self._expect(current, COMMA, "Expected ',' after end value")
+                    push(_FOR_RANGE_STEP)
+                    state = _EXPRESSION
+
+                elif state == _FOR_RANGE_STEP:
+                    current = self._expect(current, RIGHT_PAREN, "Expected ')' after Range parameters")
+                    state = _FOR_DO
+
+                elif state == _FOR_DO:
+                    current = self._expect(current, TokenOrdinal.DO, "Expected 'DO'")
+                    state = _FOR_BODY
+
+                else:
+                    # _DONE is never reached: _PROGRAM returns at EOF
+                    raise AssertionError(f"invalid validator state {state}")
+            except SyntaxError as error:
+                if frames is None:
+                    raise
+                current, state = self._recover_iterative(error, stack, frames)
+
+    def _recover_iterative(self, error: SyntaxError, stack: list, frames: list) -> tuple:
+        """
+        _validate_statement_recovering() and _synchronize() for the iterative
+        engine: record the error, drop the failed statement by cutting the
+        continuation stack back to where it started and skip ahead. The block
+        states left on the stack are the enclosing scopes; unwinding abandons
+        the innermost one with its statement. Returns the position and state
+        to resume at.
+        """
+        self._report(error)
+        types = self.types
+        current = self.current
+        start, depth, self.in_function, self.had_return = frames.pop()
+        del stack[depth:]
+        if current == start:
+            token_type = types[start]
+            scopes = [state for state in stack if state in self.BLOCK_TERMINATORS]
+            if token_type == TokenOrdinal.EOF or any(
+                token_type in self.BLOCK_TERMINATORS[scope] for scope in scopes
+            ):
+                if scopes:
+                    # the enclosing statement read its keyword, so it resumes at this token
+                    _, depth, self.in_function, self.had_return = frames.pop()
+                    del stack[depth:]
+                    return current, stack.pop()
+                if token_type == TokenOrdinal.EOF:
+                    return current, stack.pop()
+            current += 1
+
+        while types[current] not in self.SYNC_TOKENS:
+            current += 1
+        return current, stack.pop()
+
+    def _iterative_statement(self, current: int, push, pop) -> tuple:
+        """Start the statement at `current`; returns the new position and state."""
+        types = self.types
+        token_type = types[current]
+        next_type = None if token_type == TokenOrdinal.EOF else types[current + 1]
+
+        if token_type == TokenOrdinal.IDENTIFIER and next_type in self.INCREMENT_DECREMENT:
+            return current + 2, pop()
+
+        if token_type == TokenOrdinal.LET:
+            current = self._expect(current + 1, TokenOrdinal.IDENTIFIER, "Expected identifier after 'LET'")
+            if types[current] == TokenOrdinal.LEFT_BRACKET:
+                push(_LET_INDEX_TAIL)
+                return current + 1, _EXPRESSION
+            return self._expect(current, TokenOrdinal.EQUAL, "Expected '=' after identifier"), _EXPRESSION
+
+        if token_type == TokenOrdinal.IF:
+            push(_IF_THEN)
+            return current + 1, _CONDITION
+
+        if token_type == TokenOrdinal.WHILE:
+            push(_WHILE_DO)
+            return current + 1, _CONDITION
+
+        if token_type == TokenOrdinal.FOR:
+            current = self._expect(current + 1, TokenOrdinal.IDENTIFIER, "Expected identifier after 'FOR'")
+            if types[current] == TokenOrdinal.IN:
+                current = self._expect(current + 1, TokenOrdinal.IDENTIFIER, "Expected Range function")
+                current = self._expect(current, TokenOrdinal.LEFT_PAREN, "Expected '(' after Range")
+                push(_FOR_RANGE_START)
+            else:
+                current = self._expect(current, TokenOrdinal.EQUAL, "Expected '=' after identifier")
+                push(_FOR_TO)
+            return current, _EXPRESSION
+
+        if token_type == TokenOrdinal.DO:
+            return current + 1, _DO_BODY
+
+        if token_type == TokenOrdinal.REPEAT:
+            return current + 1, _REPEAT_BODY
+
+        if token_type == TokenOrdinal.FUNC:
+            current = self._expect(current + 1, TokenOrdinal.IDENTIFIER, "Expected function name")
+            current = self._expect(current, TokenOrdinal.LEFT_PAREN, "Expected '(' after function name")
+            current = self._iterative_parameter_list(current)
+            current = self._expect(current, TokenOrdinal.RIGHT_PAREN, "Expected ')' after parameters")
+            current = self._expect(current, TokenOrdinal.BEGIN, "Expected 'BEGIN'")
+            self.in_function = True
+            self.had_return = False
+            return current, _FUNC_BODY
+
+        if token_type == TokenOrdinal.CALL:
+            current = self._expect(current + 1, TokenOrdinal.IDENTIFIER, "Expected function name")
+            if types[current] == TokenOrdinal.LEFT_PAREN:
+                current += 1
+                if types[current] != TokenOrdinal.RIGHT_PAREN:
+                    current = self._iterative_parameter_list(current)
+                current = self._expect(current, TokenOrdinal.RIGHT_PAREN, "Expected ')' after parameters")
+            return current, pop()
+
+        if token_type == TokenOrdinal.RETURN:
+            # set up front: an error in the expression ends validation anyway
+            self.had_return = True
+            if types[current + 1] == TokenOrdinal.END:
+                return current + 1, pop()
+            return current + 1, _EXPRESSION
+
+        if next_type in self.COMPOUND_ASSIGNMENTS:
+            current = self._expect(current, TokenOrdinal.IDENTIFIER, "Expected identifier before compound assignment")
+            return current + 1, _EXPRESSION
+
+        self._raise_at(current, f"Unexpected token: {self.tokens[current].lexeme}")
+
+    def _iterative_parameter_list(self, current: int) -> int:
+        types = self.types
+        if types[current] == TokenOrdinal.IDENTIFIER:
+            current += 1
+            while types[current] == TokenOrdinal.COMMA:
+                current = self._expect(current + 1, TokenOrdinal.IDENTIFIER, "Expected parameter name after ','")
+        return current
+
+    def _expect(self, current: int, token_type: int, error_message: str) -> int:
+        """Position after the token at `current`, which must be of token_type."""
+        if self.types[current] != token_type:
+            self._raise_at(current, error_message)
+        return current + 1
+
+    def _raise_at(self, current: int, message: str):
+        self.current = current
+        token = self._peek()
+        raise SyntaxError(message, token.line, token.position)
+
+    # ----------------------------------------
+    # Lookup Tables
+    # ----------------------------------------
+
+    STATEMENT_HANDLERS = {
+        TokenOrdinal.LET: _validate_let_statement,
+        TokenOrdinal.IF: _validate_if_statement,
+        TokenOrdinal.WHILE: _validate_while_statement,
+        TokenOrdinal.FOR: _validate_for_statement,
+        TokenOrdinal.DO: _validate_do_while_statement,
+        TokenOrdinal.REPEAT: _validate_repeat_until_statement,
+        TokenOrdinal.FUNC: _validate_function_definition,
+        TokenOrdinal.CALL: _validate_function_call,
+        TokenOrdinal.RETURN: _validate_return_statement,
+    }
+
+    CONDITION_OPERATORS = frozenset({
+        TokenOrdinal.EQUAL, TokenOrdinal.NOT_EQUAL, TokenOrdinal.GREATER, TokenOrdinal.LESS,
+        TokenOrdinal.GREATER_EQUAL, TokenOrdinal.SMALLER_EQUAL, TokenOrdinal.AND, TokenOrdinal.OR, TokenOrdinal.NOT,
+    })
+
+    ARITHMETIC_OPERATORS = frozenset({
+        TokenOrdinal.PLUS, TokenOrdinal.MINUS, TokenOrdinal.MULTIPLY, TokenOrdinal.DIVIDE,
+    })
+
+    COMPOUND_ASSIGNMENTS = frozenset({
+        TokenOrdinal.PLUS_EQUAL, TokenOrdinal.MINUS_EQUAL, TokenOrdinal.MULTIPLY_EQUAL, TokenOrdinal.DIVIDE_EQUAL,
+    })
+
+    INCREMENT_DECREMENT = frozenset({TokenOrdinal.INCREMENT, TokenOrdinal.DECREMENT})
+
+    # block states of the iterative engine and the token that ends each block
+    BLOCK_ENDS = {
+        _IF_BODY: TokenOrdinal.ENDIF,
+        _ELSE_BODY: TokenOrdinal.ENDIF,
+        _WHILE_BODY: TokenOrdinal.ENDWHILE,
+        _FOR_BODY: TokenOrdinal.ENDFOR,
+        _DO_BODY: TokenOrdinal.WHILE,
+        _REPEAT_BODY: TokenOrdinal.UNTIL,
+        _FUNC_BODY: TokenOrdinal.END,
+    }
+
+    # tokens that close each kind of scope on scope_stack
+    SCOPE_TERMINATORS = {
+        "IF": frozenset({TokenOrdinal.ELSE, TokenOrdinal.ENDIF}),
+        "WHILE": frozenset({TokenOrdinal.ENDWHILE}),
+        "FOR": frozenset({TokenOrdinal.ENDFOR}),
+        "DO": frozenset({TokenOrdinal.WHILE}),
+        "REPEAT": frozenset({TokenOrdinal.UNTIL}),
+        "FUNC": frozenset({TokenOrdinal.END}),
+    }
+
+    # SCOPE_TERMINATORS by block state of the iterative engine
+    BLOCK_TERMINATORS = {
+        _IF_BODY: SCOPE_TERMINATORS["IF"],
+        _ELSE_BODY: SCOPE_TERMINATORS["IF"],
+        _WHILE_BODY: SCOPE_TERMINATORS["WHILE"],
+        _FOR_BODY: SCOPE_TERMINATORS["FOR"],
+        _DO_BODY: SCOPE_TERMINATORS["DO"],
+        _REPEAT_BODY: SCOPE_TERMINATORS["REPEAT"],
+        _FUNC_BODY: SCOPE_TERMINATORS["FUNC"],
+    }
+
+    # where validate_all() resumes after an error
+    SYNC_TOKENS = frozenset(STATEMENT_HANDLERS) | frozenset({
+        TokenOrdinal.ELSE, TokenOrdinal.ENDIF, TokenOrdinal.ENDWHILE, TokenOrdinal.ENDFOR,
+        TokenOrdinal.END, TokenOrdinal.UNTIL, TokenOrdinal.EOF,
+    })
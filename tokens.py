@@ -1,5 +1,10 @@
+import re
+from array import array
+from bisect import bisect_left
+from collections import deque
 from enum import Enum, auto
-from typing import List
+from types import SimpleNamespace
+from typing import List, Iterable, Iterator, Optional, Tuple, Union
 
 class TokenType(Enum):
     LET = auto()
@@ -59,7 +64,19 @@ class TokenType(Enum):
     COMMENT = auto()
     EOF = auto()
 
+_NEWLINE = re.compile('\n')
+
+# TokenType members indexed by their value, used to decode TokenBuffer.types
+TOKEN_TYPES_BY_ORDINAL = {token_type.value: token_type for token_type in TokenType}
+
+# plain int mirror of TokenType (TokenOrdinal.LET == TokenType.LET.value) for hot
+# loops: enum attribute access and hashing are an order of magnitude slower
+TokenOrdinal = SimpleNamespace(**{token_type.name: token_type.value for token_type in TokenType})
+
+
 class Token:
+    __slots__ = ('type', 'lexeme', 'line', 'position')
+
     def __init__(self, type: TokenType, lexeme: str, line: int, position: int):
         self.type = type
         self.lexeme = lexeme
@@ -70,11 +87,213 @@ class Token:
         return f"Token: {self.type.name.lower()}, Lexeme: {self.lexeme}"
 
 
-def print_tokens_table(tokens: List['Token']):
-    type_width = max(len("Type"), max(len(token.type.name) for token in tokens))
-    lexeme_width = max(len("Lexeme"), max(len(token.lexeme) for token in tokens))
-    line_width = max(len("Line"), max(len(str(token.line)) for token in tokens))
-    pos_width = max(len("Position"), max(len(str(token.position)) for token in tokens))
+class TokenWindow:
+    """
+    Indexable sliding window over a token iterator.
+    Tokens are pulled from the iterator on demand and only the last few are
+    kept, so a parser that moves forward with a small lookahead can index it
+    by absolute position like a list while memory stays constant.
+    """
+    def __init__(self, tokens: Iterable[Token], behind: int = 2):
+        self._iterator = iter(tokens)
+        self._buffer = deque()
+        self._start = 0
+        self.behind = behind
+
+    def __getitem__(self, index: int) -> Token:
+        buffer = self._buffer
+        while index >= self._start + len(buffer):
+            try:
+                buffer.append(next(self._iterator))
+            except StopIteration:
+                raise IndexError("token index out of range") from None
+
+        while self._start < index - self.behind:
+            buffer.popleft()
+            self._start += 1
+
+        if index < self._start:
+            raise IndexError(f"token {index} is no longer buffered")
+        return buffer[index - self._start]
+
+    @property
+    def types(self) -> '_WindowOrdinals':
+        """Lazy view of the token type ordinals, indexable like TokenBuffer.types."""
+        return _WindowOrdinals(self)
+
+
+class _WindowOrdinals:
+    __slots__ = ('window',)
+
+    def __init__(self, window: TokenWindow):
+        self.window = window
+
+    def __getitem__(self, index: int) -> int:
+        return self.window[index].type._value_
+
+
+class TokenBuffer:
+    """
+    Columnar token storage.
+    Types are kept as TokenType ordinals in a bytearray, lines and positions in
+    unsigned int arrays and lexemes as [start, end) offsets into the source, so
+    a token costs a few bytes instead of a Python object. Token objects are only
+    built when indexed or iterated.
+    """
+    def __init__(self, source: str):
+        self.source = source
+        self.types = bytearray()
+        self.starts = array('I')
+        self.ends = array('I')
+        self.lines = array('I')
+        self.positions = array('I')
+
+    def append(self, type: TokenType, start: int, end: int, line: int, position: int):
+        self.types.append(type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(line)
+        self.positions.append(position)
+
+    def __len__(self) -> int:
+        return len(self.types)
+
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self.types)
+        return Token(
+            TOKEN_TYPES_BY_ORDINAL[self.types[index]],
+            self.source[self.starts[index]:self.ends[index]],
+            self.lines[index],
+            self.positions[index]
+        )
+
+    def __iter__(self) -> Iterator[Token]:
+        for index in range(len(self.types)):
+            yield self[index]
+
+
+class MappedTokenBuffer(TokenBuffer):
+    """
+    TokenBuffer over the bytes of a memory-mapped file, as returned by
+    LexicalAnalyzer.tokenize_file(). Lexemes are decoded only when a token is
+    built. close() releases the mapping; tokens already built stay valid.
+    """
+    def __getitem__(self, index: int) -> Token:
+        if index < 0:
+            index += len(self.types)
+        return Token(
+            TOKEN_TYPES_BY_ORDINAL[self.types[index]],
+            self.source[self.starts[index]:self.ends[index]].decode('ascii'),
+            self.lines[index],
+            self.positions[index]
+        )
+
+    def close(self):
+        if hasattr(self.source, 'close'):
+            self.source.close()
+
+    def __enter__(self) -> 'MappedTokenBuffer':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LineIndex:
+    """
+    Offsets of the newlines of a source, for turning a character offset into
+    the line and position a lexer would have counted up to it and back.
+    line and position are those of offset `origin`; newlines before it are
+    ignored. The index is built on the first lookup.
+    """
+    def __init__(self, source: str, line: int = 1, position: int = 1, origin: int = 0):
+        self.source = source
+        self.line = line
+        self.position = position
+        self.origin = origin
+        self._newlines: Optional[array] = None
+
+    @property
+    def newlines(self) -> array:
+        if self._newlines is None:
+            self._newlines = array('I', [match.start() for match in _NEWLINE.finditer(self.source, self.origin)])
+        return self._newlines
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        """(line, position) of the character at offset."""
+        newlines = self.newlines
+        before = bisect_left(newlines, offset)
+        if before == 0:
+            return self.line, self.position + offset - self.origin
+        return self.line + before, offset - newlines[before - 1]
+
+    def offset(self, line: int, position: int) -> int:
+        """Offset of the character at (line, position); raises ValueError for lines outside the source."""
+        if line == self.line:
+            return self.origin + position - self.position
+        newlines = self.newlines
+        if not self.line < line <= self.line + len(newlines):
+            raise ValueError(f"Line {line} is outside the source")
+        return newlines[line - self.line - 1] + position
+
+
+class OffsetToken(Token):
+    """Token that only knows its offset; line and position are looked up when read."""
+    __slots__ = ('offset', 'line_index')
+
+    def __init__(self, type: TokenType, lexeme: str, offset: int, line_index: LineIndex):
+        self.type = type
+        self.lexeme = lexeme
+        self.offset = offset
+        self.line_index = line_index
+
+    @property
+    def line(self) -> int:
+        return self.line_index.locate(self.offset)[0]
+
+    @property
+    def position(self) -> int:
+        return self.line_index.locate(self.offset)[1]
+
+
+class OffsetTokenBuffer(TokenBuffer):
+    """
+    TokenBuffer without line and position columns, as returned by
+    LexicalAnalyzer.tokenize(lazy_positions=True). Tokens are OffsetTokens
+    resolved through line_index, so positions cost nothing until asked for.
+    """
+    def __init__(self, source: str, line_index: LineIndex):
+        self.source = source
+        self.line_index = line_index
+        self.types = bytearray()
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def append(self, type: TokenType, start: int, end: int):
+        self.types.append(type.value)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __getitem__(self, index: int) -> OffsetToken:
+        if index < 0:
+            index += len(self.types)
+        start = self.starts[index]
+        return OffsetToken(
+            TOKEN_TYPES_BY_ORDINAL[self.types[index]],
+            self.source[start:self.ends[index]],
+            start,
+            self.line_index
+        )
+
+
+def print_tokens_table(tokens: Union[List['Token'], TokenBuffer]):
+    # one pass over the tokens, so lazily positioned ones are resolved once each
+    rows = [(token.type.name, token.lexeme, str(token.line), str(token.position)) for token in tokens]
+    type_width = max(len("Type"), max(len(row[0]) for row in rows))
+    lexeme_width = max(len("Lexeme"), max(len(row[1]) for row in rows))
+    line_width = max(len("Line"), max(len(row[2]) for row in rows))
+    pos_width = max(len("Position"), max(len(row[3]) for row in rows))
     
     border = f"+{'-' * (type_width + 2)}+{'-' * (lexeme_width + 2)}+{'-' * (line_width + 2)}+{'-' * (pos_width + 2)}+"
     
@@ -86,8 +305,8 @@ def print_tokens_table(tokens: List['Token']):
     print(f"| {'Type':<{type_width}} | {'Lexeme':<{lexeme_width}} | {'Line':<{line_width}} | {'Position':<{pos_width}} |")
     print(border)
     
-    for token in tokens:
-        if token.type != TokenType.EOF:
-            print(f"| {token.type.name:<{type_width}} | {token.lexeme:<{lexeme_width}} | {token.line:<{line_width}} | {token.position:<{pos_width}} |")
+    for type_name, lexeme, line, position in rows:
+        if type_name != TokenType.EOF.name:
+            print(f"| {type_name:<{type_width}} | {lexeme:<{lexeme_width}} | {line:<{line_width}} | {position:<{pos_width}} |")
     
     print(border)
\ No newline at end of file
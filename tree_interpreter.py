@@ -0,0 +1,183 @@
+# Naive tree-walking interpreter, kept as the baseline for benchmark.py.
+# It follows the semantics of bytecode.VirtualMachine.
+from typing import Dict, List, Tuple
+from bytecode import BINARY_ARGUMENTS, BINARY_FUNCTIONS, COMPARE_ARGUMENTS, COMPARE_FUNCTIONS, ExecutionError
+from syntax_tree import NodeOrdinal, SyntaxTree
+from tokens import TokenOrdinal
+
+
+class _Return(Exception):
+    def __init__(self, value):
+        self.value = value
+
+
+class Function:
+    def __init__(self, name: str, parameters: List[str], body: int, local_names: set):
+        self.name = name
+        self.parameters = parameters
+        self.body = body
+        self.local_names = local_names
+
+
+class TreeInterpreter:
+    def __init__(self, tree: SyntaxTree):
+        self.tree = tree
+        self.globals: Dict[str, object] = {}
+        # (variables, names local to the function) per active call
+        self.frames: List[Tuple[Dict[str, object], set]] = []
+        self.line = 1
+
+    def run(self) -> Dict[str, object]:
+        try:
+            self._block(self.tree.root)
+        except _Return:
+            pass
+        except (TypeError, ValueError, IndexError, ArithmeticError, RecursionError) as error:
+            raise ExecutionError(str(error), self.line) from None
+        return self.globals
+
+    def _scope(self, name: str) -> Dict[str, object]:
+        if self.frames and name in self.frames[-1][1]:
+            return self.frames[-1][0]
+        return self.globals
+
+    def _get(self, name: str):
+        scope = self._scope(name)
+        if name not in scope:
+            raise ExecutionError(f"Undefined variable '{name}'", self.line)
+        return scope[name]
+
+    def _set(self, name: str, value):
+        self._scope(name)[name] = value
+
+    def _block(self, block: int):
+        for statement in self.tree.children(block):
+            self._statement(statement)
+
+    def _statement(self, node: int):
+        tree = self.tree
+        kind = tree.kinds[node]
+        children = tree.children(node)
+        name = tree.token(node).lexeme
+        self.line = tree.token(node).line
+
+        if kind == NodeOrdinal.LET:
+            if len(children) == 1:
+                self._set(name, self._evaluate(children[0]))
+            else:
+                target = self._get(name)
+                for index in children[:-2]:
+                    target = target[self._evaluate(index)]
+                index = self._evaluate(children[-2])
+                target[index] = self._evaluate(children[-1])
+        elif kind == NodeOrdinal.IF:
+            if self._evaluate(children[0]):
+                self._block(children[1])
+            elif len(children) == 3:
+                self._block(children[2])
+        elif kind == NodeOrdinal.WHILE:
+            while self._evaluate(children[0]):
+                self._block(children[1])
+        elif kind == NodeOrdinal.DO_WHILE:
+            self._block(children[0])
+            while self._evaluate(children[1]):
+                self._block(children[0])
+        elif kind == NodeOrdinal.REPEAT_UNTIL:
+            self._block(children[0])
+            while not self._evaluate(children[1]):
+                self._block(children[0])
+        elif kind == NodeOrdinal.FOR or kind == NodeOrdinal.FOR_IN:
+            self._set(name, self._evaluate(children[0]))
+            end = self._evaluate(children[1])
+            step = self._evaluate(children[2]) if len(children) == 4 else 1
+            if step == 0:
+                raise ValueError("loop STEP must not be zero")
+            while True:
+                value = self._get(name)
+                if kind == NodeOrdinal.FOR:
+                    done = value > end if step > 0 else value < end
+                else:
+                    done = value >= end if step > 0 else value <= end
+                if done:
+                    break
+                self._block(children[-1])
+                self._set(name, self._get(name) + step)
+        elif kind == NodeOrdinal.FUNC:
+            parameters = [tree.token(child).lexeme for child in children[:-1]]
+            local_names = set(parameters) | self._assigned_names(children[-1])
+            self.globals[name] = Function(name, parameters, children[-1], local_names)
+        elif kind == NodeOrdinal.CALL:
+            self._call(name, [self._get(tree.token(child).lexeme) for child in children])
+        elif kind == NodeOrdinal.RETURN:
+            raise _Return(self._evaluate(children[0]) if children else None)
+        elif kind == NodeOrdinal.INCREMENT:
+            self._set(name, self._get(name) + 1)
+        elif kind == NodeOrdinal.DECREMENT:
+            self._set(name, self._get(name) - 1)
+        elif kind == NodeOrdinal.COMPOUND_ASSIGN:
+            operator_type = tree.tokens[tree.token_indices[node] + 1].type.value
+            # the variable is read before the right-hand side runs, as in the VM
+            current = self._get(name)
+            value = self._evaluate(children[0])
+            self._set(name, BINARY_FUNCTIONS[BINARY_ARGUMENTS[operator_type]](current, value))
+
+    def _assigned_names(self, block: int) -> set:
+        tree = self.tree
+        names = set()
+        for node in tree.children(block):
+            kind = tree.kinds[node]
+            if (kind == NodeOrdinal.LET and len(tree.children(node)) == 1) or \
+                    kind == NodeOrdinal.FOR or kind == NodeOrdinal.FOR_IN:
+                names.add(tree.token(node).lexeme)
+            if kind != NodeOrdinal.FUNC:
+                names |= self._assigned_names(node)
+        return names
+
+    def _call(self, name: str, arguments: list):
+        function = self._get(name)
+        if not isinstance(function, Function):
+            raise TypeError(f"{function!r} is not a function")
+        if len(arguments) != len(function.parameters):
+            raise TypeError(
+                f"{function.name}() takes {len(function.parameters)} arguments but {len(arguments)} were given"
+            )
+        self.frames.append((dict(zip(function.parameters, arguments)), function.local_names))
+        try:
+            self._block(function.body)
+        except _Return as returned:
+            return returned.value
+        finally:
+            self.frames.pop()
+        return None
+
+    def _evaluate(self, node: int):
+        tree = self.tree
+        kind = tree.kinds[node]
+        if kind == NodeOrdinal.NUMBER:
+            return int(tree.token(node).lexeme)
+        if kind == NodeOrdinal.NAME:
+            return self._get(tree.token(node).lexeme)
+        if kind == NodeOrdinal.CONSTANT:
+            return tree.values[node]
+        if kind == NodeOrdinal.BINARY:
+            left, right = tree.children(node)
+            operator_type = tree.token(node).type.value
+            if operator_type == TokenOrdinal.AND:
+                return self._evaluate(left) and self._evaluate(right)
+            if operator_type == TokenOrdinal.OR:
+                return self._evaluate(left) or self._evaluate(right)
+            if operator_type in COMPARE_ARGUMENTS:
+                function = COMPARE_FUNCTIONS[COMPARE_ARGUMENTS[operator_type]]
+            else:
+                function = BINARY_FUNCTIONS[BINARY_ARGUMENTS[operator_type]]
+            return function(self._evaluate(left), self._evaluate(right))
+        if kind == NodeOrdinal.INDEX:
+            value = self._get(tree.token(node).lexeme)
+            for index in tree.children(node):
+                value = value[self._evaluate(index)]
+            return value
+        if kind == NodeOrdinal.ARRAY:
+            return [self._evaluate(element) for element in tree.children(node)]
+        if kind == NodeOrdinal.CALL_EXPR:
+            return self._call(tree.token(node).lexeme, [self._evaluate(argument) for argument in tree.children(node)])
+        return tree.token(node).lexeme